@@ -0,0 +1,130 @@
+"""
+Utilidades para los endpoints por lotes.
+Ejecuta los elementos de un lote de forma concurrente con un límite, convierte
+el error de cada elemento en su resultado (sin abortar el resto) y envía los
+resultados como NDJSON, una línea JSON por elemento, a medida que terminan.
+"""
+import asyncio
+import math
+from typing import AsyncIterator, Awaitable, Callable, Sequence, TypeVar, Union
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.core.exceptions import EduAppException, GeminiUnavailableError, PDFServiceError
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def run_batch(
+    items: Sequence[T],
+    fn: Callable[[T], Awaitable[R]],
+    concurrency: int
+) -> AsyncIterator[tuple[int, Union[R, Exception]]]:
+    """
+    Ejecuta fn sobre cada elemento con como mucho `concurrency` en curso y
+    produce (índice, resultado o excepción) en orden de finalización.
+    Si el consumidor deja de iterar (por ejemplo, el cliente se desconecta),
+    se cancelan los elementos pendientes.
+
+    Args:
+        items: Elementos del lote
+        fn: Corrutina que procesa un elemento
+        concurrency: Elementos procesados a la vez como máximo
+
+    Yields:
+        Tuplas (índice del elemento, resultado o excepción que lanzó)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, item: T) -> tuple[int, Union[R, Exception]]:
+        async with semaphore:
+            try:
+                return index, await fn(item)
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def error_fields(e: Exception) -> dict:
+    """
+    Traduce el error de un elemento a los campos de su resultado, con el mismo
+    código de estado que devolvería el endpoint individual.
+
+    Args:
+        e: Excepción lanzada al procesar el elemento
+
+    Returns:
+        Diccionario con success, error, status_code y retry_after
+    """
+    retry_after = None
+    if isinstance(e, HTTPException):
+        detail, status_code = str(e.detail), e.status_code
+        if e.headers and "Retry-After" in e.headers:
+            retry_after = int(e.headers["Retry-After"])
+    elif isinstance(e, GeminiUnavailableError):
+        detail, status_code = str(e), e.status_code
+        retry_after = math.ceil(e.retry_after)
+    elif isinstance(e, PDFServiceError):
+        detail, status_code = str(e), 400
+    elif isinstance(e, EduAppException):
+        detail, status_code = str(e), 500
+    else:
+        detail, status_code = f"Error inesperado: {str(e)}", 500
+    return {"success": False, "error": detail, "status_code": status_code, "retry_after": retry_after}
+
+
+def batch_summary(items: Sequence[BaseModel]) -> dict:
+    """
+    Ordena los resultados de un lote por índice y cuenta los correctos y fallidos.
+
+    Args:
+        items: Resultados de los elementos (con campos indice y success)
+
+    Returns:
+        Diccionario con resultados, total, correctos, fallidos y success
+    """
+    resultados = sorted(items, key=lambda item: item.indice)
+    correctos = sum(1 for item in resultados if item.success)
+    return {
+        "resultados": resultados,
+        "total": len(resultados),
+        "correctos": correctos,
+        "fallidos": len(resultados) - correctos,
+        "success": correctos == len(resultados)
+    }
+
+
+async def _ndjson_lines(items: AsyncIterator[BaseModel]) -> AsyncIterator[str]:
+    async for item in items:
+        yield item.model_dump_json() + "\n"
+
+
+def ndjson_response(items: AsyncIterator[BaseModel]) -> StreamingResponse:
+    """
+    Crea una respuesta NDJSON que envía cada resultado en cuanto está listo.
+
+    Args:
+        items: Iterador asíncrono de resultados
+
+    Returns:
+        StreamingResponse con media type application/x-ndjson
+    """
+    return StreamingResponse(
+        _ndjson_lines(items),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={
+            "Cache-Control": "no-cache",
+            # Evita que proxies como nginx acumulen la respuesta
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -0,0 +1,90 @@
+"""
+Utilidades de caché HTTP para las respuestas GET.
+Calculan el ETag de una representación, resuelven las peticiones
+condicionales (If-None-Match -> 304 Not Modified) y añaden Cache-Control, de
+modo que navegadores y CDN puedan guardar la respuesta y revalidarla sin
+volver a descargarla.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+
+def make_etag(*parts: str) -> str:
+    """
+    ETag débil de una representación.
+    Es débil (W/) porque identifica el contenido, no los bytes exactos: se
+    mantiene aunque cambien campos informativos como "cached" o la
+    codificación con la que el middleware comprime el cuerpo.
+
+    Args:
+        parts: Textos que determinan el contenido de la respuesta
+
+    Returns:
+        El ETag entre comillas, listo para la cabecera
+    """
+    digest = hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Comparación débil de If-None-Match con el ETag actual (RFC 9110, 13.1.2).
+
+    Args:
+        if_none_match: Valor de la cabecera If-None-Match (puede listar varios ETags o ser "*")
+        etag: ETag actual de la representación
+
+    Returns:
+        True si el cliente ya tiene esta representación
+    """
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str, max_age: int) -> Optional[Response]:
+    """
+    Respuesta 304 con ETag y Cache-Control si el If-None-Match del cliente
+    coincide con el ETag; None si hay que enviar la representación.
+
+    Args:
+        request: Petición, de la que se lee If-None-Match
+        etag: ETag de la representación (make_etag)
+        max_age: Segundos que el cliente y las cachés intermedias pueden reutilizarla sin revalidar
+
+    Returns:
+        Response 304, o None
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": f"public, max-age={max_age}"})
+    return None
+
+
+def cacheable_response(request: Request, content: BaseModel, etag: str, max_age: int) -> Response:
+    """
+    Respuesta JSON con ETag y Cache-Control, o 304 sin cuerpo si el cliente
+    envía un If-None-Match que coincide (no se serializa el contenido).
+
+    Args:
+        request: Petición, de la que se lee If-None-Match
+        content: Modelo que se envía como JSON
+        etag: ETag de la representación (make_etag)
+        max_age: Segundos que el cliente y las cachés intermedias pueden reutilizarla sin revalidar
+
+    Returns:
+        ORJSONResponse con el contenido, o Response 304
+    """
+    response = not_modified(request, etag, max_age)
+    if response is not None:
+        return response
+    return ORJSONResponse(
+        content.model_dump(), headers={"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    )
@@ -0,0 +1,310 @@
+"""
+Middlewares ASGI de la aplicación.
+"""
+import gzip
+import importlib
+import importlib.util
+import random
+import secrets
+import time
+from typing import Optional
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import HTTP_COMPRESSED_BYTES, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+from app.core.tracing import Trace, TraceExporter
+
+# Margen para los delimitadores y cabeceras multipart alrededor del archivo
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Tipos de contenido que merece la pena comprimir (prefijos)
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+
+class UploadLimitMiddleware:
+    """
+    Rechaza con 413 los cuerpos de petición que superan max_body_bytes en las
+    rutas bajo path_prefix, antes de que el parser multipart los escriba a disco.
+    Si la petición declara Content-Length se rechaza sin leer el cuerpo; si no,
+    se cuentan los bytes recibidos y se corta al superar el límite.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_bytes: int,
+        path_prefix: str,
+        path_limits: Optional[dict[str, int]] = None
+    ):
+        """
+        Args:
+            app: Aplicación ASGI envuelta
+            max_body_bytes: Tamaño máximo del cuerpo en bytes
+            path_prefix: Prefijo de las rutas a las que se aplica el límite
+            path_limits: Límites propios de rutas concretas (ruta exacta -> bytes)
+        """
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_prefix = path_prefix
+        self.path_limits = path_limits or {}
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail="El archivo supera el tamaño máximo permitido"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        max_body_bytes = self.path_limits.get(scope["path"], self.max_body_bytes)
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body_bytes:
+            error = self._too_large()
+            response = JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    # HTTPException atraviesa el parseo del formulario y la convierte en 413
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Registra el número de peticiones, su duración y las peticiones en curso
+    por método y plantilla de ruta (por ejemplo, /api/pdf/jobs/{job_id}).
+    Las rutas que no existen se agrupan como "unmatched" para no crear una
+    serie por URL. En las respuestas en streaming, la duración incluye el stream.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        Args:
+            app: Aplicación ASGI envuelta
+        """
+        self.app = app
+
+    @staticmethod
+    def _route(scope: Scope) -> str:
+        partial = None
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                # La ruta existe pero no para este método (405)
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            with HTTP_IN_FLIGHT.labels(route).track_inprogress():
+                await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, status).inc()
+
+
+def _accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    """Codificaciones de Accept-Encoding con su peso q ("gzip;q=0" la rechaza)."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name.strip():
+            accepted[name.strip()] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Comprime con brotli (si el paquete brotli está instalado) o gzip las
+    respuestas completas de tipo JSON o texto a partir de minimum_size bytes,
+    según el Accept-Encoding del cliente. Las respuestas en streaming (SSE,
+    NDJSON) se envían sin comprimir para no retener los eventos en el buffer
+    del compresor. Añade Vary: Accept-Encoding a toda respuesta comprimible
+    para que las cachés intermedias guarden una variante por codificación.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int, brotli_quality: int):
+        """
+        Args:
+            app: Aplicación ASGI envuelta
+            minimum_size: Tamaño mínimo del cuerpo en bytes para comprimirlo
+            gzip_level: Nivel de compresión de gzip (1-9)
+            brotli_quality: Calidad de compresión de brotli (0-11)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        # Por orden de preferencia: brotli comprime más que gzip al mismo coste
+        self.encodings = ("br", "gzip") if importlib.util.find_spec("brotli") else ("gzip",)
+
+    def _negotiate(self, scope: Scope) -> Optional[str]:
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding in self.encodings:
+            if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return None
+
+    def _compressible(self, headers: MutableHeaders, body: bytes) -> bool:
+        return (
+            "content-encoding" not in headers
+            and len(body) >= self.minimum_size
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return importlib.import_module("brotli").compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._negotiate(scope)
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Las cabeceras se envían con el primer fragmento del cuerpo, cuando se sabe si se comprime
+                start = message
+                return
+            initial, start = start, None
+            if initial is None or message["type"] != "http.response.body":
+                if initial is not None:
+                    await send(initial)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=initial["headers"])
+            if not message.get("more_body", False) and self._compressible(headers, body):
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is not None:
+                    compressed = self._compress(body, encoding)
+                    HTTP_COMPRESSED_BYTES.labels(encoding, "original").inc(len(body))
+                    HTTP_COMPRESSED_BYTES.labels(encoding, "compressed").inc(len(compressed))
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    message = {**message, "body": compressed}
+            await send(initial)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+class ProfilingMiddleware:
+    """
+    Perfila las peticiones que lo piden con una cabecera o que caen en el
+    muestreo: registra su árbol de spans, muestras de pila y pico de memoria
+    (app.core.tracing) y entrega la traza al exportador al terminar, fuera del
+    camino de la respuesta. La respuesta lleva el identificador de la traza en
+    X-Trace-Id. Las peticiones no perfiladas solo pagan la consulta de la
+    cabecera y un número aleatorio.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        exporter: TraceExporter,
+        header: str,
+        token: Optional[str],
+        sample_rate: float,
+        cpu_interval: float,
+        memory: bool
+    ):
+        """
+        Args:
+            app: Aplicación ASGI envuelta
+            exporter: Destino de las trazas (archivo o colector OTLP)
+            header: Cabecera que pide perfilar la petición
+            token: Valor que debe llevar la cabecera; None para aceptar cualquier valor
+            sample_rate: Fracción de las peticiones que se perfilan sin pedirlo (0-1)
+            cpu_interval: Segundos entre muestras de pila; 0 para no muestrear
+            memory: Si se mide el pico de memoria con tracemalloc
+        """
+        self.app = app
+        self.exporter = exporter
+        self.header = header.lower().encode("latin-1")
+        self.token = token.encode("utf-8") if token else None
+        self.sample_rate = sample_rate
+        self.cpu_interval = cpu_interval
+        self.memory = memory
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                if self.token is None:
+                    return value.strip() not in (b"", b"0", b"false")
+                return secrets.compare_digest(value.strip(), self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested(scope)
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(
+            f"{scope['method']} {scope['path']}",
+            {"http.method": scope["method"], "http.target": scope["path"], "profile.requested": requested},
+            cpu_interval=self.cpu_interval,
+            memory=self.memory
+        )
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.root.attributes["http.status_code"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Trace-Id"] = trace.trace_id
+            await send(message)
+
+        try:
+            with trace:
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            self.exporter.submit(trace)
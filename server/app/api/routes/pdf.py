@@ -2,69 +2,295 @@
 Rutas para el procesamiento de PDFs y generación de preguntas.
 Sigue el principio de Single Responsibility: solo maneja las rutas relacionadas con PDFs.
 """
-from typing import Optional
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from app.models.schemas import PDFQuestionsResponse
-from app.services.gemini_service import GeminiService
-from app.services.pdf_service import PDFService
-from app.core.dependencies import get_gemini_service, get_pdf_service
-from app.core.exceptions import PDFServiceError, GeminiServiceError
+import asyncio
+import contextlib
+import hashlib
+import math
+import os
+import tempfile
+import time
+from typing import Optional, Union
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query
+from app.api.batch import NDJSON_MEDIA_TYPE, batch_summary, error_fields, ndjson_response, run_batch
+from app.api.sse import sse_response
+from app.models.schemas import (
+    PDFBatchItem,
+    PDFBatchResponse,
+    PDFJobResponse,
+    PDFQuestionsMode,
+    PDFQuestionsResponse
+)
+from app.services.demand_service import PDF
+from app.services.gemini_service import CHARS_PER_TOKEN, GeminiService
+from app.services.job_service import JobService
+from app.services.pdf_service import PDFExtraction, PDFService
+from app.services.question_pipeline import QuestionPipeline
+from app.core.config import settings
+from app.core.dependencies import get_gemini_service, get_job_service, get_pdf_service, get_question_pipeline
+from app.core.metrics import PDF_UPLOAD_BYTES, STAGE_LATENCY
+from app.core.tracing import annotate, span
+from app.core.exceptions import JobQueueFullError, PDFServiceError, GeminiServiceError, GeminiUnavailableError
 
 router = APIRouter(prefix="/pdf", tags=["pdf"])
 
+# Tamaño de los bloques al leer la subida (1 MiB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _ensure_gemini_configured(gemini_service: Optional[GeminiService]) -> None:
+    """Lanza un 500 si el servicio de Gemini no está disponible."""
+    if not gemini_service:
+        raise HTTPException(
+            status_code=500,
+            detail="API key de Gemini no configurada. Por favor, configura GEMINI_API_KEY en el archivo .env"
+        )
+
+
+async def _spool_upload(file: UploadFile, pdf_service: PDFService) -> tuple[str, str]:
+    """
+    Copia el archivo subido por bloques a un archivo temporal calculando su
+    SHA-256 mientras se lee. Nunca hay más de un bloque en memoria, y la subida
+    se rechaza en cuanto se detecta que no es un PDF o que supera el tamaño máximo.
+    El llamador debe borrar el archivo temporal.
+
+    Args:
+        file: Archivo subido
+        pdf_service: Servicio de PDF (firma y límites de subida)
+
+    Returns:
+        Tupla (ruta del archivo temporal, digest SHA-256 en hexadecimal)
+
+    Raises:
+        HTTPException: 400 si no es un PDF, 413 si supera el tamaño máximo
+    """
+    digest = hashlib.sha256()
+    size = 0
+    start = time.perf_counter()
+    spool = tempfile.NamedTemporaryFile(
+        prefix="eduapp-", suffix=".pdf", dir=pdf_service.upload_dir, delete=False
+    )
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            if size == 0 and not pdf_service.has_pdf_signature(chunk):
+                raise HTTPException(
+                    status_code=400,
+                    detail="El archivo no es un PDF válido (no contiene la firma %PDF-)"
+                )
+            size += len(chunk)
+            if pdf_service.max_upload_bytes is not None and size > pdf_service.max_upload_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"El archivo supera el tamaño máximo permitido ({pdf_service.max_upload_bytes} bytes)"
+                )
+            digest.update(chunk)
+            await asyncio.to_thread(spool.write, chunk)
+        spool.close()
+        if size == 0:
+            raise HTTPException(status_code=400, detail="El archivo está vacío")
+        STAGE_LATENCY.labels("upload").observe(time.perf_counter() - start)
+        PDF_UPLOAD_BYTES.observe(size)
+        annotate(bytes=size)
+        return spool.name, digest.hexdigest()
+    except BaseException:
+        spool.close()
+        os.unlink(spool.name)
+        raise
+
+
+async def _receive_pdf(file: UploadFile, pdf_service: PDFService) -> tuple[str, str]:
+    """
+    Valida el archivo subido y lo copia a un archivo temporal.
+    El llamador debe borrar el archivo temporal.
+
+    Args:
+        file: Archivo PDF subido
+        pdf_service: Servicio de PDF
+
+    Returns:
+        Tupla (ruta del archivo temporal, digest SHA-256 del archivo)
+
+    Raises:
+        HTTPException: Si el archivo no es un PDF o es demasiado grande
+    """
+    # Validar que el archivo sea un PDF
+    if not pdf_service.validate_pdf_content_type(file.content_type):
+        raise HTTPException(
+            status_code=400,
+            detail="El archivo debe ser un PDF (application/pdf)"
+        )
+
+    try:
+        # Copiar la subida a un archivo temporal validando firma y tamaño
+        with span("upload", filename=file.filename or ""):
+            return await _spool_upload(file, pdf_service)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error inesperado al procesar PDF: {str(e)}"
+        )
+
+
+async def _extract_pdf_text(
+    file: UploadFile,
+    pdf_service: PDFService,
+    max_text_length: Optional[int] = None
+) -> tuple[PDFExtraction, str]:
+    """
+    Valida el archivo subido y extrae su texto.
+
+    Args:
+        file: Archivo PDF subido
+        pdf_service: Servicio de PDF
+        max_text_length: Longitud máxima del texto; None para usar la del servicio
+
+    Returns:
+        Tupla (texto extraído y páginas recorridas, digest SHA-256 del archivo)
+
+    Raises:
+        HTTPException: Si el archivo no es un PDF, es demasiado grande o no se puede procesar
+    """
+    pdf_path, digest = await _receive_pdf(file, pdf_service)
+    extraccion = await _extract_received_pdf(pdf_path, digest, pdf_service, max_text_length)
+    return extraccion, digest
+
+
+async def _extract_received_pdf(
+    pdf_path: str,
+    digest: str,
+    pdf_service: PDFService,
+    max_text_length: Optional[int] = None
+) -> PDFExtraction:
+    """
+    Extrae el texto de un PDF ya recibido y borra su archivo temporal.
+
+    Args:
+        pdf_path: Ruta del archivo temporal devuelta por _receive_pdf
+        digest: Digest SHA-256 del archivo
+        pdf_service: Servicio de PDF
+        max_text_length: Longitud máxima del texto; None para usar la del servicio
+
+    Returns:
+        Texto extraído y páginas recorridas
+
+    Raises:
+        HTTPException: Si el PDF no se puede procesar
+    """
+    try:
+        # Extraer texto del PDF (o reutilizarlo si el mismo archivo ya se procesó)
+        return await pdf_service.extract_text(pdf_path, digest=digest, max_text_length=max_text_length)
+    except PDFServiceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error inesperado al procesar PDF: {str(e)}"
+        )
+    finally:
+        os.unlink(pdf_path)
+
+
+def _max_text_length(modo: PDFQuestionsMode, pipeline: Optional[QuestionPipeline]) -> Optional[int]:
+    """Longitud máxima del texto a extraer según el modo."""
+    return pipeline.max_text_length if modo == "completo" and pipeline else None
+
+
+def _discard_received(recibidos: list) -> None:
+    """Borra los archivos temporales que sigan existiendo."""
+    for recibido in recibidos:
+        if isinstance(recibido, tuple):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(recibido[0])
+
+
+def _record_demand(gemini_service: GeminiService, digest: str, nombre_archivo: str, modo: PDFQuestionsMode) -> None:
+    """Suma una petición al PDF. Solo en modo truncado, el que mantiene en caché el precalentamiento."""
+    if modo == "truncado" and gemini_service.demand is not None:
+        gemini_service.demand.record(PDF, digest, nombre_archivo)
+
+
+async def _generate_questions(
+    nombre_archivo: str,
+    extraccion: PDFExtraction,
+    digest: str,
+    modo: PDFQuestionsMode,
+    gemini_service: GeminiService,
+    pipeline: Optional[QuestionPipeline]
+) -> PDFQuestionsResponse:
+    """
+    Genera las preguntas del texto extraído según el modo.
+
+    Raises:
+        GeminiServiceError: Si hay un error al generar las preguntas
+    """
+    _record_demand(gemini_service, digest, nombre_archivo, modo)
+    secciones = 1
+    if modo == "completo":
+        resultado = await pipeline.generate(extraccion.texto, digest=digest)
+        secciones = resultado.secciones
+    else:
+        resultado = await gemini_service.generate_questions_from_text(extraccion.texto, digest=digest)
+
+    return PDFQuestionsResponse(
+        nombre_archivo=nombre_archivo,
+        preguntas=resultado.text,
+        cached=resultado.cached,
+        paginas_totales=extraccion.paginas_totales,
+        paginas_procesadas=extraccion.paginas_procesadas,
+        paginas_omitidas=extraccion.paginas_omitidas,
+        modo=modo,
+        secciones=secciones,
+        caracteres_ahorrados=extraccion.caracteres_ahorrados,
+        tokens_ahorrados=extraccion.caracteres_ahorrados // CHARS_PER_TOKEN,
+        success=True
+    )
+
 
 @router.post("/generar-preguntas", response_model=PDFQuestionsResponse)
 async def generar_preguntas_pdf(
     file: UploadFile = File(...),
+    modo: PDFQuestionsMode = Query("truncado", description="truncado: solo el inicio del PDF; completo: todo el documento por secciones"),
     gemini_service: Optional[GeminiService] = Depends(get_gemini_service),
-    pdf_service: PDFService = Depends(get_pdf_service)
+    pdf_service: PDFService = Depends(get_pdf_service),
+    pipeline: Optional[QuestionPipeline] = Depends(get_question_pipeline)
 ):
     """
     Genera preguntas educativas basadas en el contenido de un PDF usando Gemini.
-    
+    En modo completo el texto se divide en secciones, se generan preguntas por
+    sección en paralelo y se fusionan en una lista final sin duplicados.
+
     Args:
         file: Archivo PDF a procesar
+        modo: Modo de generación (truncado o completo)
         gemini_service: Servicio de Gemini (inyectado)
         pdf_service: Servicio de PDF (inyectado)
-        
+        pipeline: Pipeline de preguntas por secciones (inyectado)
+
     Returns:
         Respuesta con las preguntas generadas
-        
+
     Raises:
         HTTPException: Si hay un error al procesar el PDF o generar preguntas
     """
-    if not gemini_service:
-        raise HTTPException(
-            status_code=500,
-            detail="API key de Gemini no configurada. Por favor, configura GEMINI_API_KEY en el archivo .env"
-        )
-    
-    # Validar que el archivo sea un PDF
-    if not pdf_service.validate_pdf_content_type(file.content_type):
-        raise HTTPException(
-            status_code=400,
-            detail="El archivo debe ser un PDF (application/pdf)"
-        )
-    
+    _ensure_gemini_configured(gemini_service)
+    extraccion, digest = await _extract_pdf_text(file, pdf_service, _max_text_length(modo, pipeline))
+
     try:
-        # Leer el contenido del archivo
-        pdf_content = await file.read()
-        
-        # Extraer texto del PDF
-        texto_pdf = pdf_service.extract_text(pdf_content)
-        
         # Generar preguntas usando Gemini
-        preguntas = gemini_service.generate_questions_from_text(texto_pdf)
-        
-        return PDFQuestionsResponse(
-            nombre_archivo=file.filename or "documento.pdf",
-            preguntas=preguntas,
-            success=True
+        return await _generate_questions(
+            file.filename or "documento.pdf", extraccion, digest, modo, gemini_service, pipeline
+        )
+
+    except GeminiUnavailableError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
         )
-    
-    except (PDFServiceError, GeminiServiceError) as e:
+    except GeminiServiceError as e:
         raise HTTPException(
-            status_code=400 if isinstance(e, PDFServiceError) else 500,
+            status_code=500,
             detail=str(e)
         )
     except Exception as e:
@@ -73,3 +299,223 @@ async def generar_preguntas_pdf(
             detail=f"Error inesperado al procesar PDF: {str(e)}"
         )
 
+
+@router.post("/generar-preguntas/stream")
+async def generar_preguntas_pdf_stream(
+    file: UploadFile = File(...),
+    modo: PDFQuestionsMode = Query("truncado", description="truncado: solo el inicio del PDF; completo: todo el documento por secciones"),
+    gemini_service: Optional[GeminiService] = Depends(get_gemini_service),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    pipeline: Optional[QuestionPipeline] = Depends(get_question_pipeline)
+):
+    """
+    Genera preguntas educativas basadas en un PDF y las envía por fragmentos
+    como Server-Sent Events a medida que Gemini las produce.
+    La validación y la extracción de texto ocurren antes de abrir el stream,
+    por lo que sus errores se devuelven como respuestas HTTP normales.
+
+    En modo completo, las secciones se procesan antes de enviar la fusión final por fragmentos.
+
+    Args:
+        file: Archivo PDF a procesar
+        modo: Modo de generación (truncado o completo)
+        gemini_service: Servicio de Gemini (inyectado)
+        pdf_service: Servicio de PDF (inyectado)
+        pipeline: Pipeline de preguntas por secciones (inyectado)
+
+    Returns:
+        Respuesta text/event-stream con los fragmentos de las preguntas
+
+    Raises:
+        HTTPException: Si hay un error al procesar el PDF
+    """
+    _ensure_gemini_configured(gemini_service)
+    extraccion, digest = await _extract_pdf_text(file, pdf_service, _max_text_length(modo, pipeline))
+
+    _record_demand(gemini_service, digest, file.filename or "documento.pdf", modo)
+    if modo == "completo":
+        chunks = pipeline.generate_stream(extraccion.texto, digest=digest)
+    else:
+        chunks = gemini_service.generate_questions_stream(extraccion.texto, digest=digest)
+
+    return sse_response(
+        chunks,
+        start={
+            "nombre_archivo": file.filename or "documento.pdf",
+            "modo": modo,
+            "paginas_totales": extraccion.paginas_totales,
+            "paginas_procesadas": extraccion.paginas_procesadas,
+            "paginas_omitidas": extraccion.paginas_omitidas,
+            "caracteres_ahorrados": extraccion.caracteres_ahorrados,
+            "tokens_ahorrados": extraccion.caracteres_ahorrados // CHARS_PER_TOKEN
+        }
+    )
+
+
+@router.post(
+    "/generar-preguntas-lote",
+    response_model=PDFBatchResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": "JSON o, con stream=true, NDJSON"}}
+)
+async def generar_preguntas_pdf_lote(
+    files: list[UploadFile] = File(...),
+    modo: PDFQuestionsMode = Query("truncado", description="truncado: solo el inicio del PDF; completo: todo el documento por secciones"),
+    stream: bool = Query(False, description="Enviar cada resultado como una línea NDJSON en cuanto termina"),
+    gemini_service: Optional[GeminiService] = Depends(get_gemini_service),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    pipeline: Optional[QuestionPipeline] = Depends(get_question_pipeline)
+):
+    """
+    Genera preguntas para varios PDFs en una sola petición.
+    Cada archivo se valida y se copia a un archivo temporal al recibirlo; después
+    se extraen y generan en paralelo (como mucho BATCH_CONCURRENCY a la vez)
+    usando las cachés de texto y preguntas. El error de un archivo (no es un PDF,
+    demasiado grande, fallo de Gemini) no interrumpe el resto: cada resultado
+    indica su estado con el código que habría devuelto /generar-preguntas.
+
+    Args:
+        files: Archivos PDF a procesar
+        modo: Modo de generación (truncado o completo)
+        stream: Si es True, la respuesta es NDJSON en orden de finalización
+        gemini_service: Servicio de Gemini (inyectado)
+        pdf_service: Servicio de PDF (inyectado)
+        pipeline: Pipeline de preguntas por secciones (inyectado)
+
+    Returns:
+        Resultados en el orden de la petición, o un stream NDJSON
+
+    Raises:
+        HTTPException: 422 si el lote supera BATCH_MAX_ITEMS, 413 si la subida supera BATCH_MAX_UPLOAD_BYTES
+    """
+    _ensure_gemini_configured(gemini_service)
+    if len(files) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"El lote supera el máximo de {settings.BATCH_MAX_ITEMS} archivos"
+        )
+    max_text_length = _max_text_length(modo, pipeline)
+    nombres = [file.filename or "documento.pdf" for file in files]
+
+    # Los archivos subidos se cierran al volver del endpoint: se copian antes de
+    # responder para que el stream NDJSON pueda seguir procesándolos
+    recibidos: list[Union[tuple[str, str], HTTPException]] = []
+    try:
+        for file in files:
+            try:
+                recibidos.append(await _receive_pdf(file, pdf_service))
+            except HTTPException as e:
+                recibidos.append(e)
+    except BaseException:
+        _discard_received(recibidos)
+        raise
+
+    async def procesar(indice: int) -> PDFQuestionsResponse:
+        recibido = recibidos[indice]
+        if isinstance(recibido, HTTPException):
+            raise recibido
+        pdf_path, digest = recibido
+        extraccion = await _extract_received_pdf(pdf_path, digest, pdf_service, max_text_length)
+        return await _generate_questions(nombres[indice], extraccion, digest, modo, gemini_service, pipeline)
+
+    def resultado(indice: int, outcome: Union[PDFQuestionsResponse, Exception]) -> PDFBatchItem:
+        if isinstance(outcome, Exception):
+            return PDFBatchItem(indice=indice, nombre_archivo=nombres[indice], **error_fields(outcome))
+        return PDFBatchItem(indice=indice, nombre_archivo=nombres[indice], resultado=outcome)
+
+    async def resultados():
+        try:
+            async for indice, outcome in run_batch(range(len(files)), procesar, settings.BATCH_CONCURRENCY):
+                yield resultado(indice, outcome)
+        finally:
+            # Archivos de los elementos cancelados antes de empezar
+            _discard_received(recibidos)
+
+    if stream:
+        return ndjson_response(resultados())
+    return PDFBatchResponse(**batch_summary([item async for item in resultados()]))
+
+
+@router.post("/jobs", response_model=PDFJobResponse, status_code=202)
+async def crear_trabajo_pdf(
+    file: UploadFile = File(...),
+    modo: PDFQuestionsMode = Query("truncado", description="truncado: solo el inicio del PDF; completo: todo el documento por secciones"),
+    gemini_service: Optional[GeminiService] = Depends(get_gemini_service),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    pipeline: Optional[QuestionPipeline] = Depends(get_question_pipeline),
+    job_service: JobService = Depends(get_job_service)
+):
+    """
+    Encola la generación de preguntas de un PDF y devuelve el id del trabajo
+    sin esperar a que termine. El estado y el resultado se consultan con
+    GET /pdf/jobs/{id}. La subida se valida antes de encolarla.
+
+    Args:
+        file: Archivo PDF a procesar
+        modo: Modo de generación (truncado o completo)
+        gemini_service: Servicio de Gemini (inyectado)
+        pdf_service: Servicio de PDF (inyectado)
+        pipeline: Pipeline de preguntas por secciones (inyectado)
+        job_service: Cola de trabajos (inyectada)
+
+    Returns:
+        El trabajo creado, en estado pendiente (202)
+
+    Raises:
+        HTTPException: 400/413 si el archivo no es válido, 429 si la cola está llena
+    """
+    _ensure_gemini_configured(gemini_service)
+    pdf_path, digest = await _receive_pdf(file, pdf_service)
+    nombre_archivo = file.filename or "documento.pdf"
+
+    async def run() -> dict:
+        extraccion = await pdf_service.extract_text(
+            pdf_path, digest=digest, max_text_length=_max_text_length(modo, pipeline)
+        )
+        respuesta = await _generate_questions(
+            nombre_archivo, extraccion, digest, modo, gemini_service, pipeline
+        )
+        return respuesta.model_dump()
+
+    try:
+        job = await job_service.submit(
+            run,
+            cleanup=lambda: os.unlink(pdf_path),
+            nombre_archivo=nombre_archivo,
+            modo=modo
+        )
+    except JobQueueFullError as e:
+        os.unlink(pdf_path)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(job_service.retry_after())}
+        )
+    except BaseException:
+        # El trabajo no se encoló: nadie más borrará la subida
+        os.unlink(pdf_path)
+        raise
+    return PDFJobResponse(**job)
+
+
+@router.get("/jobs/{job_id}", response_model=PDFJobResponse)
+async def obtener_trabajo_pdf(
+    job_id: str,
+    job_service: JobService = Depends(get_job_service)
+):
+    """
+    Devuelve el estado de un trabajo y, si ha terminado, su resultado o error.
+
+    Args:
+        job_id: Id devuelto por POST /pdf/jobs
+        job_service: Cola de trabajos (inyectada)
+
+    Returns:
+        El estado del trabajo
+
+    Raises:
+        HTTPException: 404 si el trabajo no existe o su resultado ya expiró
+    """
+    job = await job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    return PDFJobResponse(**job)
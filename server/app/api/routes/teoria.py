@@ -2,12 +2,17 @@
 Rutas para la generación de teoría.
 Sigue el principio de Single Responsibility: solo maneja las rutas relacionadas con teoría.
 """
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.schemas import TheoryRequest, TheoryResponse
-from app.services.gemini_service import GeminiService
+import math
+from typing import Optional, Union
+from fastapi import APIRouter, Body, HTTPException, Depends, Query, Request
+from app.api.batch import NDJSON_MEDIA_TYPE, batch_summary, error_fields, ndjson_response, run_batch
+from app.api.http_cache import cacheable_response, make_etag, not_modified
+from app.api.sse import sse_response
+from app.models.schemas import TheoryBatchItem, TheoryBatchResponse, TheoryRequest, TheoryResponse
+from app.services.gemini_service import GeminiService, GenerationResult
+from app.core.config import settings
 from app.core.dependencies import get_gemini_service
-from app.core.exceptions import GeminiServiceError
+from app.core.exceptions import GeminiServiceError, GeminiUnavailableError
 
 router = APIRouter(prefix="/teoria", tags=["teoría"])
 
@@ -37,13 +42,21 @@ async def generar_teoria(
         )
     
     try:
-        teoria = gemini_service.generate_theory(request.tema)
+        resultado = await gemini_service.generate_theory(request.tema)
         
         return TheoryResponse(
             tema=request.tema,
-            teoria=teoria,
+            teoria=resultado.text,
+            cached=resultado.cached,
+            tema_similar=resultado.matched_tema,
             success=True
         )
+    except GeminiUnavailableError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
     except GeminiServiceError as e:
         raise HTTPException(
             status_code=500,
@@ -55,3 +68,136 @@ async def generar_teoria(
             detail=f"Error inesperado al generar teoría: {str(e)}"
         )
 
+
+@router.get(
+    "/generar",
+    response_model=TheoryResponse,
+    responses={304: {"description": "La teoría no ha cambiado desde el ETag enviado en If-None-Match"}}
+)
+async def obtener_teoria(
+    request: Request,
+    tema: str = Query(..., min_length=1, max_length=500, description="Tema sobre el cual generar teoría"),
+    gemini_service: Optional[GeminiService] = Depends(get_gemini_service)
+):
+    """
+    Variante GET de /generar, cacheable por navegadores y CDN.
+    La respuesta lleva ETag (derivado del tema y la teoría) y Cache-Control.
+    Si el cliente envía If-None-Match, se compara antes de generar con el
+    ETag de la teoría que hay en la caché del servidor: si coincide se
+    responde 304 sin llamar a Gemini. Sin esa entrada en caché (expirada o
+    caché desactivada) se genera como en el POST y la revalidación solo
+    ahorra la transferencia del cuerpo.
+    
+    Args:
+        request: Petición, de la que se lee If-None-Match
+        tema: El tema, como parámetro de la URL
+        gemini_service: Servicio de Gemini (inyectado)
+        
+    Returns:
+        Respuesta con la teoría generada, o 304 Not Modified
+        
+    Raises:
+        HTTPException: Si hay un error al generar la teoría
+    """
+    if gemini_service is not None and request.headers.get("if-none-match"):
+        cached = await gemini_service.peek_theory(tema)
+        if cached is not None:
+            response = not_modified(request, make_etag(tema, cached), settings.THEORY_HTTP_MAX_AGE_SECONDS)
+            if response is not None:
+                return response
+    respuesta = await generar_teoria(TheoryRequest(tema=tema), gemini_service)
+    return cacheable_response(
+        request,
+        respuesta,
+        etag=make_etag(respuesta.tema, respuesta.teoria),
+        max_age=settings.THEORY_HTTP_MAX_AGE_SECONDS
+    )
+
+
+@router.post(
+    "/generar-lote",
+    response_model=TheoryBatchResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": "JSON o, con stream=true, NDJSON"}}
+)
+async def generar_teoria_lote(
+    requests: list[TheoryRequest] = Body(..., min_length=1),
+    stream: bool = Query(False, description="Enviar cada resultado como una línea NDJSON en cuanto termina"),
+    gemini_service: Optional[GeminiService] = Depends(get_gemini_service)
+):
+    """
+    Genera teoría para varios temas en una sola petición.
+    Los temas se procesan en paralelo (como mucho BATCH_CONCURRENCY a la vez)
+    usando la caché y la coalescencia de peticiones de GeminiService, y el
+    error de un tema no interrumpe el resto: cada resultado indica su estado.
+    
+    Args:
+        requests: Lista de solicitudes con el tema
+        stream: Si es True, la respuesta es NDJSON en orden de finalización
+        gemini_service: Servicio de Gemini (inyectado)
+        
+    Returns:
+        Resultados en el orden de la petición, o un stream NDJSON
+        
+    Raises:
+        HTTPException: 422 si el lote supera BATCH_MAX_ITEMS, 500 si Gemini no está configurado
+    """
+    if not gemini_service:
+        raise HTTPException(
+            status_code=500,
+            detail="API key de Gemini no configurada. Por favor, configura GEMINI_API_KEY en el archivo .env"
+        )
+    if len(requests) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"El lote supera el máximo de {settings.BATCH_MAX_ITEMS} temas"
+        )
+    
+    async def generar(request: TheoryRequest) -> GenerationResult:
+        return await gemini_service.generate_theory(request.tema)
+    
+    def resultado(indice: int, outcome: Union[GenerationResult, Exception]) -> TheoryBatchItem:
+        tema = requests[indice].tema
+        if isinstance(outcome, Exception):
+            return TheoryBatchItem(indice=indice, tema=tema, **error_fields(outcome))
+        return TheoryBatchItem(
+            indice=indice, tema=tema, teoria=outcome.text, cached=outcome.cached, tema_similar=outcome.matched_tema
+        )
+    
+    resultados = (
+        resultado(indice, outcome)
+        async for indice, outcome in run_batch(requests, generar, settings.BATCH_CONCURRENCY)
+    )
+    if stream:
+        return ndjson_response(resultados)
+    return TheoryBatchResponse(**batch_summary([item async for item in resultados]))
+
+
+@router.post("/generar/stream")
+async def generar_teoria_stream(
+    request: TheoryRequest,
+    gemini_service: Optional[GeminiService] = Depends(get_gemini_service)
+):
+    """
+    Genera teoría educativa sobre un tema dado y la envía por fragmentos
+    como Server-Sent Events a medida que Gemini la produce.
+    
+    Args:
+        request: Solicitud con el tema
+        gemini_service: Servicio de Gemini (inyectado)
+        
+    Returns:
+        Respuesta text/event-stream con los fragmentos de la teoría
+        
+    Raises:
+        HTTPException: Si Gemini no está configurado
+    """
+    if not gemini_service:
+        raise HTTPException(
+            status_code=500,
+            detail="API key de Gemini no configurada. Por favor, configura GEMINI_API_KEY en el archivo .env"
+        )
+    
+    return sse_response(
+        gemini_service.generate_theory_stream(request.tema),
+        start={"tema": request.tema}
+    )
@@ -0,0 +1,78 @@
+"""
+Utilidades para respuestas Server-Sent Events (SSE).
+Convierte los fragmentos generados por Gemini en eventos que el cliente
+recibe a medida que llegan.
+
+Formato de eventos:
+    event: start  -> metadatos de la petición (tema, nombre de archivo...)
+    data          -> {"texto": "<fragmento>"} (evento por defecto, "message")
+    event: done   -> {"success": true}
+    event: error  -> {"detail": "<mensaje>", "success": false, "retry_after": <segundos, opcional>}
+"""
+import json
+import math
+from typing import AsyncIterator, Optional
+from fastapi.responses import StreamingResponse
+from app.core.exceptions import EduAppException, GeminiUnavailableError
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """
+    Serializa un evento SSE.
+
+    Args:
+        data: Datos del evento (se envían como JSON)
+        event: Nombre del evento; None para el evento por defecto
+
+    Returns:
+        El evento listo para escribir en la respuesta
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+async def _sse_events(chunks: AsyncIterator[str], start: Optional[dict]) -> AsyncIterator[str]:
+    """Envuelve los fragmentos en eventos SSE y reporta los errores como evento."""
+    if start is not None:
+        yield format_sse(start, event="start")
+    try:
+        async for chunk in chunks:
+            yield format_sse({"texto": chunk})
+    except GeminiUnavailableError as e:
+        # El estado HTTP ya se envió: el tiempo de reintento viaja en el evento
+        yield format_sse(
+            {"detail": str(e), "success": False, "retry_after": math.ceil(e.retry_after)},
+            event="error"
+        )
+        return
+    except EduAppException as e:
+        yield format_sse({"detail": str(e), "success": False}, event="error")
+        return
+    except Exception as e:
+        yield format_sse({"detail": f"Error inesperado: {str(e)}", "success": False}, event="error")
+        return
+    yield format_sse({"success": True}, event="done")
+
+
+def sse_response(chunks: AsyncIterator[str], start: Optional[dict] = None) -> StreamingResponse:
+    """
+    Crea una respuesta SSE a partir de un iterador de fragmentos de texto.
+
+    Args:
+        chunks: Iterador asíncrono con los fragmentos generados
+        start: Metadatos a enviar en el evento inicial (opcional)
+
+    Returns:
+        StreamingResponse con media type text/event-stream
+    """
+    return StreamingResponse(
+        _sse_events(chunks, start),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Evita que proxies como nginx acumulen la respuesta
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -2,13 +2,14 @@
 Configuración de la aplicación con seguridad mejorada.
 Maneja todas las variables de entorno y configuraciones de forma segura.
 """
-from typing import Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal, Optional
 from pydantic import Field, SecretStr, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from dotenv import load_dotenv
 
-# Cargar variables de entorno
-load_dotenv()
+# .env del servidor, sea cual sea el directorio de trabajo
+SERVER_ENV_FILE = Path(__file__).resolve().parents[2] / ".env"
 
 
 class Settings(BaseSettings):
@@ -19,7 +20,8 @@ class Settings(BaseSettings):
     """
     
     model_config = SettingsConfigDict(
-        env_file=".env",
+        # El .env del directorio de trabajo, si existe, tiene prioridad
+        env_file=(SERVER_ENV_FILE, ".env"),
         env_file_encoding="utf-8",
         case_sensitive=True,
         # No permitir valores por defecto inseguros
@@ -34,6 +36,123 @@ class Settings(BaseSettings):
     # Server Configuration
     HOST: str = Field(default="0.0.0.0", description="Host del servidor")
     PORT: int = Field(default=8000, ge=1, le=65535, description="Puerto del servidor")
+    METRICS_ENABLED: bool = Field(
+        default=True,
+        description="Exponer métricas de Prometheus en /metrics"
+    )
+    
+    # Production Server Configuration (python main.py --prod)
+    WORKERS: int = Field(
+        default=1,
+        ge=1,
+        description="Procesos worker de uvicorn; los límites hacia Gemini se reparten entre ellos"
+    )
+    SERVER_LOOP: Literal["auto", "uvloop", "asyncio"] = Field(
+        default="auto",
+        description="Event loop de uvicorn (auto usa uvloop si está instalado)"
+    )
+    SERVER_HTTP: Literal["auto", "httptools", "h11"] = Field(
+        default="auto",
+        description="Parser HTTP de uvicorn (auto usa httptools si está instalado)"
+    )
+    WORKER_MAX_REQUESTS: int = Field(
+        default=10000,
+        ge=0,
+        description="Peticiones tras las que se recicla un worker (0 para no reciclar)"
+    )
+    WORKER_MAX_REQUESTS_JITTER: int = Field(
+        default=1000,
+        ge=0,
+        description="Margen aleatorio sumado a WORKER_MAX_REQUESTS en cada worker para que no se reciclen a la vez"
+    )
+    GRACEFUL_SHUTDOWN_SECONDS: int = Field(
+        default=90,
+        ge=0,
+        description="Segundos para terminar las peticiones y trabajos en curso al detener un worker"
+    )
+    KEEPALIVE_TIMEOUT_SECONDS: int = Field(
+        default=5,
+        ge=1,
+        description="Segundos que se mantiene abierta una conexión inactiva de un cliente"
+    )
+    BACKLOG: int = Field(
+        default=2048,
+        ge=1,
+        description="Conexiones pendientes de aceptar como máximo"
+    )
+    ACCESS_LOG: bool = Field(
+        default=True,
+        description="Registrar cada petición en el log de acceso"
+    )
+    
+    # HTTP Caching and Compression
+    THEORY_HTTP_MAX_AGE_SECONDS: int = Field(
+        default=3600,
+        ge=0,
+        description="Cache-Control max-age de GET /api/teoria/generar (0 para revalidar siempre con If-None-Match)"
+    )
+    COMPRESSION_ENABLED: bool = Field(
+        default=True,
+        description="Comprimir con brotli o gzip las respuestas JSON y de texto"
+    )
+    COMPRESSION_MIN_SIZE: int = Field(
+        default=1000,
+        ge=0,
+        description="Tamaño mínimo en bytes de una respuesta para comprimirla"
+    )
+    COMPRESSION_GZIP_LEVEL: int = Field(
+        default=6,
+        ge=1,
+        le=9,
+        description="Nivel de compresión de gzip"
+    )
+    COMPRESSION_BROTLI_QUALITY: int = Field(
+        default=4,
+        ge=0,
+        le=11,
+        description="Calidad de compresión de brotli (requiere el paquete brotli)"
+    )
+    
+    # Profiling and Tracing (bajo demanda, por cabecera o por muestreo)
+    PROFILING_ENABLED: bool = Field(
+        default=False,
+        description="Permitir perfilar peticiones (árbol de spans, muestras de pila y pico de memoria)"
+    )
+    PROFILING_HEADER: str = Field(
+        default="X-EduApp-Profile",
+        description="Cabecera con la que el cliente pide perfilar una petición"
+    )
+    PROFILING_TOKEN: Optional[SecretStr] = Field(
+        default=None,
+        description="Valor que debe llevar la cabecera de perfilado; sin configurar, basta con enviarla"
+    )
+    PROFILING_SAMPLE_RATE: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Fracción de las peticiones que se perfilan sin pedirlo (0 para solo por cabecera)"
+    )
+    PROFILING_CPU_INTERVAL_MS: float = Field(
+        default=5.0,
+        ge=0.0,
+        description="Milisegundos entre muestras de pila de las peticiones perfiladas (0 para no muestrear)"
+    )
+    PROFILING_TRACEMALLOC: bool = Field(
+        default=True,
+        description="Medir el pico de memoria de las peticiones perfiladas con tracemalloc"
+    )
+    PROFILING_EXPORT: Literal["file", "otlp"] = Field(
+        default="file",
+        description="Destino de las trazas: file (JSON Lines) u otlp (colector OpenTelemetry por HTTP)"
+    )
+    PROFILING_FILE_PATH: str = Field(
+        default="traces/traces.jsonl",
+        description="Archivo JSON Lines de las trazas (PROFILING_EXPORT=file)"
+    )
+    PROFILING_OTLP_ENDPOINT: str = Field(
+        default="http://127.0.0.1:4318/v1/traces",
+        description="Endpoint OTLP/HTTP del colector (PROFILING_EXPORT=otlp)"
+    )
     
     # CORS Configuration
     CORS_ORIGINS: list[str] = Field(
@@ -51,6 +170,229 @@ class Settings(BaseSettings):
         default="gemini-2.0-flash-exp",
         description="Modelo de Gemini a utilizar"
     )
+    GEMINI_BASE_URL: Optional[str] = Field(
+        default=None,
+        description="URL base alternativa de la API de Gemini (por ejemplo, un stub local)"
+    )
+    
+    # Gemini HTTP Pool Configuration
+    GEMINI_MAX_CONNECTIONS: int = Field(
+        default=100,
+        ge=1,
+        description="Máximo de conexiones simultáneas hacia Gemini"
+    )
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        default=20,
+        ge=0,
+        description="Máximo de conexiones inactivas reutilizables hacia Gemini"
+    )
+    GEMINI_KEEPALIVE_EXPIRY: float = Field(
+        default=30.0,
+        gt=0,
+        description="Segundos que una conexión inactiva se mantiene abierta"
+    )
+    GEMINI_HTTP2: bool = Field(
+        default=True,
+        description="Usar HTTP/2 hacia Gemini si el paquete h2 está instalado"
+    )
+    
+    # Gemini Outbound Rate Limiting
+    GEMINI_MAX_IN_FLIGHT: int = Field(
+        default=32,
+        ge=1,
+        description="Máximo de peticiones simultáneas en curso hacia Gemini"
+    )
+    GEMINI_REQUESTS_PER_MINUTE: int = Field(
+        default=1000,
+        ge=0,
+        description="Peticiones por minuto hacia Gemini (0 para no limitar)"
+    )
+    GEMINI_TOKENS_PER_MINUTE: int = Field(
+        default=1_000_000,
+        ge=0,
+        description="Tokens de entrada estimados por minuto hacia Gemini (0 para no limitar)"
+    )
+    GEMINI_MAX_WAITERS: int = Field(
+        default=100,
+        ge=0,
+        description="Peticiones esperando admisión como máximo; las siguientes reciben 503"
+    )
+    GEMINI_MAX_WAIT_SECONDS: float = Field(
+        default=10.0,
+        ge=0,
+        description="Espera máxima por admisión antes de responder 429/503 con Retry-After"
+    )
+    
+    # Gemini Resilience (plazos, reintentos, hedging y circuit breaker)
+    GEMINI_DEADLINE_SECONDS: float = Field(
+        default=60.0,
+        gt=0,
+        description="Plazo total de cada llamada a Gemini, reintentos incluidos"
+    )
+    GEMINI_MAX_RETRIES: int = Field(
+        default=2,
+        ge=0,
+        description="Reintentos ante errores transitorios (plazo agotado, red, 429, 5xx)"
+    )
+    GEMINI_RETRY_BASE_DELAY_SECONDS: float = Field(
+        default=0.5,
+        gt=0,
+        description="Espera base de los reintentos (exponencial con jitter)"
+    )
+    GEMINI_RETRY_MAX_DELAY_SECONDS: float = Field(
+        default=8.0,
+        gt=0,
+        description="Espera máxima entre reintentos"
+    )
+    GEMINI_HEDGE_AFTER_SECONDS: float = Field(
+        default=0.0,
+        ge=0,
+        description="Segundos tras los que se duplica una llamada lenta (0 para desactivar)"
+    )
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = Field(
+        default=5,
+        ge=1,
+        description="Fallos consecutivos de Gemini que abren el circuit breaker"
+    )
+    GEMINI_BREAKER_RESET_SECONDS: float = Field(
+        default=30.0,
+        gt=0,
+        description="Segundos que el circuito permanece abierto antes de probar de nuevo"
+    )
+    GEMINI_WARMUP: bool = Field(
+        default=False,
+        description="Abrir la conexión con Gemini al arrancar, antes de aceptar peticiones"
+    )
+    GEMINI_WARMUP_TIMEOUT_SECONDS: float = Field(
+        default=5.0,
+        gt=0,
+        description="Espera máxima del calentamiento de la conexión con Gemini"
+    )
+    
+    # Gemini Model Routing (modelo rápido para entradas cortas, principal para las largas)
+    GEMINI_ROUTING_ENABLED: bool = Field(
+        default=False,
+        description="Elegir entre GEMINI_FAST_MODEL y GEMINI_MODEL según el tamaño de la entrada y la salud de cada modelo"
+    )
+    GEMINI_FAST_MODEL: str = Field(
+        default="gemini-2.0-flash-lite",
+        description="Modelo rápido para las entradas cortas y de respaldo cuando el principal está degradado"
+    )
+    GEMINI_FAST_MAX_INPUT_CHARS: int = Field(
+        default=2000,
+        ge=1,
+        description="Caracteres de la entrada (tema o texto) hasta los que se usa el modelo rápido"
+    )
+    GEMINI_ROUTING_OPERATIONS: dict[Literal["teoria", "preguntas", "fusion"], Literal["rapido", "principal"]] = Field(
+        default={},
+        description='Tier fijo por operación, en JSON (p. ej. {"fusion": "principal"}); el resto va por tamaño'
+    )
+    GEMINI_ROUTING_WINDOW_SECONDS: float = Field(
+        default=60.0,
+        gt=0,
+        description="Ventana de latencia y errores con la que se juzga la salud de cada modelo"
+    )
+    GEMINI_ROUTING_MIN_SAMPLES: int = Field(
+        default=5,
+        ge=1,
+        description="Llamadas en la ventana necesarias para considerar degradado un modelo"
+    )
+    GEMINI_ROUTING_SLOW_SECONDS: float = Field(
+        default=20.0,
+        gt=0,
+        description="Latencia media a partir de la cual el modelo principal se considera degradado"
+    )
+    GEMINI_ROUTING_MAX_ERROR_RATE: float = Field(
+        default=0.5,
+        gt=0,
+        le=1,
+        description="Tasa de error a partir de la cual el modelo principal se considera degradado"
+    )
+    
+    # Theory Cache Configuration
+    THEORY_CACHE_BACKEND: Literal["memory", "sqlite", "none"] = Field(
+        default="memory",
+        description="Backend de la caché de teoría: memory (LRU por proceso), sqlite (persistente) o none"
+    )
+    THEORY_CACHE_MAX_ENTRIES: int = Field(
+        default=1000,
+        ge=1,
+        description="Número máximo de teorías en caché antes de desalojar (LRU)"
+    )
+    THEORY_CACHE_TTL_SECONDS: int = Field(
+        default=86400,
+        ge=1,
+        description="Segundos de validez de una teoría en caché"
+    )
+    THEORY_CACHE_PATH: str = Field(
+        default="cache/theory_cache.sqlite3",
+        description="Ruta del archivo SQLite de la caché de teoría"
+    )
+    THEORY_SIMILAR_TOPICS: bool = Field(
+        default=False,
+        description="Reutilizar la teoría en caché de un tema parecido ya respondido (requiere caché de teoría); desactivado por defecto porque puede servir la teoría de otro tema"
+    )
+    THEORY_SIMILARITY_THRESHOLD: float = Field(
+        default=0.75,
+        ge=0.5,
+        le=1.0,
+        description="Similitud mínima (coseno de trigramas de caracteres) entre temas con las mismas raíces de palabras para considerarlos equivalentes"
+    )
+    THEORY_TOPIC_INDEX_MAX_ENTRIES: int = Field(
+        default=100000,
+        ge=1,
+        description="Temas como máximo en el índice de temas parecidos; al llenarse se descarta la mitad más antigua"
+    )
+    
+    # Demand Tracking and Cache Prewarming
+    DEMAND_BACKEND: Literal["sqlite", "memory", "none"] = Field(
+        default="sqlite",
+        description="Registro de la demanda de temas y PDFs: sqlite (sobrevive a despliegues), memory o none"
+    )
+    DEMAND_DB_PATH: str = Field(
+        default="cache/demand.sqlite3",
+        description="Ruta del archivo SQLite del registro de demanda"
+    )
+    DEMAND_WINDOW_SECONDS: int = Field(
+        default=604800,
+        ge=3600,
+        description="Solo cuenta la demanda de lo pedido en esta ventana; lo no pedido desde entonces se descarta"
+    )
+    PREWARM_ENABLED: bool = Field(
+        default=False,
+        description="Regenerar en segundo plano lo más pedido que no está en caché o va a expirar (requiere DEMAND_BACKEND; consume cuota de Gemini)"
+    )
+    PREWARM_TOP_N: int = Field(
+        default=50,
+        ge=1,
+        description="Temas y PDFs más pedidos (de cada tipo) que se mantienen en caché"
+    )
+    PREWARM_INTERVAL_SECONDS: int = Field(
+        default=600,
+        ge=10,
+        description="Segundos entre ciclos de precalentamiento"
+    )
+    PREWARM_STARTUP_DELAY_SECONDS: float = Field(
+        default=10.0,
+        ge=0,
+        description="Segundos tras el arranque antes del primer ciclo"
+    )
+    PREWARM_REFRESH_BEFORE_SECONDS: int = Field(
+        default=3600,
+        ge=0,
+        description="Se regenera lo que expira de la caché dentro de este margen"
+    )
+    PREWARM_MAX_CALLS_PER_HOUR: int = Field(
+        default=60,
+        ge=1,
+        description="Llamadas a Gemini por hora del precalentamiento (globales, repartidas entre WORKERS)"
+    )
+    PREWARM_MAX_LOAD: float = Field(
+        default=0.25,
+        ge=0,
+        le=1,
+        description="Fracción de GEMINI_MAX_IN_FLIGHT ocupada por encima de la cual el precalentamiento se pausa"
+    )
     
     # PDF Configuration
     MAX_PDF_TEXT_LENGTH: int = Field(
@@ -59,6 +401,131 @@ class Settings(BaseSettings):
         le=100000,
         description="Longitud máxima del texto extraído de PDFs"
     )
+    MAX_PDF_UPLOAD_BYTES: int = Field(
+        default=50 * 1024 * 1024,
+        ge=1024,
+        description="Tamaño máximo de un PDF subido en bytes; las subidas mayores se rechazan con 413"
+    )
+    PDF_UPLOAD_DIR: Optional[str] = Field(
+        default=None,
+        description="Directorio para los archivos temporales de las subidas (None = directorio temporal del sistema)"
+    )
+    PDF_EXTRACTORS: list[Literal["pymupdf", "pypdfium2", "pypdf", "pypdf2"]] = Field(
+        default=["pypdf2", "pypdf"],
+        min_length=1,
+        description="Backends de extracción en orden de preferencia; se omiten los no instalados y, si uno falla con un PDF, se prueba el siguiente. pypdfium2 y pymupdf (AGPL) solo se usan si se añaden explícitamente"
+    )
+    PDF_TEXT_COMPACTION: bool = Field(
+        default=True,
+        description="Quitar cabeceras, pies, números de página, cortes de palabra y párrafos duplicados del texto extraído"
+    )
+    
+    # Modo "completo" de preguntas (map-reduce por secciones)
+    PDF_FULL_MAX_TEXT_LENGTH: int = Field(
+        default=200000,
+        ge=100,
+        le=2000000,
+        description="Longitud máxima del texto extraído en el modo completo"
+    )
+    PDF_SECTION_TOKENS: int = Field(
+        default=2000,
+        ge=100,
+        description="Tokens (estimados) por sección en el modo completo"
+    )
+    PDF_SECTION_CONCURRENCY: int = Field(
+        default=8,
+        ge=1,
+        le=64,
+        description="Secciones procesadas en paralelo en el modo completo"
+    )
+    
+    # Trabajos de PDF en segundo plano (/api/pdf/jobs)
+    PDF_JOB_BACKEND: Literal["memory", "sqlite"] = Field(
+        default="memory",
+        description="Almacenamiento de los trabajos: memory (por proceso) o sqlite (compartido y persistente)"
+    )
+    PDF_JOB_DB_PATH: str = Field(
+        default="cache/pdf_jobs.sqlite3",
+        description="Ruta del archivo SQLite de los trabajos"
+    )
+    PDF_JOB_WORKERS: int = Field(
+        default=2,
+        ge=1,
+        le=64,
+        description="Trabajos de PDF procesados a la vez por proceso"
+    )
+    PDF_JOB_QUEUE_SIZE: int = Field(
+        default=100,
+        ge=1,
+        description="Trabajos en espera como máximo; al superarlo se responde 429"
+    )
+    PDF_JOB_RESULT_TTL_SECONDS: int = Field(
+        default=3600,
+        ge=1,
+        description="Segundos que se conserva el resultado de un trabajo terminado"
+    )
+    
+    # Endpoints por lotes (/api/teoria/generar-lote, /api/pdf/generar-preguntas-lote)
+    BATCH_MAX_ITEMS: int = Field(
+        default=50,
+        ge=1,
+        le=1000,
+        description="Temas o archivos por petición de lote como máximo"
+    )
+    BATCH_CONCURRENCY: int = Field(
+        default=4,
+        ge=1,
+        le=64,
+        description="Elementos de un lote procesados a la vez"
+    )
+    BATCH_MAX_UPLOAD_BYTES: int = Field(
+        default=200 * 1024 * 1024,
+        ge=1024,
+        description="Tamaño máximo del cuerpo de una subida de varios PDFs (cada archivo sigue limitado por MAX_PDF_UPLOAD_BYTES)"
+    )
+    
+    # PDF Extraction Pool Configuration
+    PDF_WORKERS: int = Field(
+        default=2,
+        ge=0,
+        le=64,
+        description="Procesos dedicados al parseo de PDFs (0 = parsear en un hilo del propio proceso)"
+    )
+    PDF_MAX_TASKS_PER_CHILD: Optional[int] = Field(
+        default=50,
+        ge=1,
+        description="PDFs procesados antes de reciclar un proceso (libera memoria); None para no reciclar"
+    )
+    PDF_EXTRACTION_TIMEOUT_SECONDS: float = Field(
+        default=30.0,
+        gt=0,
+        description="Segundos máximos de extracción por documento; al superarlos se mata el proceso"
+    )
+    
+    # PDF Cache Configuration (texto extraído y preguntas por SHA-256 del archivo)
+    PDF_CACHE_BACKEND: Literal["sqlite", "memory", "none"] = Field(
+        default="sqlite",
+        description="Backend de la caché de PDFs: sqlite (persistente), memory o none"
+    )
+    PDF_CACHE_PATH: str = Field(
+        default="cache/pdf_cache.sqlite3",
+        description="Ruta del archivo SQLite de la caché de PDFs"
+    )
+    PDF_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        ge=1,
+        description="Número máximo de entradas en la caché de PDFs"
+    )
+    PDF_CACHE_MAX_BYTES: int = Field(
+        default=256 * 1024 * 1024,
+        ge=1024,
+        description="Tamaño máximo en disco de la caché de PDFs (bytes)"
+    )
+    PDF_CACHE_TTL_SECONDS: int = Field(
+        default=7 * 86400,
+        ge=1,
+        description="Segundos de validez de una entrada de la caché de PDFs"
+    )
     
     @field_validator("GEMINI_API_KEY")
     @classmethod
@@ -117,15 +584,30 @@ class Settings(BaseSettings):
             f")"
         )
 
-# Instancia global de configuración
-try:
-    settings = Settings()
-except Exception as e:
-    # En caso de error, lanzar excepción clara
-    raise RuntimeError(
-        f"Error al cargar configuración: {str(e)}. "
-        "Por favor, verifica tu archivo .env y asegúrate de que GEMINI_API_KEY esté configurada correctamente."
-    )
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Devuelve la instancia global de configuración, creándola en el primer uso.
+    
+    Raises:
+        RuntimeError: Si la configuración no es válida
+    """
+    try:
+        return Settings()
+    except Exception as e:
+        # En caso de error, lanzar excepción clara
+        raise RuntimeError(
+            f"Error al cargar configuración: {str(e)}. "
+            "Por favor, verifica tu archivo .env y asegúrate de que GEMINI_API_KEY esté configurada correctamente."
+        )
+
+
+def __getattr__(name: str):
+    # `from app.core.config import settings` crea la configuración al pedirla, no al
+    # importar el módulo: importar Settings no exige un entorno completo
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def validate_settings() -> None:
@@ -133,9 +615,28 @@ def validate_settings() -> None:
     Valida las configuraciones al inicio de la aplicación.
     Lanza excepciones si hay problemas de configuración.
     """
+    from app.services.pdf_extractors import available_extractors
+    settings = get_settings()
     if not settings.is_gemini_configured:
         raise ValueError(
             "GEMINI_API_KEY no está configurada correctamente. "
             "Por favor, configura GEMINI_API_KEY en el archivo .env"
         )
+    if not available_extractors(settings.PDF_EXTRACTORS):
+        raise ValueError(
+            "Ninguno de los backends de PDF_EXTRACTORS está instalado: "
+            "instala pypdf o PyPDF2 (requirements.txt)"
+        )
+    if settings.WORKERS > 1 and settings.PDF_JOB_BACKEND == "memory":
+        raise ValueError(
+            "Con WORKERS > 1 los trabajos de PDF deben compartirse entre procesos: "
+            "configura PDF_JOB_BACKEND=sqlite"
+        )
 
+    if settings.PREWARM_ENABLED and settings.PREWARM_REFRESH_BEFORE_SECONDS >= min(
+        settings.THEORY_CACHE_TTL_SECONDS, settings.PDF_CACHE_TTL_SECONDS
+    ):
+        raise ValueError(
+            "PREWARM_REFRESH_BEFORE_SECONDS debe ser menor que THEORY_CACHE_TTL_SECONDS y "
+            "PDF_CACHE_TTL_SECONDS: si no, el precalentamiento regeneraría todo en cada ciclo"
+        )
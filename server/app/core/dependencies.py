@@ -2,17 +2,207 @@
 Dependencias de la aplicación.
 Implementa Dependency Injection para seguir el principio de Dependency Inversion.
 """
+import asyncio
+import functools
+import math
 from typing import Optional
-from app.services.gemini_service import GeminiService
+from fastapi import Request
+from starlette.datastructures import State
+from app.services.cache_service import MemoryLRUCache, ResponseCache, SQLiteCache
+from app.services.demand_service import DemandTracker, MemoryDemandStore, SQLiteDemandStore
+from app.services.gemini_service import GeminiService, create_http_client
+from app.services.model_router import PRINCIPAL, RAPIDO, ModelRouter, ModelTier
+from app.services.job_service import JobService, MemoryJobStore, SQLiteJobStore
+from app.services.pdf_extractors import available_extractors, preload_extractors
 from app.services.pdf_service import PDFService
+from app.services.prewarm_service import CachePrewarmer
+from app.services.question_pipeline import QuestionPipeline
+from app.services.topic_index import TopicIndex
 from app.core.config import settings
 from app.core.exceptions import GeminiServiceError
+from app.core.process_pool import ProcessPool
+from app.core.rate_limiter import OutboundLimiter
+from app.core.resilience import CallPolicy, CircuitBreaker
+from app.core.tracing import FileTraceExporter, OTLPTraceExporter, TraceExporter
 
 
-def get_gemini_service() -> Optional[GeminiService]:
+def create_theory_cache() -> Optional[ResponseCache]:
     """
-    Factory function para obtener el servicio de Gemini.
-    Permite inyección de dependencias y facilita testing.
+    Crea la caché de teoría según THEORY_CACHE_BACKEND.
+    Retorna None si la caché está desactivada.
+    """
+    if settings.THEORY_CACHE_BACKEND == "sqlite":
+        backend = SQLiteCache(
+            path=settings.THEORY_CACHE_PATH,
+            max_entries=settings.THEORY_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.THEORY_CACHE_TTL_SECONDS
+        )
+    elif settings.THEORY_CACHE_BACKEND == "memory":
+        backend = MemoryLRUCache(
+            max_entries=settings.THEORY_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.THEORY_CACHE_TTL_SECONDS
+        )
+    else:
+        return None
+    return ResponseCache(backend)
+
+
+def create_topic_index(theory_cache: Optional[ResponseCache]) -> Optional[TopicIndex]:
+    """
+    Crea el índice de temas parecidos según THEORY_SIMILAR_TOPICS.
+    Retorna None si está desactivado o no hay caché de teoría de la que servir.
+    """
+    if not settings.THEORY_SIMILAR_TOPICS or theory_cache is None:
+        return None
+    return TopicIndex(
+        threshold=settings.THEORY_SIMILARITY_THRESHOLD,
+        max_entries=settings.THEORY_TOPIC_INDEX_MAX_ENTRIES
+    )
+
+
+def create_pdf_cache() -> Optional[ResponseCache]:
+    """
+    Crea la caché de PDFs (texto extraído y preguntas, por digest SHA-256)
+    según PDF_CACHE_BACKEND. Retorna None si la caché está desactivada.
+    """
+    if settings.PDF_CACHE_BACKEND == "sqlite":
+        backend = SQLiteCache(
+            path=settings.PDF_CACHE_PATH,
+            max_entries=settings.PDF_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.PDF_CACHE_TTL_SECONDS,
+            max_bytes=settings.PDF_CACHE_MAX_BYTES
+        )
+    elif settings.PDF_CACHE_BACKEND == "memory":
+        backend = MemoryLRUCache(
+            max_entries=settings.PDF_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.PDF_CACHE_TTL_SECONDS
+        )
+    else:
+        return None
+    return ResponseCache(backend)
+
+
+def create_pdf_pool() -> Optional[ProcessPool]:
+    """
+    Crea el pool de procesos para el parseo de PDFs según PDF_WORKERS.
+    Retorna None si PDF_WORKERS es 0 (el parseo se hace en un hilo).
+    """
+    if settings.PDF_WORKERS == 0:
+        return None
+    return ProcessPool(
+        size=settings.PDF_WORKERS,
+        max_tasks_per_child=settings.PDF_MAX_TASKS_PER_CHILD,
+        initializer=functools.partial(preload_extractors, available_extractors(settings.PDF_EXTRACTORS))
+    )
+
+
+def create_job_service() -> JobService:
+    """
+    Crea la cola de trabajos de PDF en segundo plano según PDF_JOB_BACKEND.
+    Sus workers arrancan con el primer trabajo encolado.
+    """
+    if settings.PDF_JOB_BACKEND == "sqlite":
+        store = SQLiteJobStore(settings.PDF_JOB_DB_PATH)
+    else:
+        store = MemoryJobStore()
+    return JobService(
+        store=store,
+        workers=settings.PDF_JOB_WORKERS,
+        max_queue=settings.PDF_JOB_QUEUE_SIZE,
+        ttl_seconds=settings.PDF_JOB_RESULT_TTL_SECONDS
+    )
+
+
+def _per_worker(limit: int) -> int:
+    """Parte de un límite global que corresponde a cada worker (0 sigue siendo sin límite)."""
+    return math.ceil(limit / settings.WORKERS) if limit else 0
+
+
+def create_demand_tracker(
+    theory_cache: Optional[ResponseCache],
+    pdf_cache: Optional[ResponseCache]
+) -> Optional[DemandTracker]:
+    """
+    Crea el registro de demanda de temas y PDFs según DEMAND_BACKEND.
+    Retorna None si está desactivado o si no habrá precalentamiento (sin
+    PREWARM_ENABLED, Gemini o una caché que precalentar): solo el
+    precalentamiento vacía su buffer, que de otro modo crecería sin límite.
+    """
+    if not settings.PREWARM_ENABLED or not settings.is_gemini_configured:
+        return None
+    if theory_cache is None and pdf_cache is None:
+        return None
+    if settings.DEMAND_BACKEND == "sqlite":
+        store = SQLiteDemandStore(settings.DEMAND_DB_PATH)
+    elif settings.DEMAND_BACKEND == "memory":
+        store = MemoryDemandStore()
+    else:
+        return None
+    return DemandTracker(store, window_seconds=settings.DEMAND_WINDOW_SECONDS)
+
+
+def create_trace_exporter() -> TraceExporter:
+    """
+    Crea el destino de las trazas de las peticiones perfiladas según PROFILING_EXPORT.
+    Se invoca desde create_app, porque el middleware de perfilado lo necesita al construirse.
+    """
+    if settings.PROFILING_EXPORT == "otlp":
+        return OTLPTraceExporter(settings.PROFILING_OTLP_ENDPOINT, service_name=settings.API_TITLE)
+    return FileTraceExporter(settings.PROFILING_FILE_PATH)
+
+
+def create_gemini_limiter() -> OutboundLimiter:
+    """
+    Crea el control de admisión de las llamadas a Gemini según GEMINI_MAX_IN_FLIGHT,
+    GEMINI_REQUESTS_PER_MINUTE y GEMINI_TOKENS_PER_MINUTE.
+    Los límites son globales: cada uno de los WORKERS procesos recibe su parte.
+    """
+    return OutboundLimiter(
+        max_in_flight=_per_worker(settings.GEMINI_MAX_IN_FLIGHT),
+        requests_per_minute=_per_worker(settings.GEMINI_REQUESTS_PER_MINUTE),
+        tokens_per_minute=_per_worker(settings.GEMINI_TOKENS_PER_MINUTE),
+        max_waiters=settings.GEMINI_MAX_WAITERS,
+        max_wait_seconds=settings.GEMINI_MAX_WAIT_SECONDS
+    )
+
+
+def create_gemini_policy() -> CallPolicy:
+    """Crea la política de plazo, reintentos y hedging de las llamadas a Gemini."""
+    return CallPolicy(
+        deadline=settings.GEMINI_DEADLINE_SECONDS,
+        max_retries=settings.GEMINI_MAX_RETRIES,
+        base_delay=settings.GEMINI_RETRY_BASE_DELAY_SECONDS,
+        max_delay=settings.GEMINI_RETRY_MAX_DELAY_SECONDS,
+        hedge_after=settings.GEMINI_HEDGE_AFTER_SECONDS or None
+    )
+
+
+def create_model_router() -> Optional[ModelRouter]:
+    """Crea el enrutado entre el modelo rápido y el principal, o None si está desactivado."""
+    if not settings.GEMINI_ROUTING_ENABLED or settings.GEMINI_FAST_MODEL == settings.GEMINI_MODEL:
+        return None
+    return ModelRouter(
+        tiers=[
+            ModelTier(RAPIDO, settings.GEMINI_FAST_MODEL, settings.GEMINI_FAST_MAX_INPUT_CHARS),
+            ModelTier(PRINCIPAL, settings.GEMINI_MODEL)
+        ],
+        operation_tiers=dict(settings.GEMINI_ROUTING_OPERATIONS),
+        window_seconds=settings.GEMINI_ROUTING_WINDOW_SECONDS,
+        min_samples=settings.GEMINI_ROUTING_MIN_SAMPLES,
+        slow_seconds=settings.GEMINI_ROUTING_SLOW_SECONDS,
+        max_error_rate=settings.GEMINI_ROUTING_MAX_ERROR_RATE
+    )
+
+
+def create_gemini_service(
+    theory_cache: Optional[ResponseCache] = None,
+    questions_cache: Optional[ResponseCache] = None,
+    topic_index: Optional[TopicIndex] = None,
+    demand: Optional[DemandTracker] = None
+) -> Optional[GeminiService]:
+    """
+    Crea el servicio de Gemini con un pool de conexiones HTTP propio.
+    Se invoca una sola vez por proceso desde el lifespan de la aplicación.
     Usa get_gemini_api_key() para obtener la key de forma segura.
     Retorna None si no está configurado (para validar en las rutas).
     """
@@ -21,7 +211,29 @@ def get_gemini_service() -> Optional[GeminiService]:
     try:
         # Usar get_gemini_api_key() para obtener la key de forma segura
         api_key = settings.get_gemini_api_key()
-        return GeminiService(api_key=api_key, model=settings.GEMINI_MODEL)
+        http_client = create_http_client(
+            max_connections=settings.GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY,
+            http2=settings.GEMINI_HTTP2
+        )
+        return GeminiService(
+            api_key=api_key,
+            model=settings.GEMINI_MODEL,
+            http_client=http_client,
+            base_url=settings.GEMINI_BASE_URL,
+            theory_cache=theory_cache,
+            questions_cache=questions_cache,
+            limiter=create_gemini_limiter(),
+            policy=create_gemini_policy(),
+            breaker=CircuitBreaker(
+                failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                reset_seconds=settings.GEMINI_BREAKER_RESET_SECONDS
+            ),
+            topic_index=topic_index,
+            demand=demand,
+            router=create_model_router()
+        )
     except GeminiServiceError:
         return None
     except Exception as e:
@@ -29,10 +241,178 @@ def get_gemini_service() -> Optional[GeminiService]:
         raise GeminiServiceError("Error al inicializar el servicio de Gemini")
 
 
-def get_pdf_service() -> PDFService:
+def create_pdf_service(state: State) -> PDFService:
+    """Crea el servicio de PDF sobre la caché y el pool de procesos compartidos."""
+    return PDFService(
+        max_text_length=settings.MAX_PDF_TEXT_LENGTH,
+        cache=state.pdf_cache,
+        pool=state.pdf_pool,
+        timeout=settings.PDF_EXTRACTION_TIMEOUT_SECONDS,
+        max_upload_bytes=settings.MAX_PDF_UPLOAD_BYTES,
+        upload_dir=settings.PDF_UPLOAD_DIR,
+        compact=settings.PDF_TEXT_COMPACTION,
+        extractors=available_extractors(settings.PDF_EXTRACTORS)
+    )
+
+
+def create_prewarmer(state: State) -> Optional[CachePrewarmer]:
+    """
+    Crea el precalentamiento de cachés según PREWARM_ENABLED.
+    Retorna None si está desactivado o faltan el registro de demanda, Gemini o
+    una caché que precalentar.
+    """
+    gemini_service = state.gemini_service
+    if not settings.PREWARM_ENABLED or state.demand is None or gemini_service is None:
+        return None
+    if gemini_service.theory_cache is None and state.pdf_cache is None:
+        return None
+    return CachePrewarmer(
+        gemini_service=gemini_service,
+        demand=state.demand,
+        pdf_service=create_pdf_service(state),
+        top_n=settings.PREWARM_TOP_N,
+        interval_seconds=settings.PREWARM_INTERVAL_SECONDS,
+        startup_delay_seconds=settings.PREWARM_STARTUP_DELAY_SECONDS,
+        refresh_before_seconds=settings.PREWARM_REFRESH_BEFORE_SECONDS,
+        max_calls_per_hour=_per_worker(settings.PREWARM_MAX_CALLS_PER_HOUR),
+        max_load=settings.PREWARM_MAX_LOAD
+    )
+
+
+def init_services(state: State) -> None:
+    """
+    Crea los recursos compartidos del proceso (cachés, pool de PDFs, cola de
+    trabajos, registro de demanda, cliente de Gemini y precalentamiento) y los
+    guarda en app.state.
+    Se invoca desde el lifespan de la aplicación.
+    """
+    state.theory_cache = create_theory_cache()
+    state.pdf_cache = create_pdf_cache()
+    state.pdf_pool = create_pdf_pool()
+    state.job_service = create_job_service()
+    state.topic_index = create_topic_index(state.theory_cache)
+    state.demand = create_demand_tracker(state.theory_cache, state.pdf_cache)
+    state.gemini_service = create_gemini_service(
+        state.theory_cache, state.pdf_cache, state.topic_index, state.demand
+    )
+    state.prewarmer = create_prewarmer(state)
+    if state.prewarmer is None and state.demand is not None:
+        # Sin Gemini no hay precalentamiento que vacíe el buffer de la demanda
+        state.demand.close()
+        state.demand = None
+
+
+async def warmup_services(state: State) -> None:
+    """
+    Prepara el cliente de Gemini. Se invoca desde el lifespan tras
+    init_services; mientras no termina, el servidor no acepta conexiones y la
+    sonda de readiness no responde.
+
+    Con GEMINI_WARMUP importa el SDK y abre la conexión antes de aceptar
+    peticiones (resultado en state.warmup). Sin él, el SDK se importa en
+    segundo plano y el servidor queda listo de inmediato.
+    """
+    state.warmup = None
+    state.preload_task = None
+    gemini_service = state.gemini_service
+    if gemini_service is None:
+        return
+    if settings.GEMINI_WARMUP:
+        state.warmup = {"gemini": await gemini_service.warmup(settings.GEMINI_WARMUP_TIMEOUT_SECONDS)}
+    else:
+        state.preload_task = asyncio.create_task(gemini_service.preload())
+
+
+def start_prewarm(state: State) -> None:
+    """
+    Arranca el precalentamiento de cachés como tarea en segundo plano
+    (state.prewarm_task). Se invoca desde el lifespan tras warmup_services.
+    """
+    state.prewarm_task = None
+    if state.prewarmer is not None:
+        state.prewarm_task = asyncio.create_task(state.prewarmer.run())
+
+
+async def close_services(state: State) -> None:
+    """Libera los recursos creados por init_services."""
+    gemini_service = state.gemini_service
+    theory_cache = state.theory_cache
+    pdf_cache = state.pdf_cache
+    pdf_pool = state.pdf_pool
+    job_service = state.job_service
+    demand = state.demand
+    del state.gemini_service, state.theory_cache, state.pdf_cache, state.pdf_pool, state.job_service
+    del state.demand, state.prewarmer
+
+    for task in (getattr(state, "preload_task", None), getattr(state, "prewarm_task", None)):
+        if task is not None:
+            task.cancel()
+    # Detener primero los trabajos, que usan el resto de recursos
+    await job_service.close(drain_timeout=settings.GRACEFUL_SHUTDOWN_SECONDS)
+    if gemini_service is not None:
+        await gemini_service.aclose()
+    if pdf_pool is not None:
+        # Espera a que terminen las extracciones en curso
+        await asyncio.to_thread(pdf_pool.close)
+    for cache in (theory_cache, pdf_cache):
+        if cache is not None:
+            cache.close()
+    if demand is not None:
+        # Vuelca la demanda pendiente para el precalentamiento tras el reinicio
+        await asyncio.to_thread(demand.close)
+    trace_exporter = getattr(state, "trace_exporter", None)
+    if trace_exporter is not None:
+        # Espera a que se escriban o envíen las últimas trazas
+        await trace_exporter.aclose()
+
+
+def _get_state(request: Request) -> State:
+    """
+    Devuelve app.state con los servicios compartidos.
+    Si la aplicación se usa sin lifespan, los crea en el primer uso.
+    """
+    state = request.app.state
+    if not hasattr(state, "gemini_service"):
+        init_services(state)
+    return state
+
+
+def get_gemini_service(request: Request) -> Optional[GeminiService]:
+    """
+    Factory function para obtener el servicio de Gemini.
+    Permite inyección de dependencias y facilita testing.
+    Devuelve la instancia compartida creada en el lifespan.
+    """
+    return _get_state(request).gemini_service
+
+
+def get_pdf_service(request: Request) -> PDFService:
     """
     Factory function para obtener el servicio de PDF.
     Permite inyección de dependencias y facilita testing.
     """
-    return PDFService(max_text_length=settings.MAX_PDF_TEXT_LENGTH)
+    return create_pdf_service(_get_state(request))
 
+
+def get_question_pipeline(request: Request) -> Optional[QuestionPipeline]:
+    """
+    Factory function para obtener el pipeline de preguntas por secciones.
+    Retorna None si el servicio de Gemini no está configurado.
+    """
+    gemini_service = _get_state(request).gemini_service
+    if gemini_service is None:
+        return None
+    return QuestionPipeline(
+        gemini_service=gemini_service,
+        max_text_length=settings.PDF_FULL_MAX_TEXT_LENGTH,
+        max_section_tokens=settings.PDF_SECTION_TOKENS,
+        max_concurrency=settings.PDF_SECTION_CONCURRENCY
+    )
+
+
+def get_job_service(request: Request) -> JobService:
+    """
+    Factory function para obtener la cola de trabajos de PDF.
+    Devuelve la instancia compartida creada en el lifespan.
+    """
+    return _get_state(request).job_service
@@ -23,3 +23,34 @@ class ValidationError(EduAppException):
     """Excepción relacionada con validación de datos."""
     pass
 
+
+class JobQueueFullError(EduAppException):
+    """La cola de trabajos en segundo plano está llena."""
+    pass
+
+
+class GeminiUnavailableError(GeminiServiceError):
+    """
+    Gemini no puede atender la petición ahora (sobrecarga local o del proveedor).
+    Incluye el tiempo sugerido de reintento para la cabecera Retry-After.
+    """
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GeminiRateLimitError(GeminiUnavailableError):
+    """Se alcanzó el límite de peticiones o tokens por minuto hacia Gemini."""
+    status_code = 429
+
+
+class GeminiTimeoutError(GeminiUnavailableError):
+    """Gemini no respondió dentro del plazo de la llamada."""
+    status_code = 504
+
+
+class GeminiCircuitOpenError(GeminiUnavailableError):
+    """El circuit breaker está abierto: se rechaza la llamada sin contactar a Gemini."""
+    pass
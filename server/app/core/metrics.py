@@ -0,0 +1,283 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus.
+Implementación mínima de contadores, gauges e histogramas con etiquetas,
+sin dependencias externas. Registrar una observación es una búsqueda binaria
+y un par de sumas, por lo que la instrumentación puede quedar activa en producción.
+Las métricas son por proceso: con varios workers, cada uno expone las suyas.
+"""
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+# Buckets por defecto (segundos), de 5 ms a 2 minutos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Buckets para tamaños (caracteres, páginas, bytes): potencias de 4
+SIZE_BUCKETS = tuple(4 ** exponent for exponent in range(1, 14))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Métrica con nombre, descripción y, opcionalmente, etiquetas."""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str):
+        """Devuelve la serie con esos valores de etiqueta (la crea en el primer uso)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.documentation)
+
+    def _series(self) -> Iterator[tuple[tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            yield from self._children.items()
+        else:
+            yield (), self
+
+    def render(self) -> list[str]:
+        """Líneas de texto de la métrica en formato de exposición de Prometheus."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self._series():
+            lines.extend(child._render_series(self.labelnames, values))
+        return lines
+
+    def _render_series(self, names: Sequence[str], values: Sequence[str]) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _render_series(self, names: Sequence[str], values: Sequence[str]) -> list[str]:
+        return [f"{self.name}{_format_labels(names, values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (por ejemplo, peticiones en curso)."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        """Incrementa el gauge durante el bloque with."""
+        self.value += 1
+        try:
+            yield
+        finally:
+            self.value -= 1
+
+    def _render_series(self, names: Sequence[str], values: Sequence[str]) -> list[str]:
+        return [f"{self.name}{_format_labels(names, values)} {_format_value(self.value)}"]
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo con buckets fijos, suma y número de observaciones."""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observa la duración en segundos del bloque with."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _render_series(self, names: Sequence[str], values: Sequence[str]) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(names, values, le)} {cumulative}")
+        labels = _format_labels(names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas expuestas en /metrics."""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def render(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Peticiones HTTP (etiquetadas por plantilla de ruta, no por URL, para acotar la cardinalidad)
+HTTP_REQUESTS = REGISTRY.counter(
+    "eduapp_http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "eduapp_http_request_duration_seconds", "Duración de las peticiones HTTP", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "eduapp_http_requests_in_flight", "Peticiones HTTP en curso", ("route",)
+)
+HTTP_COMPRESSED_BYTES = REGISTRY.counter(
+    "eduapp_http_compressed_bytes_total", "Bytes de las respuestas comprimidas, antes y después de comprimir",
+    ("encoding", "stage")
+)
+
+# Etapas de la generación de preguntas desde PDF: upload, extraction, llm
+STAGE_LATENCY = REGISTRY.histogram(
+    "eduapp_stage_duration_seconds", "Duración de cada etapa del procesamiento", ("stage",)
+)
+
+# Subida y extracción de PDFs
+PDF_UPLOAD_BYTES = REGISTRY.histogram(
+    "eduapp_pdf_upload_bytes", "Tamaño de los PDFs subidos", buckets=SIZE_BUCKETS
+)
+PDF_PAGES = REGISTRY.histogram(
+    "eduapp_pdf_pages", "Páginas de los PDFs extraídos", ("kind",), buckets=SIZE_BUCKETS
+)
+PDF_CHARS = REGISTRY.histogram(
+    "eduapp_pdf_extracted_chars", "Caracteres de texto extraídos por PDF", buckets=SIZE_BUCKETS
+)
+PDF_COMPACTION_SAVED = REGISTRY.histogram(
+    "eduapp_pdf_compaction_saved_chars", "Caracteres eliminados al compactar el texto de cada PDF",
+    buckets=SIZE_BUCKETS
+)
+PDF_EXTRACTOR_USED = REGISTRY.counter(
+    "eduapp_pdf_extractor_total", "Extracciones de PDF por backend que obtuvo el texto", ("extractor",)
+)
+PDF_EXTRACTOR_FALLBACKS = REGISTRY.counter(
+    "eduapp_pdf_extractor_fallbacks_total", "Backends de extracción que fallaron y dieron paso al siguiente",
+    ("extractor",)
+)
+PDF_EXTRACTIONS = REGISTRY.counter(
+    "eduapp_pdf_extractions_total", "Extracciones de texto de PDF", ("outcome",)
+)
+
+# Índice de temas parecidos de la teoría
+TOPIC_LOOKUPS = REGISTRY.counter(
+    "eduapp_topic_index_lookups_total", "Búsquedas de un tema parecido ya respondido", ("outcome",)
+)
+
+# Precalentamiento de las cachés según la demanda
+PREWARM_ENTRIES = REGISTRY.counter(
+    "eduapp_prewarm_entries_total", "Entradas revisadas por el precalentamiento de cachés",
+    ("kind", "outcome")
+)
+
+# Trazas de las peticiones perfiladas
+TRACES_EXPORTED = REGISTRY.counter(
+    "eduapp_traces_total", "Trazas de peticiones perfiladas por resultado de la exportación", ("outcome",)
+)
+
+# Llamadas a Gemini (cada intento, reintentos incluidos)
+LLM_LATENCY = REGISTRY.histogram(
+    "eduapp_llm_request_duration_seconds", "Duración de las llamadas a Gemini", ("operation", "model", "outcome")
+)
+LLM_PROMPT_CHARS = REGISTRY.histogram(
+    "eduapp_llm_prompt_chars", "Caracteres de los prompts enviados a Gemini", buckets=SIZE_BUCKETS
+)
+LLM_RESPONSE_CHARS = REGISTRY.histogram(
+    "eduapp_llm_response_chars", "Caracteres de las respuestas de Gemini", buckets=SIZE_BUCKETS
+)
+LLM_ERRORS = REGISTRY.counter(
+    "eduapp_llm_errors_total", "Errores de las llamadas a Gemini por tipo", ("type",)
+)
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    "eduapp_llm_requests_in_flight", "Llamadas a Gemini en curso"
+)
+LLM_ROUTES = REGISTRY.counter(
+    "eduapp_llm_routes_total", "Llamadas a Gemini por tier y motivo del enrutado", ("operation", "tier", "reason")
+)
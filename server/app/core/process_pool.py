@@ -0,0 +1,204 @@
+"""
+Pool de procesos para trabajo de CPU (parseo de PDFs) fuera del event loop.
+A diferencia de ProcessPoolExecutor, permite matar el proceso que excede su
+tiempo límite sin afectar a las demás tareas en curso.
+"""
+import asyncio
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional
+
+
+class WorkerTimeoutError(Exception):
+    """La tarea superó su tiempo límite y el proceso fue terminado."""
+    pass
+
+
+class WorkerCrashedError(Exception):
+    """El proceso trabajador terminó de forma inesperada."""
+    pass
+
+
+def _worker_main(conn: Connection, initializer: Optional[Callable[[], Any]] = None) -> None:
+    """Bucle del proceso trabajador: recibe (fn, args), devuelve (ok, resultado)."""
+    if initializer is not None:
+        try:
+            initializer()
+        except Exception:
+            # No es fatal: si falta algo, la tarea fallará con su propio error
+            pass
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        fn, args = message
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # La excepción original no se puede serializar
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    """Proceso trabajador con su canal de comunicación."""
+
+    def __init__(self, ctx, initializer: Optional[Callable[[], Any]] = None):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, initializer), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks_done = 0
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """Pide al proceso que termine y lo mata si no lo hace a tiempo."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self) -> None:
+        """Termina el proceso inmediatamente."""
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ProcessPool:
+    """
+    Pool de procesos con tiempo límite por tarea y reciclado de procesos.
+
+    Cada tarea se despacha desde un hilo dedicado que espera la respuesta del
+    proceso; si se supera el tiempo límite, ese proceso se mata y se reemplaza.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_tasks_per_child: Optional[int] = None,
+        start_method: str = "spawn",
+        initializer: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            size: Número de procesos trabajadores
+            max_tasks_per_child: Tareas tras las cuales se recicla un proceso; None para no reciclar
+            start_method: Método de arranque de multiprocessing (spawn, forkserver, fork)
+            initializer: Función sin argumentos que ejecuta cada proceso al arrancar
+                (por ejemplo, para importar por adelantado los módulos pesados)
+        """
+        self.size = size
+        self.max_tasks_per_child = max_tasks_per_child
+        self.initializer = initializer
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers: set[_Worker] = set()
+        for _ in range(size):
+            self._add_worker()
+        # Un hilo por proceso: las tareas en exceso esperan en la cola del executor
+        self._dispatcher = ThreadPoolExecutor(max_workers=size, thread_name_prefix="process-pool")
+        self.timeouts = 0
+        self.recycled = 0
+
+    def _add_worker(self) -> None:
+        worker = _Worker(self._ctx, self.initializer)
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _discard_worker(self, worker: _Worker, kill: bool) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def _run_sync(self, fn: Callable[..., Any], args: tuple, timeout: Optional[float]) -> Any:
+        """Ejecuta la tarea en un proceso libre (se invoca desde un hilo del dispatcher)."""
+        worker = self._idle.get()
+        try:
+            worker.conn.send((fn, args))
+            ready = worker.conn.poll(timeout)
+            if ready:
+                ok, result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._discard_worker(worker, kill=True)
+            self._add_worker()
+            raise WorkerCrashedError(f"El proceso trabajador terminó inesperadamente: {e}")
+        except BaseException:
+            # Argumentos o resultado que no se pueden serializar, o cualquier otro fallo
+            # del canal: el estado del proceso es incierto, así que se reemplaza para
+            # que el pool no pierda un proceso ni deje llamadas esperando para siempre
+            self._discard_worker(worker, kill=True)
+            self._add_worker()
+            raise
+
+        if not ready:
+            self.timeouts += 1
+            self._discard_worker(worker, kill=True)
+            self._add_worker()
+            raise WorkerTimeoutError(f"La tarea superó el tiempo límite de {timeout} s")
+
+        worker.tasks_done += 1
+        if self.max_tasks_per_child and worker.tasks_done >= self.max_tasks_per_child:
+            self.recycled += 1
+            self._discard_worker(worker, kill=False)
+            self._add_worker()
+        else:
+            self._idle.put(worker)
+
+        if not ok:
+            raise result
+        return result
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Ejecuta fn(*args) en un proceso del pool sin bloquear el event loop.
+
+        Args:
+            fn: Función a nivel de módulo (debe poder serializarse con pickle)
+            args: Argumentos de la función (deben poder serializarse con pickle)
+            timeout: Segundos máximos de ejecución; None para no limitar
+
+        Returns:
+            El resultado de fn
+
+        Raises:
+            WorkerTimeoutError: Si se supera el tiempo límite
+            WorkerCrashedError: Si el proceso muere durante la tarea
+            La excepción que lance fn
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._dispatcher, self._run_sync, fn, args, timeout)
+
+    def stats(self) -> dict:
+        """Devuelve el estado del pool."""
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "timeouts": self.timeouts,
+            "recycled": self.recycled
+        }
+
+    def close(self) -> None:
+        """Espera las tareas en curso y detiene todos los procesos."""
+        self._dispatcher.shutdown(wait=True)
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,186 @@
+"""
+Control de admisión del tráfico saliente hacia Gemini.
+Combina un límite de peticiones simultáneas con cubetas de tokens de peticiones
+y de tokens por minuto. Las peticiones que no pueden admitirse dentro del tiempo
+de espera configurado se rechazan de inmediato con un tiempo de reintento, en
+lugar de acumularse hasta que Gemini responda con errores de cuota.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from app.core.exceptions import GeminiRateLimitError, GeminiUnavailableError
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens que se rellena a ritmo constante.
+    Admite reservas: consumir deja el saldo en negativo y las siguientes
+    reservas esperan proporcionalmente, de modo que se atienden en orden.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Args:
+            per_minute: Tokens repuestos por minuto (también es la capacidad máxima)
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos hasta que haya saldo para amount (acotado a la capacidad)."""
+        self._refill(now)
+        deficit = min(amount, self.capacity) - self._tokens
+        return max(0.0, deficit / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Descuenta amount del saldo (puede quedar en negativo)."""
+        self._tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """Devuelve amount al saldo tras una reserva que no llegó a usarse."""
+        self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+    @property
+    def available(self) -> float:
+        """Saldo actual de la cubeta."""
+        self._refill(time.monotonic())
+        return self._tokens
+
+
+class OutboundLimiter:
+    """
+    Limitador de admisión para las llamadas a Gemini.
+
+    Una petición se admite si, dentro de max_wait_seconds, hay saldo en las
+    cubetas de peticiones y tokens por minuto y queda un hueco en el semáforo
+    de peticiones en curso. Como mucho max_waiters peticiones esperan a la vez.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_waiters: int = 100,
+        max_wait_seconds: float = 10.0
+    ):
+        """
+        Args:
+            max_in_flight: Peticiones simultáneas a Gemini como máximo
+            requests_per_minute: Peticiones por minuto; None o 0 para no limitar
+            tokens_per_minute: Tokens de entrada (estimados) por minuto; None o 0 para no limitar
+            max_waiters: Peticiones esperando admisión como máximo
+            max_wait_seconds: Espera máxima por admisión antes de rechazar
+        """
+        self.max_in_flight = max_in_flight
+        self.max_waiters = max_waiters
+        self.max_wait_seconds = max_wait_seconds
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    def _reserve(self, tokens: int, max_wait: float) -> float:
+        """Reserva saldo en las cubetas y devuelve los segundos de espera necesarios."""
+        now = time.monotonic()
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        if wait > max_wait:
+            self.rate_limited += 1
+            raise GeminiRateLimitError(
+                "Se alcanzó el límite de peticiones a Gemini. Inténtalo de nuevo más tarde.",
+                retry_after=wait
+            )
+        if self.requests is not None:
+            self.requests.consume(1)
+        if self.tokens is not None:
+            self.tokens.consume(tokens)
+        return wait
+
+    def _refund(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None:
+            self.tokens.refund(tokens)
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int, max_wait: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Admite una petición a Gemini durante el bloque async with.
+
+        Args:
+            tokens: Tokens de entrada estimados de la petición
+            max_wait: Espera máxima de esta petición (lo que le queda de plazo),
+                si es menor que max_wait_seconds
+
+        Raises:
+            GeminiRateLimitError: Si el límite por minuto no deja admitirla a tiempo (429)
+            GeminiUnavailableError: Si hay demasiadas peticiones esperando o en curso (503)
+        """
+        max_wait = self.max_wait_seconds if max_wait is None else max(0.0, min(max_wait, self.max_wait_seconds))
+        wait = self._reserve(tokens, max_wait)
+        if wait == 0 and not self._semaphore.locked():
+            # Admisión inmediata: no ocupa un puesto en la cola de espera
+            await self._semaphore.acquire()
+        else:
+            await self._wait(tokens, wait, max_wait)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _wait(self, tokens: int, wait: float, max_wait: float) -> None:
+        """Espera el saldo reservado y un hueco en el semáforo, o rechaza la petición."""
+        if self.waiting >= self.max_waiters:
+            self._refund(tokens)
+            self.overloaded += 1
+            raise GeminiUnavailableError(
+                "Demasiadas peticiones a Gemini en espera. Inténtalo de nuevo más tarde.",
+                retry_after=max(1.0, wait)
+            )
+        deadline = time.monotonic() + max_wait
+        self.waiting += 1
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._refund(tokens)
+            self.overloaded += 1
+            raise GeminiUnavailableError(
+                "Demasiadas peticiones a Gemini en curso. Inténtalo de nuevo más tarde.",
+                retry_after=1.0
+            )
+        except BaseException:
+            self._refund(tokens)
+            raise
+        finally:
+            self.waiting -= 1
+
+    def stats(self) -> dict:
+        """Devuelve el estado del limitador."""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "rate_limited": self.rate_limited,
+            "overloaded": self.overloaded,
+            "requests_available": int(self.requests.available) if self.requests else None,
+            "tokens_available": int(self.tokens.available) if self.tokens else None
+        }
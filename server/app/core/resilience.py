@@ -0,0 +1,160 @@
+"""
+Políticas de resiliencia para llamadas a servicios externos.
+Define el plazo, los reintentos con espera exponencial y jitter, las peticiones
+duplicadas (hedging) y el circuit breaker que usa GeminiService.
+"""
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, NamedTuple, Optional, TypeVar
+from app.core.exceptions import GeminiCircuitOpenError
+
+T = TypeVar("T")
+
+# Estados del circuit breaker
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class CallPolicy(NamedTuple):
+    """Plazo, reintentos y hedging de una llamada."""
+    deadline: float
+    max_retries: int = 0
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    hedge_after: Optional[float] = None
+
+    def backoff(self, attempt: int, hint: Optional[float] = None) -> float:
+        """
+        Espera antes del reintento número attempt (desde 0): exponencial con
+        jitter completo, o el tiempo indicado por el servidor si es mayor.
+
+        Args:
+            attempt: Número de reintento (0 para el primero)
+            hint: Espera sugerida por el servidor (Retry-After), si la hay
+
+        Returns:
+            Segundos de espera
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, hint or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por número de fallos consecutivos.
+
+    Cerrado: las llamadas pasan. Tras failure_threshold fallos seguidos se abre
+    y rechaza las llamadas de inmediato durante reset_seconds. Después pasa a
+    semiabierto y deja pasar una sola llamada de prueba: si tiene éxito se
+    cierra y, si falla, vuelve a abrirse.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        """
+        Args:
+            failure_threshold: Fallos consecutivos que abren el circuito
+            reset_seconds: Segundos que el circuito permanece abierto
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._state = CERRADO
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """Estado actual (pasa de abierto a semiabierto al cumplirse el tiempo)."""
+        if self._state == ABIERTO and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = SEMIABIERTO
+            self._probing = False
+        return self._state
+
+    def retry_after(self) -> float:
+        """Segundos hasta que el circuito deje pasar una llamada de prueba."""
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def check(self) -> None:
+        """
+        Comprueba si se puede llamar al servicio.
+
+        Raises:
+            GeminiCircuitOpenError: Si el circuito está abierto o ya hay una llamada de prueba en curso
+        """
+        state = self.state
+        if state == CERRADO:
+            return
+        if state == SEMIABIERTO and not self._probing:
+            self._probing = True
+            return
+        self.rejected += 1
+        raise GeminiCircuitOpenError(
+            "Gemini no está disponible temporalmente. Inténtalo de nuevo más tarde.",
+            retry_after=max(1.0, self.retry_after())
+        )
+
+    def record_success(self) -> None:
+        """Registra una llamada correcta: cierra el circuito."""
+        self.failures = 0
+        self._state = CERRADO
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """Registra un fallo del servicio: abre el circuito al alcanzar el umbral."""
+        self.failures += 1
+        if self._state == SEMIABIERTO or self.failures >= self.failure_threshold:
+            if self._state != ABIERTO:
+                self.opened += 1
+            self._state = ABIERTO
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Libera la llamada de prueba si terminó sin éxito ni fallo imputable al servicio."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        """Devuelve el estado del circuito."""
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1) if state == ABIERTO else None
+        }
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float) -> T:
+    """
+    Ejecuta call y, si no ha terminado tras delay segundos, lanza una segunda
+    llamada idéntica. Devuelve el primer resultado correcto y cancela la otra;
+    solo falla si fallan ambas (con la excepción de la última en terminar).
+
+    Args:
+        call: Función que crea la corrutina de la llamada
+        delay: Segundos a esperar antes de duplicar la llamada
+
+    Returns:
+        El resultado de la primera llamada correcta
+    """
+    tasks = {asyncio.ensure_future(call())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.add(asyncio.ensure_future(call()))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
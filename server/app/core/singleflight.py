@@ -0,0 +1,62 @@
+"""
+Coalescencia de llamadas concurrentes idénticas (single-flight).
+Si varias peticiones piden lo mismo a la vez, solo la primera llega a Gemini;
+las demás esperan su resultado (o su excepción).
+"""
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Agrupa las llamadas concurrentes con la misma clave en una sola ejecución.
+    Es local a cada proceso y a su event loop.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ejecuta fn una sola vez por clave mientras haya una llamada en curso.
+
+        La llamada se ejecuta como tarea independiente: si el primer solicitante
+        se cancela (por ejemplo, el cliente cierra la conexión), los demás
+        siguen esperando el mismo resultado.
+
+        Args:
+            key: Clave que identifica llamadas equivalentes
+            fn: Función asíncrona a ejecutar
+
+        Returns:
+            El resultado de fn, compartido por todos los solicitantes
+
+        Raises:
+            La misma excepción que lance fn, propagada a todos los solicitantes
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    @property
+    def in_flight(self) -> int:
+        """Número de llamadas distintas en curso."""
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        """Devuelve los contadores de coalescencia."""
+        return {
+            "in_flight": self.in_flight,
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,569 @@
+"""
+Trazas y perfilado por petición, bajo demanda.
+Implementación mínima, sin dependencias externas: cada petición perfilada
+registra un árbol de spans (subida -> extracción por página -> construcción
+del prompt -> Gemini), muestras periódicas de las pilas de todos los hilos
+(CPU) y el pico de memoria de tracemalloc. Las trazas se exportan a un
+archivo JSON Lines o a un colector OTLP/HTTP (formato JSON de OpenTelemetry).
+
+Sin una traza activa, span() solo consulta una ContextVar y devuelve un
+contexto vacío compartido, por lo que la instrumentación puede quedarse en
+el código sin coste apreciable.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Iterable, Iterator, Optional, TypeVar
+from app.core.metrics import TRACES_EXPORTED
+
+T = TypeVar("T")
+
+# Función en la que está un hilo que espera sin consumir CPU: sus muestras cuentan como inactivas
+IDLE_FUNCTIONS = frozenset({"select", "poll", "wait", "_worker", "accept"})
+# Pilas distintas exportadas como mucho por traza (las más frecuentes)
+MAX_STACKS = 50
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("eduapp_span", default=None)
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("eduapp_trace", default=None)
+
+
+class Span:
+    """Tramo con nombre, duración, atributos y tramos hijos."""
+    __slots__ = ("name", "span_id", "start_ns", "end_ns", "attributes", "children", "error")
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        # perf_counter_ns es el reloj monotónico del sistema: comparable entre procesos de la misma máquina
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.children: list[Span] = []
+        self.error: Optional[str] = None
+
+    def to_raw(self) -> dict:
+        """Tiempos absolutos (para enviar el árbol desde otro proceso)."""
+        return {
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [child.to_raw() for child in self.children]
+        }
+
+    @classmethod
+    def from_raw(cls, raw: dict) -> "Span":
+        span = cls(raw["name"], raw["attributes"])
+        span.start_ns = raw["start_ns"]
+        span.end_ns = raw["end_ns"]
+        span.error = raw["error"]
+        span.children = [cls.from_raw(child) for child in raw["children"]]
+        return span
+
+    def to_dict(self, origin_ns: int) -> dict:
+        """Tiempos en milisegundos relativos al inicio de la traza."""
+        end_ns = self.end_ns or self.start_ns
+        span = {
+            "name": self.name,
+            "start_ms": round((self.start_ns - origin_ns) / 1e6, 3),
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3)
+        }
+        if self.attributes:
+            span["attributes"] = self.attributes
+        if self.error:
+            span["error"] = self.error
+        if self.children:
+            span["children"] = [child.to_dict(origin_ns) for child in self.children]
+        return span
+
+
+class _SpanScope:
+    """Contexto de span(): abre el tramo como hijo del actual y lo cierra al salir."""
+    __slots__ = ("parent", "span", "token")
+
+    def __init__(self, parent: Span, name: str, attributes: dict):
+        self.parent = parent
+        self.span = Span(name, attributes)
+
+    def __enter__(self) -> Span:
+        self.parent.children.append(self.span)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.span.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        _current_span.reset(self.token)
+
+
+class _NoopScope:
+    """Contexto de span() sin traza activa."""
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP = _NoopScope()
+
+
+def span(name: str, /, **attributes: Any):
+    """
+    Abre un tramo hijo del actual durante el bloque with.
+    Sin traza activa no hace nada. Para añadir atributos dentro del bloque, usar annotate().
+
+    Args:
+        name: Nombre del tramo (upload, extraction, page, llm...)
+        attributes: Atributos iniciales del tramo
+
+    Returns:
+        Un contexto para usar con with
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return _SpanScope(parent, name, attributes)
+
+
+def active() -> bool:
+    """True si la petición en curso se está perfilando."""
+    return _current_span.get() is not None
+
+
+def annotate(**attributes: Any) -> None:
+    """Añade atributos al tramo actual (sin traza activa no hace nada)."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def traced(name: str, items: Iterable[T]) -> Iterable[T]:
+    """
+    Registra un tramo por cada elemento producido por el iterable (por
+    ejemplo, una página del PDF), con su índice y, si es texto, su longitud.
+    Sin traza activa devuelve el iterable tal cual.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return items
+    return _traced(parent, name, items)
+
+
+def _traced(parent: Span, name: str, items: Iterable[T]) -> Iterator[T]:
+    iterator = iter(items)
+    index = 0
+    while True:
+        child = Span(name, {"index": index})
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        child.end_ns = time.perf_counter_ns()
+        if isinstance(item, str):
+            child.attributes["chars"] = len(item)
+        parent.children.append(child)
+        index += 1
+        yield item
+
+
+def _fold(frame, thread_name: str) -> str:
+    """Pila en formato plegado de los flame graphs: hilo;externa;...;interna."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+class CpuProfile:
+    """Muestras de pila acumuladas de una traza."""
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: Segundos entre muestras
+        """
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        self.stacks: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, stacks: list[str], idle: int) -> None:
+        with self._lock:
+            self.samples += 1
+            self.idle += idle
+            self.stacks.update(stacks)
+
+    def merge(self, other: dict, prefix: str) -> None:
+        """Suma las muestras exportadas por otro proceso, con un prefijo en cada pila."""
+        with self._lock:
+            self.idle += other["idle"]
+            self.stacks.update({f"{prefix};{stack}": count for stack, count in other["stacks"].items()})
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "interval_ms": self.interval * 1000,
+                "samples": self.samples,
+                "idle": self.idle,
+                "stacks": dict(self.stacks.most_common(MAX_STACKS))
+            }
+
+
+class StackSampler:
+    """
+    Hilo que, mientras haya perfiles registrados, toma cada `interval`
+    segundos la pila de todos los hilos del proceso (sys._current_frames) y la
+    suma a cada perfil. Es muestreo de tiempo real: incluye el tiempo de CPU y
+    las esperas que no están en IDLE_FUNCTIONS.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: set[CpuProfile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: CpuProfile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="eduapp-stack-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: CpuProfile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            idle = 0
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if frame.f_code.co_name in IDLE_FUNCTIONS:
+                    idle += 1
+                else:
+                    stacks.append(_fold(frame, names.get(ident, str(ident))))
+            for profile in profiles:
+                profile.record(stacks, idle)
+
+
+_samplers: dict[float, StackSampler] = {}
+_memory_lock = threading.Lock()
+_memory_users = 0
+
+
+def _sampler(interval: float) -> StackSampler:
+    sampler = _samplers.get(interval)
+    if sampler is None:
+        sampler = _samplers.setdefault(interval, StackSampler(interval))
+    return sampler
+
+
+def _start_memory() -> None:
+    global _memory_users
+    with _memory_lock:
+        if _memory_users == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _memory_users += 1
+
+
+def _stop_memory() -> int:
+    """Deja de contar a este usuario y devuelve el pico de memoria desde que empezó el primero."""
+    global _memory_users
+    with _memory_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        _memory_users -= 1
+        if _memory_users == 0:
+            tracemalloc.stop()
+        return peak
+
+
+class Trace:
+    """
+    Traza de una petición (o de un trabajo en otro proceso).
+    Se activa con with: dentro del bloque, span() cuelga los tramos del raíz.
+    """
+
+    def __init__(self, name: str, attributes: Optional[dict] = None, cpu_interval: float = 0.0, memory: bool = False):
+        """
+        Args:
+            name: Nombre del tramo raíz (por ejemplo, "POST /api/pdf/generar-preguntas")
+            attributes: Atributos del tramo raíz
+            cpu_interval: Segundos entre muestras de pila; 0 para no muestrear
+            memory: Si se mide el pico de memoria con tracemalloc
+        """
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.root = Span(name, attributes)
+        self.cpu = CpuProfile(cpu_interval) if cpu_interval else None
+        self.memory = memory
+        self.memory_peak_bytes: Optional[int] = None
+        self.worker_memory_peak_bytes: Optional[int] = None
+        # Desfase entre perf_counter_ns y la hora del sistema, para exportar tiempos absolutos
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def __enter__(self) -> "Trace":
+        if self.memory:
+            _start_memory()
+        if self.cpu is not None:
+            _sampler(self.cpu.interval).add(self.cpu)
+        self.root.start_ns = time.perf_counter_ns()
+        self._tokens = (_current_trace.set(self), _current_span.set(self.root))
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.root.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.root.error = exc_type.__name__
+        trace_token, span_token = self._tokens
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if self.cpu is not None:
+            _sampler(self.cpu.interval).remove(self.cpu)
+        if self.memory:
+            self.memory_peak_bytes = _stop_memory()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.root.end_ns or time.perf_counter_ns()) - self.root.start_ns) / 1e6
+
+    def export_raw(self) -> dict:
+        """Árbol, muestras y memoria para adjuntarlos a la traza de otro proceso (attach)."""
+        return {
+            "span": self.root.to_raw(),
+            "cpu": self.cpu.to_dict() if self.cpu is not None else None,
+            "memory_peak_bytes": self.memory_peak_bytes
+        }
+
+    def to_dict(self) -> dict:
+        """La traza en el formato del archivo de exportación."""
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": (self.root.start_ns + self._epoch_offset_ns) / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": self.root.to_dict(self.root.start_ns),
+            "cpu": self.cpu.to_dict() if self.cpu is not None else None,
+            "memory_peak_bytes": self.memory_peak_bytes,
+            "worker_memory_peak_bytes": self.worker_memory_peak_bytes
+        }
+
+    def to_otlp(self, service_name: str) -> dict:
+        """La traza como petición ExportTraceServiceRequest de OTLP/HTTP en JSON."""
+        spans = []
+
+        def visit(span: Span, parent_id: Optional[str]) -> None:
+            attributes = dict(span.attributes)
+            if span is self.root:
+                if self.cpu is not None:
+                    cpu = self.cpu.to_dict()
+                    attributes["profile.cpu_samples"] = cpu["samples"]
+                    attributes["profile.cpu_stacks"] = json.dumps(cpu["stacks"], ensure_ascii=False)
+                if self.memory_peak_bytes is not None:
+                    attributes["profile.memory_peak_bytes"] = self.memory_peak_bytes
+                if self.worker_memory_peak_bytes is not None:
+                    attributes["profile.worker_memory_peak_bytes"] = self.worker_memory_peak_bytes
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                # 2 = SERVER para el raíz, 1 = INTERNAL para el resto
+                "kind": 2 if parent_id is None else 1,
+                "startTimeUnixNano": str(span.start_ns + self._epoch_offset_ns),
+                "endTimeUnixNano": str((span.end_ns or span.start_ns) + self._epoch_offset_ns),
+                "attributes": [_otlp_attribute(key, value) for key, value in attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 0}
+            }
+            if parent_id is not None:
+                otlp_span["parentSpanId"] = parent_id
+            spans.append(otlp_span)
+            for child in span.children:
+                visit(child, span.span_id)
+
+        visit(self.root, None)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+                "scopeSpans": [{"scope": {"name": "eduapp.tracing"}, "spans": spans}]
+            }]
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def attach(raw: dict, prefix: str) -> None:
+    """
+    Cuelga del tramo actual la traza exportada por otro proceso (export_raw)
+    y suma sus muestras de pila y su pico de memoria a la traza actual.
+
+    Args:
+        raw: Resultado de Trace.export_raw() en el otro proceso
+        prefix: Prefijo de sus pilas en el perfil de CPU (por ejemplo, "pdf_worker")
+    """
+    current = _current_span.get()
+    trace = _current_trace.get()
+    if current is None or trace is None:
+        return
+    current.children.append(Span.from_raw(raw["span"]))
+    if trace.cpu is not None and raw["cpu"] is not None:
+        trace.cpu.merge(raw["cpu"], prefix)
+    if raw["memory_peak_bytes"] is not None:
+        trace.worker_memory_peak_bytes = max(trace.worker_memory_peak_bytes or 0, raw["memory_peak_bytes"])
+
+
+def current_settings() -> tuple[float, bool]:
+    """Intervalo de muestreo y medición de memoria de la traza actual, para replicarlos en otro proceso."""
+    trace = _current_trace.get()
+    if trace is None:
+        return 0.0, False
+    return (trace.cpu.interval if trace.cpu is not None else 0.0), trace.memory
+
+
+class TraceExporter(ABC):
+    """
+    Exporta las trazas terminadas en segundo plano, fuera del camino de la
+    respuesta. Si hay demasiadas exportaciones pendientes, las nuevas trazas
+    se descartan.
+    """
+
+    def __init__(self, max_pending: int = 100):
+        """
+        Args:
+            max_pending: Exportaciones en curso como máximo
+        """
+        self.max_pending = max_pending
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._pending: set[asyncio.Task] = set()
+
+    def submit(self, trace: Trace) -> None:
+        """Programa la exportación de una traza (se invoca desde el event loop)."""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            TRACES_EXPORTED.labels("dropped").inc()
+            return
+        task = asyncio.get_running_loop().create_task(self._export_safely(trace))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _export_safely(self, trace: Trace) -> None:
+        try:
+            await self.export(trace)
+        except Exception:
+            self.failed += 1
+            TRACES_EXPORTED.labels("error").inc()
+        else:
+            self.exported += 1
+            TRACES_EXPORTED.labels("exported").inc()
+
+    @abstractmethod
+    async def export(self, trace: Trace) -> None:
+        """Envía o escribe una traza."""
+
+    async def aclose(self) -> None:
+        """Espera a las exportaciones pendientes y libera los recursos."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "exporter": type(self).__name__,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": len(self._pending)
+        }
+
+
+class FileTraceExporter(TraceExporter):
+    """Añade cada traza como una línea JSON a un archivo local."""
+
+    def __init__(self, path: str, max_pending: int = 100):
+        """
+        Args:
+            path: Ruta del archivo JSON Lines (se crean los directorios necesarios)
+            max_pending: Exportaciones en curso como máximo
+        """
+        super().__init__(max_pending)
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _write(self, trace: Trace) -> None:
+        line = (json.dumps(trace.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+        # Sin buffer: cada traza es una sola escritura en modo append, sin mezclarse con las de otros workers
+        with self._lock, open(self.path, "ab", buffering=0) as trace_file:
+            trace_file.write(line)
+
+    async def export(self, trace: Trace) -> None:
+        await asyncio.to_thread(self._write, trace)
+
+
+class OTLPTraceExporter(TraceExporter):
+    """Envía cada traza a un colector OpenTelemetry por OTLP/HTTP con cuerpo JSON."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0, max_pending: int = 100):
+        """
+        Args:
+            endpoint: URL del colector (por ejemplo, http://127.0.0.1:4318/v1/traces)
+            service_name: Valor del atributo de recurso service.name
+            timeout: Segundos máximos de cada envío
+            max_pending: Exportaciones en curso como máximo
+        """
+        super().__init__(max_pending)
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._client = None
+
+    async def export(self, trace: Trace) -> None:
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.post(self.endpoint, json=trace.to_otlp(self.service_name))
+        response.raise_for_status()
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -2,12 +2,37 @@
 Punto de entrada principal de la aplicación FastAPI.
 Configura la aplicación y todos sus componentes.
 """
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from app.core.config import settings, validate_settings
+from app.core.dependencies import (
+    close_services, create_trace_exporter, init_services, start_prewarm, warmup_services
+)
+from app.core.metrics import REGISTRY
+from app.api.middleware import (
+    MULTIPART_OVERHEAD_BYTES, CompressionMiddleware, MetricsMiddleware, ProfilingMiddleware, UploadLimitMiddleware
+)
 from app.api.routes import api_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la aplicación.
+    Crea el cliente de Gemini y las cachés compartidas al iniciar (y, si está
+    activado, calienta la conexión con Gemini), arranca el precalentamiento de
+    las cachés según la demanda y los libera al apagar.
+    """
+    init_services(app.state)
+    await warmup_services(app.state)
+    start_prewarm(app.state)
+    yield
+    await close_services(app.state)
+
+
 def create_app() -> FastAPI:
     """
     Factory function para crear la aplicación FastAPI.
@@ -32,7 +57,20 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.API_TITLE,
         version=settings.API_VERSION,
-        description="API para generación de contenido educativo usando Gemini"
+        description="API para generación de contenido educativo usando Gemini",
+        lifespan=lifespan,
+        # orjson serializa las respuestas JSON varias veces más rápido que json
+        default_response_class=ORJSONResponse
+    )
+    
+    # Limitar el tamaño de las subidas de PDF antes de leerlas
+    app.add_middleware(
+        UploadLimitMiddleware,
+        max_body_bytes=settings.MAX_PDF_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        path_prefix=f"{settings.API_PREFIX}/pdf",
+        path_limits={
+            f"{settings.API_PREFIX}/pdf/generar-preguntas-lote": settings.BATCH_MAX_UPLOAD_BYTES
+        }
     )
     
     # Configurar CORS
@@ -44,6 +82,33 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Comprimir las respuestas completas (no las de streaming)
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MIN_SIZE,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+    
+    # Perfilado bajo demanda (cabecera o muestreo); desactivado no añade ningún middleware
+    app.state.trace_exporter = None
+    if settings.PROFILING_ENABLED:
+        app.state.trace_exporter = create_trace_exporter()
+        app.add_middleware(
+            ProfilingMiddleware,
+            exporter=app.state.trace_exporter,
+            header=settings.PROFILING_HEADER,
+            token=settings.PROFILING_TOKEN.get_secret_value() if settings.PROFILING_TOKEN else None,
+            sample_rate=settings.PROFILING_SAMPLE_RATE,
+            cpu_interval=settings.PROFILING_CPU_INTERVAL_MS / 1000,
+            memory=settings.PROFILING_TRACEMALLOC
+        )
+    
+    # Métricas por ruta (el último middleware añadido es el más externo)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    
     # Incluir routers
     app.include_router(api_router, prefix=settings.API_PREFIX)
     
@@ -53,14 +118,54 @@ def create_app() -> FastAPI:
         return {"message": "EduApp API está funcionando"}
     
     @app.get("/health")
-    def health_check():
+    async def health_check():
         # No exponer información sensible en el health check
+        theory_cache = getattr(app.state, "theory_cache", None)
+        pdf_cache = getattr(app.state, "pdf_cache", None)
+        topic_index = getattr(app.state, "topic_index", None)
+        gemini_service = getattr(app.state, "gemini_service", None)
+        pdf_pool = getattr(app.state, "pdf_pool", None)
+        job_service = getattr(app.state, "job_service", None)
+        demand = getattr(app.state, "demand", None)
+        prewarmer = getattr(app.state, "prewarmer", None)
+        trace_exporter = app.state.trace_exporter
+
+        def storage_stats() -> dict:
+            # Los almacenamientos (SQLite) tienen su propio lock y pueden consultarse desde un hilo
+            return {
+                "theory_cache": theory_cache.stats() if theory_cache else None,
+                "pdf_cache": pdf_cache.stats() if pdf_cache else None,
+                "pdf_jobs": job_service.stats() if job_service else None,
+                "demand": demand.stats() if demand else None
+            }
+
+        storage = await asyncio.to_thread(storage_stats)
+        # El resto del estado lo modifica el event loop y se lee en él, sin competir con las rutas
         return {
             "status": "ok",
             "version": settings.API_VERSION,
-            "gemini_configured": settings.is_gemini_configured
+            "gemini_configured": settings.is_gemini_configured,
+            "theory_cache": storage["theory_cache"],
+            "topic_index": topic_index.stats() if topic_index else None,
+            "pdf_cache": storage["pdf_cache"],
+            "gemini_requests": gemini_service.singleflight.stats() if gemini_service else None,
+            "gemini_limiter": gemini_service.limiter.stats() if gemini_service and gemini_service.limiter else None,
+            "gemini_breakers": gemini_service.breaker_stats() if gemini_service else None,
+            "gemini_routing": gemini_service.router.stats() if gemini_service and gemini_service.router else None,
+            "pdf_pool": pdf_pool.stats() if pdf_pool else None,
+            "pdf_jobs": storage["pdf_jobs"],
+            "demand": storage["demand"],
+            "prewarm": prewarmer.stats() if prewarmer else None,
+            "profiling": trace_exporter.stats() if trace_exporter else None,
+            "warmup": getattr(app.state, "warmup", None)
         }
     
+    if settings.METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            # async: se serializa en el event loop, sin competir con las rutas que actualizan las métricas
+            return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+    
     return app
 
 
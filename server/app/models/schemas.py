@@ -2,8 +2,15 @@
 Schemas de Pydantic para validación de datos.
 Define los modelos de entrada y salida de la API.
 """
+from datetime import datetime
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
 
+# Modos de generación de preguntas desde PDF:
+# truncado usa solo el inicio del documento (MAX_PDF_TEXT_LENGTH);
+# completo lo divide en secciones y fusiona las preguntas de todas
+PDFQuestionsMode = Literal["truncado", "completo"]
+
 
 class TheoryRequest(BaseModel):
     """Schema para la solicitud de generación de teoría."""
@@ -21,6 +28,8 @@ class TheoryResponse(BaseModel):
     """Schema para la respuesta de generación de teoría."""
     tema: str
     teoria: str
+    cached: bool = Field(default=False, description="True si la teoría provino de la caché")
+    tema_similar: Optional[str] = Field(default=None, description="Tema parecido ya respondido cuya teoría se reutilizó")
     success: bool = True
 
     class Config:
@@ -28,6 +37,8 @@ class TheoryResponse(BaseModel):
             "example": {
                 "tema": "La fotosíntesis en las plantas",
                 "teoria": "La fotosíntesis es un proceso...",
+                "cached": False,
+                "tema_similar": None,
                 "success": True
             }
         }
@@ -37,6 +48,14 @@ class PDFQuestionsResponse(BaseModel):
     """Schema para la respuesta de generación de preguntas desde PDF."""
     nombre_archivo: str
     preguntas: str
+    cached: bool = Field(default=False, description="True si las preguntas provinieron de la caché")
+    paginas_totales: int = Field(default=0, description="Páginas del PDF")
+    paginas_procesadas: int = Field(default=0, description="Páginas parseadas hasta completar MAX_PDF_TEXT_LENGTH")
+    paginas_omitidas: int = Field(default=0, description="Páginas no parseadas por superar MAX_PDF_TEXT_LENGTH")
+    modo: PDFQuestionsMode = Field(default="truncado", description="Modo de generación usado")
+    secciones: int = Field(default=1, description="Secciones del texto procesadas por separado (modo completo)")
+    caracteres_ahorrados: int = Field(default=0, description="Caracteres eliminados al compactar el texto extraído")
+    tokens_ahorrados: int = Field(default=0, description="Tokens (estimados) que no se enviaron a Gemini gracias a la compactación")
     success: bool = True
 
     class Config:
@@ -44,11 +63,101 @@ class PDFQuestionsResponse(BaseModel):
             "example": {
                 "nombre_archivo": "documento.pdf",
                 "preguntas": "1. ¿Cuál es el tema principal...",
+                "cached": False,
+                "paginas_totales": 120,
+                "paginas_procesadas": 3,
+                "paginas_omitidas": 117,
+                "modo": "truncado",
+                "secciones": 1,
+                "caracteres_ahorrados": 1450,
+                "tokens_ahorrados": 362,
                 "success": True
             }
         }
 
 
+class BatchItemResult(BaseModel):
+    """Campos comunes del resultado de un elemento de un lote."""
+    indice: int = Field(..., description="Posición del elemento en la petición (desde 0)")
+    success: bool = True
+    error: Optional[str] = Field(default=None, description="Presente si el elemento falló")
+    status_code: int = Field(default=200, description="Código que habría devuelto el endpoint individual")
+    retry_after: Optional[int] = Field(default=None, description="Segundos sugeridos antes de reintentar el elemento")
+
+
+class TheoryBatchItem(BatchItemResult):
+    """Resultado de un tema en la generación de teoría por lotes."""
+    tema: str
+    teoria: Optional[str] = None
+    cached: bool = False
+    tema_similar: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "indice": 0,
+                "tema": "La fotosíntesis en las plantas",
+                "teoria": "La fotosíntesis es un proceso...",
+                "cached": False,
+                "tema_similar": None,
+                "success": True,
+                "error": None,
+                "status_code": 200,
+                "retry_after": None
+            }
+        }
+
+
+class TheoryBatchResponse(BaseModel):
+    """Schema para la respuesta de generación de teoría por lotes."""
+    resultados: list[TheoryBatchItem] = Field(..., description="Un resultado por tema, en el orden de la petición")
+    total: int
+    correctos: int
+    fallidos: int
+    success: bool = Field(default=True, description="True si todos los temas se generaron correctamente")
+
+
+class PDFBatchItem(BatchItemResult):
+    """Resultado de un archivo en la generación de preguntas por lotes."""
+    nombre_archivo: str
+    resultado: Optional[PDFQuestionsResponse] = Field(default=None, description="Presente si el elemento se generó")
+
+
+class PDFBatchResponse(BaseModel):
+    """Schema para la respuesta de generación de preguntas de varios PDFs."""
+    resultados: list[PDFBatchItem] = Field(..., description="Un resultado por archivo, en el orden de la petición")
+    total: int
+    correctos: int
+    fallidos: int
+    success: bool = Field(default=True, description="True si todos los archivos se procesaron correctamente")
+
+
+class PDFJobResponse(BaseModel):
+    """Schema para el estado de un trabajo de generación de preguntas en segundo plano."""
+    id: str
+    estado: Literal["pendiente", "procesando", "completado", "error"]
+    nombre_archivo: str
+    modo: PDFQuestionsMode
+    creado: datetime
+    actualizado: datetime
+    resultado: Optional[PDFQuestionsResponse] = Field(default=None, description="Presente cuando estado es completado")
+    error: Optional[str] = Field(default=None, description="Presente cuando estado es error")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": "3f2c9a6e8b1d4c0f9e7a5b3c1d2e4f60",
+                "estado": "pendiente",
+                "nombre_archivo": "documento.pdf",
+                "modo": "completo",
+                "creado": "2025-01-01T12:00:00Z",
+                "actualizado": "2025-01-01T12:00:00Z",
+                "resultado": None,
+                "error": None
+            }
+        }
+
+
 class ErrorResponse(BaseModel):
     """Schema para respuestas de error."""
     detail: str
@@ -0,0 +1,367 @@
+"""
+Servicio de caché de respuestas generadas.
+Sigue el principio de Open/Closed: el almacenamiento es intercambiable
+(memoria LRU o SQLite persistente) detrás de la interfaz CacheBackend.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+# Antigüedad mínima del último uso de una entrada SQLite para reescribirlo en un acierto
+ACCESS_RESOLUTION_SECONDS = 60.0
+# Intervalo entre barridos de las entradas expiradas de la caché SQLite
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+def normalize_tema(tema: str) -> str:
+    """
+    Normaliza un tema para que variaciones menores compartan la misma clave.
+    Ignora mayúsculas, acentos, espacios repetidos y puntuación final.
+
+    Args:
+        tema: El tema tal como lo envió el usuario
+
+    Returns:
+        El tema normalizado
+    """
+    texto = unicodedata.normalize("NFKD", tema.casefold())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.strip(" .,;:!?¿¡")
+
+
+def make_cache_key(*parts: str) -> str:
+    """
+    Construye una clave de caché estable a partir de sus componentes.
+
+    Args:
+        parts: Componentes de la clave (tipo, versión de prompt, modelo, contenido...)
+
+    Returns:
+        Hash SHA-256 en hexadecimal de los componentes
+    """
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class CacheBackend(ABC):
+    """Interfaz de almacenamiento de la caché."""
+
+    # True si las operaciones hacen E/S bloqueante y deben ejecutarse fuera del event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve el valor si existe y no ha expirado, None en caso contrario."""
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Guarda un valor, desalojando entradas si se supera el límite."""
+
+    @abstractmethod
+    def expires_at(self, key: str) -> Optional[float]:
+        """Instante (epoch) en que expira la entrada, sin marcarla como usada; None si no existe."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Elimina todas las entradas."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Número de entradas almacenadas."""
+
+    def close(self) -> None:
+        """Libera los recursos del backend."""
+
+
+class MemoryLRUCache(CacheBackend):
+    """
+    Caché en memoria con desalojo LRU y expiración por TTL.
+    Es local a cada proceso.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Args:
+            max_entries: Número máximo de entradas antes de desalojar
+            ttl_seconds: Segundos de validez de cada entrada
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Caché persistente en un archivo SQLite local.
+    Sobrevive a reinicios, desaloja por LRU y expira por TTL.
+
+    El número de entradas y el tamaño total se mantienen en una tabla de una
+    fila (cache_stats) actualizada por triggers, de modo que escribir no
+    recorre la tabla aunque la caché crezca, y el contador es correcto aunque
+    varios procesos compartan el archivo. Las entradas expiradas se barren
+    como mucho cada PURGE_INTERVAL_SECONDS y un acierto solo reescribe la
+    fecha de uso si tiene más de ACCESS_RESOLUTION_SECONDS.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, max_bytes: Optional[int] = None):
+        """
+        Args:
+            path: Ruta del archivo SQLite (se crean los directorios necesarios)
+            max_entries: Número máximo de entradas antes de desalojar
+            ttl_seconds: Segundos de validez de cada entrada
+            max_bytes: Tamaño máximo total de los valores en bytes; None para no limitar
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "size INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+        if "size" not in columns:
+            # Archivos creados antes de existir el límite por tamaño
+            self._conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        # Los contadores se inicializan y los triggers se crean en la misma transacción,
+        # para que ninguna escritura de otro proceso quede sin contar
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_stats ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cache_stats (id, entries, bytes) "
+                "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_stats_insert AFTER INSERT ON cache BEGIN "
+                "UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_stats_delete AFTER DELETE ON cache BEGIN "
+                "UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_stats_resize AFTER UPDATE OF size ON cache BEGIN "
+                "UPDATE cache_stats SET bytes = bytes + NEW.size - OLD.size WHERE id = 0; END"
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            if now - accessed_at >= ACCESS_RESOLUTION_SECONDS:
+                self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            # Upsert y no INSERT OR REPLACE: el borrado implícito de REPLACE no dispara los triggers
+            self._conn.execute(
+                "INSERT INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+                "accessed_at = excluded.accessed_at, size = excluded.size",
+                (key, value, now + self.ttl_seconds, now, len(value.encode("utf-8")))
+            )
+            if now >= self._next_purge:
+                self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+                self._next_purge = now + PURGE_INTERVAL_SECONDS
+            self._evict()
+
+    def expires_at(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _evict(self) -> None:
+        """Si se supera algún límite, elimina las entradas menos usadas."""
+        entries, total_bytes = self._stats()
+        overflow = entries - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            total_bytes = self._stats()[1]
+        if self.max_bytes is None or total_bytes <= self.max_bytes:
+            return
+        # Desalojar las menos usadas hasta liberar al menos el exceso (se recorre el índice por uso)
+        excess = total_bytes - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+    def _stats(self) -> tuple[int, int]:
+        """Número de entradas y tamaño total de los valores, según cache_stats."""
+        return self._conn.execute("SELECT entries, bytes FROM cache_stats WHERE id = 0").fetchone()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        """Tamaño total de los valores almacenados, en bytes."""
+        with self._lock:
+            return self._stats()[1]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Capa de caché delante de las llamadas a Gemini.
+    Delega el almacenamiento en un CacheBackend y lleva contadores de aciertos y fallos.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        """
+        Args:
+            backend: Backend de almacenamiento (memoria o SQLite)
+        """
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Busca un valor y actualiza los contadores."""
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def peek(self, key: str) -> Optional[str]:
+        """Busca un valor sin contar acierto ni fallo (consultas internas, no de usuarios)."""
+        return self.backend.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        """Guarda un valor en el backend."""
+        self.backend.set(key, value)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        """Instante (epoch) en que expira la entrada; None si no está en caché."""
+        return self.backend.expires_at(key)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta una operación del backend, en un hilo si hace E/S bloqueante."""
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Variante de get para el event loop."""
+        value = await self._run(self.backend.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def apeek(self, key: str) -> Optional[str]:
+        """Variante de peek para el event loop."""
+        return await self._run(self.backend.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Variante de set para el event loop."""
+        await self._run(self.backend.set, key, value)
+
+    def stats(self) -> dict:
+        """Devuelve los contadores de la caché."""
+        total = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+        if isinstance(self.backend, SQLiteCache):
+            stats["bytes"] = self.backend.total_bytes
+        return stats
+
+    def close(self) -> None:
+        """Libera los recursos del backend."""
+        self.backend.close()
@@ -0,0 +1,233 @@
+"""
+Registro de la demanda de contenido: cuántas veces se pide cada tema
+(normalizado) y cada PDF (por digest SHA-256). Lo usa el precalentamiento de
+cachés para saber qué regenerar antes de que expire o tras un despliegue.
+El almacenamiento es intercambiable (memoria o SQLite) detrás de la interfaz
+DemandStore; las peticiones solo suman en un buffer en memoria, que se vuelca
+al almacenamiento en segundo plano.
+"""
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+# Tipos de demanda
+TEORIA = "teoria"
+PDF = "pdf"
+
+
+class DemandEntry(NamedTuple):
+    """Demanda acumulada de un tema o un PDF."""
+    kind: str
+    # Tema normalizado o digest del PDF
+    key: str
+    # Último tema tal como lo envió el usuario, o nombre del archivo
+    label: str
+    count: int
+    last_seen: float
+
+
+class DemandStore(ABC):
+    """Interfaz de almacenamiento de la demanda."""
+
+    @abstractmethod
+    def add(self, entries: list[DemandEntry]) -> None:
+        """Suma los contadores (y actualiza etiqueta y último uso) de cada entrada."""
+
+    @abstractmethod
+    def top(self, kind: str, limit: int, since: float) -> list[DemandEntry]:
+        """Las `limit` entradas de ese tipo más pedidas entre las vistas desde `since`."""
+
+    @abstractmethod
+    def purge(self, before: float) -> None:
+        """Elimina las entradas que no se piden desde `before`."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Número de entradas almacenadas."""
+
+    def close(self) -> None:
+        """Libera los recursos del backend."""
+
+
+class MemoryDemandStore(DemandStore):
+    """
+    Demanda en memoria.
+    Es local a cada proceso y se pierde al reiniciar.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple[str, str], DemandEntry] = {}
+        self._lock = threading.Lock()
+
+    def add(self, entries: list[DemandEntry]) -> None:
+        with self._lock:
+            for entry in entries:
+                previous = self._entries.get((entry.kind, entry.key))
+                if previous is not None:
+                    entry = entry._replace(
+                        count=previous.count + entry.count,
+                        last_seen=max(previous.last_seen, entry.last_seen)
+                    )
+                self._entries[(entry.kind, entry.key)] = entry
+
+    def top(self, kind: str, limit: int, since: float) -> list[DemandEntry]:
+        with self._lock:
+            candidates = [
+                entry for entry in self._entries.values()
+                if entry.kind == kind and entry.last_seen >= since
+            ]
+        return heapq.nlargest(limit, candidates, key=lambda entry: entry.count)
+
+    def purge(self, before: float) -> None:
+        with self._lock:
+            for clave in [clave for clave, entry in self._entries.items() if entry.last_seen < before]:
+                del self._entries[clave]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteDemandStore(DemandStore):
+    """
+    Demanda en un archivo SQLite local.
+    Sobrevive a reinicios y despliegues (que es cuando las cachés están frías)
+    y suma la demanda de todos los procesos que comparten el archivo.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ruta del archivo SQLite (se crean los directorios necesarios)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS demand ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, label TEXT NOT NULL, "
+            "count INTEGER NOT NULL, last_seen REAL NOT NULL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS demand_count ON demand (kind, count)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS demand_last_seen ON demand (last_seen)")
+
+    def add(self, entries: list[DemandEntry]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO demand (kind, key, label, count, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, key) DO UPDATE SET "
+                "count = count + excluded.count, label = excluded.label, "
+                "last_seen = MAX(last_seen, excluded.last_seen)",
+                entries
+            )
+            self._conn.execute("COMMIT")
+
+    def top(self, kind: str, limit: int, since: float) -> list[DemandEntry]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, key, label, count, last_seen FROM demand "
+                "WHERE kind = ? AND last_seen >= ? ORDER BY count DESC LIMIT ?",
+                (kind, since, limit)
+            ).fetchall()
+        return [DemandEntry(*row) for row in rows]
+
+    def purge(self, before: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM demand WHERE last_seen < ?", (before,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM demand").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DemandTracker:
+    """
+    Cuenta las peticiones por tema y por PDF.
+    record() solo suma en un buffer en memoria (se llama desde el event loop en
+    cada petición); flush() lo vuelca al almacenamiento y debe llamarse fuera
+    del event loop si el almacenamiento es SQLite.
+    """
+
+    def __init__(self, store: DemandStore, window_seconds: float):
+        """
+        Args:
+            store: Almacenamiento de la demanda (memoria o SQLite)
+            window_seconds: Solo cuenta la demanda de lo pedido en esta ventana; lo más antiguo se descarta
+        """
+        self.store = store
+        self.window_seconds = window_seconds
+        self.recorded = 0
+        self._pending: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, key: str, label: str) -> None:
+        """
+        Suma una petición.
+
+        Args:
+            kind: Tipo de demanda (TEORIA o PDF)
+            key: Tema normalizado o digest del PDF
+            label: Tema tal como lo envió el usuario, o nombre del archivo
+        """
+        with self._lock:
+            self.recorded += 1
+            pending = self._pending.get((kind, key))
+            if pending is None:
+                self._pending[(kind, key)] = [1, label]
+            else:
+                pending[0] += 1
+                pending[1] = label
+
+    def flush(self) -> None:
+        """Vuelca el buffer al almacenamiento y descarta la demanda fuera de la ventana."""
+        now = time.time()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.store.add([
+                DemandEntry(kind, key, label, count, now)
+                for (kind, key), (count, label) in pending.items()
+            ])
+        self.store.purge(now - self.window_seconds)
+
+    def top(self, kind: str, limit: int) -> list[DemandEntry]:
+        """
+        Lo más pedido de un tipo dentro de la ventana.
+
+        Args:
+            kind: Tipo de demanda (TEORIA o PDF)
+            limit: Número máximo de entradas
+
+        Returns:
+            Las entradas de más a menos pedidas
+        """
+        return self.store.top(kind, limit, time.time() - self.window_seconds)
+
+    def stats(self) -> dict:
+        """Peticiones registradas por este proceso y entradas almacenadas."""
+        return {
+            "backend": type(self.store).__name__,
+            "recorded": self.recorded,
+            "pending": len(self._pending),
+            "entries": len(self.store)
+        }
+
+    def close(self) -> None:
+        """Vuelca lo pendiente y libera el almacenamiento."""
+        self.flush()
+        self.store.close()
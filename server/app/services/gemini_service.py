@@ -2,9 +2,199 @@
 Servicio para interactuar con la API de Gemini.
 Sigue el principio de Single Responsibility: solo maneja la comunicación con Gemini.
 """
-from typing import Optional
-from google import genai
-from app.core.exceptions import GeminiServiceError
+import asyncio
+import contextlib
+import functools
+import importlib.util
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Iterator, NamedTuple, Optional, TypeVar
+import httpx
+from app.core.exceptions import (
+    GeminiCircuitOpenError,
+    GeminiRateLimitError,
+    GeminiServiceError,
+    GeminiTimeoutError,
+    GeminiUnavailableError
+)
+from app.core.metrics import (
+    LLM_ERRORS,
+    LLM_IN_FLIGHT,
+    LLM_LATENCY,
+    LLM_PROMPT_CHARS,
+    LLM_RESPONSE_CHARS,
+    STAGE_LATENCY,
+    TOPIC_LOOKUPS
+)
+from app.core.rate_limiter import OutboundLimiter
+from app.core.resilience import ABIERTO, CERRADO, CallPolicy, CircuitBreaker, hedged
+from app.core.singleflight import SingleFlight
+from app.core.tracing import annotate, span
+from app.services.cache_service import ResponseCache, make_cache_key, normalize_tema
+from app.services.demand_service import TEORIA, DemandTracker
+from app.services.model_router import PRINCIPAL, ModelRouter, Route
+from app.services.topic_index import TopicIndex
+
+# Cambiar al modificar los prompts para invalidar la caché existente
+THEORY_PROMPT_VERSION = "1"
+QUESTIONS_PROMPT_VERSION = "1"
+MERGE_PROMPT_VERSION = "1"
+
+# Aproximación de caracteres por token para texto en español
+CHARS_PER_TOKEN = 4
+
+# Códigos HTTP de Gemini que se reintentan (cuota y errores transitorios del servidor)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Operaciones que se enrutan entre modelos
+PREGUNTAS = "preguntas"
+FUSION = "fusion"
+
+T = TypeVar("T")
+# Clave de caché de un resultado según el modelo que lo genera
+CacheKey = Callable[[str], Optional[str]]
+
+
+class GenerationResult(NamedTuple):
+    """Texto generado, si provino de la caché y, si se reutilizó la de otro tema parecido, ese tema."""
+    text: str
+    cached: bool = False
+    matched_tema: Optional[str] = None
+
+
+def estimate_tokens(texto: str) -> int:
+    """Estimación de los tokens de un texto (sin llamar al tokenizador de Gemini)."""
+    return max(1, len(texto) // CHARS_PER_TOKEN)
+
+
+def _retry_delay(details: Any) -> Optional[float]:
+    """Extrae el retryDelay ("17s") de la respuesta de error de Gemini, si viene."""
+    try:
+        for detail in details["error"]["details"]:
+            if detail.get("@type", "").endswith("RetryInfo"):
+                return float(detail["retryDelay"].rstrip("s"))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def _is_api_error(e: Exception) -> bool:
+    """Indica si el error es una respuesta de error de la API de Gemini."""
+    from google.genai import errors
+    return isinstance(e, errors.APIError)
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Indica si el error es transitorio: plazo agotado, fallo de red, cuota o error 5xx."""
+    if _is_api_error(e):
+        return e.code in RETRYABLE_STATUS
+    return isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError))
+
+
+def _is_outage(e: Exception) -> bool:
+    """Indica si el error apunta a que Gemini no está sano (cuenta para el circuit breaker)."""
+    return _is_retryable(e) and not (_is_api_error(e) and e.code == 429)
+
+
+def _is_model_failure(e: GeminiServiceError) -> bool:
+    """
+    True si el error es del modelo (plazo, cuota, caída o circuito abierto) y
+    puede resolverse con otro modelo. Los rechazos del limitador local no lo
+    son: otro modelo pasaría por el mismo limitador.
+    """
+    if isinstance(e, GeminiCircuitOpenError):
+        return True
+    # Los errores de Gemini se lanzan con la excepción original como causa (_upstream_error)
+    return isinstance(e, GeminiUnavailableError) and e.__cause__ is not None
+
+
+def _upstream_error(e: Exception) -> GeminiServiceError:
+    """
+    Traduce un error del SDK de Gemini a la excepción de la aplicación.
+    Las cuotas agotadas (429), la sobrecarga del proveedor (503) y los plazos
+    agotados (504) conservan su código para que el cliente pueda reintentar más tarde.
+    """
+    if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return GeminiTimeoutError(
+            "Gemini no respondió a tiempo. Inténtalo de nuevo más tarde.",
+            retry_after=1.0
+        )
+    if _is_api_error(e):
+        if e.code == 429:
+            return GeminiRateLimitError(
+                "Se alcanzó la cuota de Gemini. Inténtalo de nuevo más tarde.",
+                retry_after=_retry_delay(e.details) or 1.0
+            )
+        if e.code == 503:
+            return GeminiUnavailableError(
+                "Gemini no está disponible en este momento. Inténtalo de nuevo más tarde.",
+                retry_after=_retry_delay(e.details) or 1.0
+            )
+    return GeminiServiceError(f"Error al generar contenido con Gemini: {str(e)}")
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    """Segundos hasta el plazo (monotonic), o None si no hay plazo."""
+    return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+
+
+@contextmanager
+def _track_call(operation: str, model: str, prompt: str, router: Optional[ModelRouter] = None) -> Iterator[None]:
+    """
+    Registra en las métricas un intento de llamada a Gemini (en curso, duración
+    y resultado) y, con enrutado, en la salud del modelo. Los intentos
+    cancelados (intento duplicado descartado, cliente desconectado) no cuentan
+    para la salud.
+    """
+    LLM_PROMPT_CHARS.observe(len(prompt))
+    outcome = "error"
+    cancelled = False
+    start = time.perf_counter()
+    LLM_IN_FLIGHT.inc()
+    try:
+        yield
+        outcome = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        cancelled = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        LLM_IN_FLIGHT.dec()
+        LLM_LATENCY.labels(operation, model, outcome).observe(elapsed)
+        if router is not None and not cancelled:
+            router.observe(model, elapsed, outcome == "ok")
+
+
+def create_http_client(
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    http2: bool
+) -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP compartido (pool de conexiones) hacia Gemini.
+    HTTP/2 solo se activa si el paquete h2 está instalado.
+    
+    Args:
+        max_connections: Máximo de conexiones simultáneas
+        max_keepalive_connections: Máximo de conexiones inactivas reutilizables
+        keepalive_expiry: Segundos que una conexión inactiva se mantiene abierta
+        http2: Si se desea usar HTTP/2
+        
+    Returns:
+        Cliente httpx asíncrono configurado
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=http2 and importlib.util.find_spec("h2") is not None,
+        timeout=None
+    )
 
 
 class GeminiService:
@@ -13,74 +203,799 @@ class GeminiService:
     Abstrae la lógica de comunicación con el LLM.
     """
     
-    def __init__(self, api_key: Optional[str], model: str):
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        base_url: Optional[str] = None,
+        theory_cache: Optional[ResponseCache] = None,
+        questions_cache: Optional[ResponseCache] = None,
+        limiter: Optional[OutboundLimiter] = None,
+        policy: Optional[CallPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        topic_index: Optional[TopicIndex] = None,
+        demand: Optional[DemandTracker] = None,
+        router: Optional[ModelRouter] = None
+    ):
         """
         Inicializa el servicio de Gemini.
         
         Args:
             api_key: API key de Gemini (obtenida de settings)
-            model: Modelo de Gemini a utilizar (obtenido de settings)
+            model: Modelo de Gemini principal (obtenido de settings)
+            http_client: Cliente HTTP compartido; si es None el SDK crea el suyo
+            base_url: URL base alternativa de la API (por ejemplo, un stub local)
+            theory_cache: Caché de teoría generada; None para desactivarla
+            questions_cache: Caché de preguntas por digest de PDF; None para desactivarla
+            limiter: Control de admisión de las llamadas a Gemini; None para no limitar
+            policy: Plazo, reintentos y hedging de cada llamada; None para una sola llamada sin plazo
+            breaker: Circuit breaker del modelo principal; los demás modelos reciben uno igual. None para desactivarlo
+            topic_index: Índice de temas respondidos para reutilizar la teoría de temas parecidos; None para desactivarlo
+            demand: Registro de la demanda de temas para el precalentamiento; None para no registrarla
+            router: Enrutado entre modelos por tamaño y salud; None para usar siempre el modelo principal
         """
         if not api_key:
             raise GeminiServiceError("API key de Gemini no configurada")
         
-        self.client = genai.Client(api_key=api_key)
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model = model
+        self.theory_cache = theory_cache
+        self.questions_cache = questions_cache
+        self.limiter = limiter
+        self.policy = policy
+        self.breaker = breaker
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self.topic_index = topic_index
+        self.demand = demand
+        self.router = router
+        self.singleflight = SingleFlight()
+        self._http_client = http_client
+    
+    @property
+    def client(self):
+        """
+        Cliente del SDK de Gemini. Se crea en el primer uso (o en preload):
+        importar el SDK tarda del orden de un segundo y no debe retrasar el
+        arranque del servidor.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+                    http_options = types.HttpOptions(
+                        base_url=self._base_url,
+                        httpx_async_client=self._http_client
+                    )
+                    self._client = genai.Client(api_key=self._api_key, http_options=http_options)
+        return self._client
+    
+    async def preload(self) -> None:
+        """Importa el SDK y crea el cliente en un hilo, sin bloquear el event loop."""
+        if self._client is None:
+            await asyncio.to_thread(lambda: self.client)
+    
+    async def warmup(self, timeout: float) -> dict:
+        """
+        Importa el SDK y abre la conexión con Gemini (DNS, TLS y, si aplica,
+        HTTP/2) antes de la primera petición consultando los metadatos del
+        modelo, que no consume cuota.
+        Un fallo no impide arrancar: las peticiones abrirán la conexión al llegar.
+        
+        Args:
+            timeout: Segundos máximos de espera
+            
+        Returns:
+            Diccionario con el resultado (ok), la duración en ms y el error, si lo hubo
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            await self.preload()
+            await asyncio.wait_for(self.client.aio.models.get(model=self.model), timeout)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        return {
+            "ok": error is None,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error
+        }
+    
+    async def aclose(self) -> None:
+        """Cierra las conexiones abiertas hacia Gemini."""
+        if self._client is not None:
+            await self._client.aio.aclose()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+    
+    def _admit(self, prompt: str, timeout: Optional[float] = None) -> AsyncContextManager[None]:
+        """
+        Reserva la llamada en el limitador (si está configurado) durante el bloque.
+        La espera por admisión no supera timeout (lo que queda del plazo de la llamada).
+        """
+        if self.limiter is None:
+            return contextlib.nullcontext()
+        return self.limiter.acquire(estimate_tokens(prompt), timeout)
+    
+    def _breaker(self, model: str) -> Optional[CircuitBreaker]:
+        """Circuit breaker de un modelo: un modelo sobrecargado no corta las llamadas a los demás."""
+        if self.breaker is None or model == self.model:
+            return self.breaker
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                failure_threshold=self.breaker.failure_threshold,
+                reset_seconds=self.breaker.reset_seconds
+            )
+        return breaker
+    
+    def _available(self, model: str) -> bool:
+        breaker = self._breaker(model)
+        return breaker is None or breaker.state != ABIERTO
+    
+    def breaker_stats(self) -> Optional[dict]:
+        """
+        Estado del circuit breaker de cada modelo usado, por nombre de modelo.
+        
+        Returns:
+            {modelo: estadísticas}, o None si el circuit breaker está desactivado
+        """
+        if self.breaker is None:
+            return None
+        stats = {self.model: self.breaker.stats()}
+        stats.update((model, breaker.stats()) for model, breaker in self._breakers.items())
+        return stats
+    
+    def route(self, operation: str, input_chars: int) -> Route:
+        """
+        Elige el modelo de una operación (ver ModelRouter.route).
+        Sin enrutado devuelve siempre el modelo principal.
+        
+        Args:
+            operation: Operación (teoria, preguntas, fusion)
+            input_chars: Caracteres de la entrada del usuario (tema o texto)
+            
+        Returns:
+            El modelo elegido y el tier al que bajar si la llamada falla
+        """
+        if self.router is None:
+            return Route(operation, self.model, PRINCIPAL, "single")
+        return self.router.route(operation, input_chars, self._available)
+    
+    def planned_model(self, operation: str, input_chars: int) -> str:
+        """Modelo que corresponde a una operación sin tener en cuenta la salud (búsquedas en caché y precalentamiento)."""
+        if self.router is None:
+            return self.model
+        return self.router.plan(operation, input_chars).model
+    
+    async def _call(
+        self,
+        attempt: Callable[[Optional[float]], Awaitable[T]],
+        model: str,
+        hedge: bool = False
+    ) -> T:
+        """
+        Ejecuta una llamada a Gemini aplicando el circuit breaker, el plazo total
+        y los reintentos con espera exponencial y jitter de la política configurada.
+        El plazo cuenta desde antes de la admisión en el limitador: la espera en
+        él, los intentos y las esperas entre reintentos comparten el mismo plazo.
+        Solo se reintentan los errores transitorios; los rechazos locales del
+        limitador y los errores de la petición (4xx) se propagan de inmediato.
+        Para el circuit breaker solo cuentan los fallos de Gemini; los errores
+        de la petición (4xx) y las cuotas (429) no lo cierran ni lo abren.
+        
+        Args:
+            attempt: Función que hace un intento; recibe los segundos restantes del plazo
+            model: Modelo al que se llama (cada modelo tiene su circuit breaker)
+            hedge: Si se permite duplicar el intento cuando tarda (ver CallPolicy.hedge_after)
+            
+        Returns:
+            El resultado del primer intento correcto
+            
+        Raises:
+            GeminiServiceError: Si el circuito está abierto o fallan todos los intentos
+        """
+        policy = self.policy
+        breaker = self._breaker(model)
+        deadline = time.monotonic() + policy.deadline if policy else None
+        retry = 0
+        while True:
+            if breaker is not None:
+                try:
+                    breaker.check()
+                except GeminiServiceError as e:
+                    LLM_ERRORS.labels(type(e).__name__).inc()
+                    raise
+            def remaining() -> Optional[float]:
+                # Se calcula al empezar cada intento: el duplicado de hedged arranca más tarde
+                return deadline - time.monotonic() if deadline is not None else None
+            
+            try:
+                if hedge and policy and policy.hedge_after and (
+                    breaker is None or breaker.state == CERRADO
+                ):
+                    result = await hedged(lambda: attempt(remaining()), policy.hedge_after)
+                else:
+                    result = await attempt(remaining())
+            except GeminiServiceError as e:
+                # Rechazo local (limitador): no dice nada sobre la salud de Gemini
+                LLM_ERRORS.labels(type(e).__name__).inc()
+                if breaker is not None:
+                    breaker.release_probe()
+                raise
+            except Exception as e:
+                if breaker is not None:
+                    if _is_outage(e):
+                        breaker.record_failure()
+                    else:
+                        # Un error de la petición (4xx) no indica que Gemini esté sano
+                        breaker.release_probe()
+                error = _upstream_error(e)
+                LLM_ERRORS.labels(type(error).__name__).inc()
+                if not policy or retry >= policy.max_retries or not _is_retryable(e):
+                    raise error from e
+                hint = _retry_delay(e.details) if _is_api_error(e) else None
+                if hint is not None and hint > policy.max_delay:
+                    # La cuota no se repondrá pronto: mejor devolver Retry-After al cliente
+                    raise error from e
+                delay = policy.backoff(retry, hint)
+                if time.monotonic() + delay >= deadline:
+                    raise error from e
+                await asyncio.sleep(delay)
+                retry += 1
+            except BaseException:
+                # Intento cancelado (cliente desconectado, plazo o duplicado de hedged
+                # descartado): si era la llamada de prueba, la siguiente debe poder probar
+                if breaker is not None:
+                    breaker.release_probe()
+                raise
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                return result
+    
+    async def _generate_once(self, prompt: str, model: str, timeout: Optional[float]) -> str:
+        """Un intento de generate_content: admisión en el limitador y llamada, dentro del plazo."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with span("llm_attempt"):
+            # El hueco entre llm_attempt y gemini_call es la espera en el limitador
+            async with self._admit(prompt, timeout):
+                with _track_call("generate", model, prompt, self.router), span("gemini_call", model=model):
+                    response = await asyncio.wait_for(
+                        self.client.aio.models.generate_content(model=model, contents=prompt),
+                        _time_left(deadline)
+                    )
+                    annotate(response_chars=len(response.text or ""))
+                LLM_RESPONSE_CHARS.observe(len(response.text or ""))
+                return response.text
     
-    def generate_content(self, prompt: str) -> str:
+    async def generate_content(self, prompt: str, model: Optional[str] = None) -> str:
         """
         Genera contenido usando Gemini.
+        Usa el cliente asíncrono del SDK (client.aio) para no bloquear el event loop.
+        Cada llamada tiene un plazo total y reintenta los errores transitorios.
         
         Args:
             prompt: El prompt a enviar a Gemini
+            model: Modelo a usar; None para el principal
             
         Returns:
             El texto generado por Gemini
             
         Raises:
+            GeminiRateLimitError: Si se supera el límite de peticiones o la cuota de Gemini
+            GeminiTimeoutError: Si Gemini no responde dentro del plazo
+            GeminiUnavailableError: Si hay sobrecarga local, el circuito está abierto o Gemini no está disponible
             GeminiServiceError: Si hay un error al generar el contenido
         """
+        model = model or self.model
+        with STAGE_LATENCY.labels("llm").time(), span("llm", model=model, prompt_chars=len(prompt)):
+            return await self._call(lambda timeout: self._generate_once(prompt, model, timeout), model, hedge=True)
+    
+    async def _generate_routed(self, prompt: str, route: Route) -> tuple[str, str]:
+        """
+        generate_content con el modelo de la ruta y, si ese modelo falla (plazo,
+        cuota o caída, tras sus reintentos), una vez más con el tier de respaldo.
+        
+        Returns:
+            Tupla (texto generado, modelo que lo generó)
+        """
+        if self.router is not None:
+            self.router.record(route)
+        try:
+            return await self.generate_content(prompt, route.model), route.model
+        except GeminiServiceError as e:
+            if route.fallback is None or not _is_model_failure(e):
+                raise
+        route = self.router.fallback(route)
+        annotate(fallback=route.model)
+        return await self.generate_content(prompt, route.model), route.model
+    
+    async def _open_stream(self, prompt: str, model: str, timeout: Optional[float]) -> tuple:
+        """
+        Un intento de generate_content_stream: abre el stream y espera el primer
+        fragmento, de modo que los fallos antes de enviar nada al cliente se reintentan.
+        El hueco del limitador queda en la pila devuelta hasta cerrar el stream.
+        
+        Returns:
+            Tupla (pila de contextos, iterador de fragmentos, primer fragmento o None)
+        """
+        stack = contextlib.AsyncExitStack()
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt
+            # Solo hasta el primer fragmento: el resto del stream lo mide la traza de la petición
+            with span("llm_first_chunk", model=model, prompt_chars=len(prompt)):
+                deadline = time.monotonic() + timeout if timeout is not None else None
+                await stack.enter_async_context(self._admit(prompt, timeout))
+                stack.enter_context(_track_call("stream", model, prompt, self.router))
+                stream = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(model=model, contents=prompt),
+                    _time_left(deadline)
+                )
+                chunks = stream.__aiter__()
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), _time_left(deadline))
+                except StopAsyncIteration:
+                    first = None
+        except BaseException as e:
+            await stack.__aexit__(type(e), e, e.__traceback__)
+            raise
+        return stack, chunks, first
+    
+    async def generate_content_stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Genera contenido usando Gemini y entrega el texto por fragmentos
+        a medida que el modelo los produce.
+        Los intentos fallidos antes del primer fragmento se reintentan; después,
+        cada fragmento debe llegar dentro del plazo de la política.
+        
+        Args:
+            prompt: El prompt a enviar a Gemini
+            model: Modelo a usar; None para el principal
+            
+        Yields:
+            Fragmentos de texto generados por Gemini
+            
+        Raises:
+            GeminiRateLimitError: Si se supera el límite de peticiones o la cuota de Gemini
+            GeminiTimeoutError: Si Gemini no responde dentro del plazo
+            GeminiUnavailableError: Si hay sobrecarga local, el circuito está abierto o Gemini no está disponible
+            GeminiServiceError: Si hay un error al generar el contenido
+        """
+        model = model or self.model
+        with STAGE_LATENCY.labels("llm").time():
+            stack, chunks, first = await self._call(lambda timeout: self._open_stream(prompt, model, timeout), model)
+            # El hueco del limitador se mantiene durante todo el stream: la petición sigue en curso
+            async with stack:
+                if first is None:
+                    return
+                response_chars = len(first.text or "")
+                if first.text:
+                    yield first.text
+                chunk_timeout = self.policy.deadline if self.policy else None
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), chunk_timeout)
+                        except StopAsyncIteration:
+                            break
+                        if chunk.text:
+                            response_chars += len(chunk.text)
+                            yield chunk.text
+                except Exception as e:
+                    error = _upstream_error(e)
+                    LLM_ERRORS.labels(type(error).__name__).inc()
+                    raise error
+                LLM_RESPONSE_CHARS.observe(response_chars)
+    
+    async def _generate_cached(
+        self,
+        prompt: str,
+        route: Route,
+        cache: Optional[ResponseCache],
+        cache_key: Optional[CacheKey],
+        refresh: bool = False
+    ) -> GenerationResult:
+        """
+        Genera contenido consultando primero la caché indicada.
+        Las llamadas concurrentes equivalentes (misma clave de caché o, sin ella,
+        mismo prompt) comparten una sola petición a Gemini.
+        La clave incluye el modelo: se consulta la del modelo de la ruta y, si
+        responde el de respaldo, el resultado se guarda con la clave de este.
+        
+        Args:
+            prompt: El prompt a enviar a Gemini
+            route: Modelo elegido para la llamada (route())
+            cache: Caché a consultar; None para no usar caché
+            cache_key: Clave de caché según el modelo; None para no usar caché
+            refresh: Si es True, se regenera aunque esté en caché y se reemplaza la entrada
+            
+        Returns:
+            El texto generado y si provino de la caché
+        """
+        key = cache_key(route.model) if cache is not None and cache_key is not None else None
+        use_cache = key is not None
+        if use_cache and not refresh:
+            with span("cache_lookup"):
+                cached = await cache.aget(key)
+                annotate(hit=cached is not None)
+            if cached is not None:
+                return GenerationResult(cached, cached=True)
+        
+        async def generate() -> str:
+            texto, model = await self._generate_routed(prompt, route)
+            if use_cache:
+                await cache.aset(cache_key(model), texto)
+            return texto
+        
+        flight_key = key or make_cache_key("prompt", route.model, prompt)
+        # Si ya había una llamada igual en curso, este tramo solo espera (sin llm dentro)
+        with span("generation"):
+            return GenerationResult(await self.singleflight.do(flight_key, generate))
+    
+    async def _stream_cached(
+        self,
+        prompt: str,
+        route: Route,
+        cache: Optional[ResponseCache],
+        cache_key: Optional[CacheKey]
+    ) -> AsyncIterator[str]:
+        """
+        Genera contenido por fragmentos consultando primero la caché indicada.
+        Un acierto se entrega en un único fragmento; un fallo se guarda en caché
+        al completarse el stream. Si el modelo de la ruta falla antes del primer
+        fragmento (nada enviado aún al cliente), se usa el tier de respaldo.
+        
+        Args:
+            prompt: El prompt a enviar a Gemini
+            route: Modelo elegido para la llamada (route())
+            cache: Caché a consultar; None para no usar caché
+            cache_key: Clave de caché según el modelo; None para no usar caché
+            
+        Yields:
+            Fragmentos de texto
+        """
+        key = cache_key(route.model) if cache is not None and cache_key is not None else None
+        use_cache = key is not None
+        if use_cache:
+            cached = await cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        if self.router is not None:
+            self.router.record(route)
+        chunks = self.generate_content_stream(prompt, route.model)
+        try:
+            first = await anext(chunks, None)
+        except GeminiServiceError as e:
+            if route.fallback is None or not _is_model_failure(e):
+                raise
+            route = self.router.fallback(route)
+            annotate(fallback=route.model)
+            chunks = self.generate_content_stream(prompt, route.model)
+            first = await anext(chunks, None)
+        if first is None:
+            return
+        
+        fragmentos = [first]
+        yield first
+        async for chunk in chunks:
+            fragmentos.append(chunk)
+            yield chunk
+        
+        if use_cache:
+            await cache.aset(cache_key(route.model), "".join(fragmentos))
+    
+    def build_theory_prompt(self, tema: str) -> str:
+        """
+        Construye el prompt para generar teoría sobre un tema.
+        
+        Args:
+            tema: El tema sobre el cual generar teoría
+            
+        Returns:
+            El prompt a enviar a Gemini
+        """
+        with span("prompt_build", kind="teoria"):
+            return (
+                f"Genera una explicación teórica completa y educativa sobre el siguiente tema: {tema}. "
+                f"Incluye conceptos clave, ejemplos cuando sea apropiado, y estructura la información "
+                f"de manera clara y didáctica."
             )
-            return response.text
-        except Exception as e:
-            raise GeminiServiceError(f"Error al generar contenido con Gemini: {str(e)}")
     
-    def generate_theory(self, tema: str) -> str:
+    def build_questions_prompt(self, texto: str) -> str:
+        """
+        Construye el prompt para generar preguntas a partir de un texto.
+        
+        Args:
+            texto: El texto del cual generar preguntas
+            
+        Returns:
+            El prompt a enviar a Gemini
+        """
+        with span("prompt_build", kind="preguntas", chars=len(texto)):
+            return (
+                f"Basándote en el siguiente contenido, genera preguntas educativas y relevantes sobre el tema. "
+                f"Las preguntas deben ser claras, variadas (de comprensión, análisis, aplicación) y útiles "
+                f"para evaluar el aprendizaje. Genera entre 5 y 10 preguntas.\n\n"
+                f"Contenido:\n{texto}"
+            )
+    
+    def build_merge_questions_prompt(self, preguntas: list[str]) -> str:
+        """
+        Construye el prompt para fusionar las preguntas generadas por secciones.
+        
+        Args:
+            preguntas: Preguntas (o listas de preguntas) de cada sección del documento
+            
+        Returns:
+            El prompt a enviar a Gemini
+        """
+        with span("prompt_build", kind="fusion", preguntas=len(preguntas)):
+            listado = "\n".join(f"- {pregunta}" for pregunta in preguntas)
+            return (
+                f"Las siguientes preguntas educativas se generaron a partir de distintas secciones "
+                f"de un mismo documento. Elimina las que sean duplicadas o casi equivalentes y "
+                f"selecciona entre 10 y 15 que cubran el documento completo, manteniendo la variedad "
+                f"(de comprensión, análisis, aplicación). Devuélvelas como una lista numerada.\n\n"
+                f"Preguntas:\n{listado}"
+            )
+    
+    def theory_cache_key(self, tema: str, model: Optional[str] = None) -> str:
+        """
+        Clave de caché de la teoría: tema normalizado, modelo y versión del prompt.
+        
+        Args:
+            tema: El tema sobre el cual generar teoría
+            model: Modelo que genera la teoría; None para el principal
+            
+        Returns:
+            La clave de caché
+        """
+        return make_cache_key("teoria", THEORY_PROMPT_VERSION, model or self.model, normalize_tema(tema))
+    
+    async def _similar_theory(self, tema: str, route: Route) -> Optional[GenerationResult]:
+        """
+        Busca en el índice un tema parecido ya respondido y devuelve su teoría
+        desde la caché (la generada por el modelo de la ruta). Si el más
+        parecido es el propio tema, o su teoría ya no está en caché, devuelve
+        None y se sigue el camino normal.
+        
+        Args:
+            tema: El tema solicitado
+            route: Modelo elegido para el tema solicitado
+            
+        Returns:
+            La teoría del tema parecido, o None
+        """
+        if self.topic_index is None or self.theory_cache is None:
+            return None
+        match = self.topic_index.lookup(tema)
+        if match is None:
+            TOPIC_LOOKUPS.labels("miss").inc()
+            return None
+        similar_key = self.theory_cache_key(match.tema, route.model)
+        if similar_key == self.theory_cache_key(tema, route.model):
+            TOPIC_LOOKUPS.labels("same").inc()
+            return None
+        texto = await self.theory_cache.aget(similar_key)
+        if texto is None:
+            TOPIC_LOOKUPS.labels("expired").inc()
+            return None
+        TOPIC_LOOKUPS.labels("similar").inc()
+        return GenerationResult(texto, cached=True, matched_tema=match.tema)
+    
+    def _record_theory_demand(self, tema: str, matched_tema: Optional[str] = None) -> None:
+        """Suma una petición al tema servido (el parecido reutilizado, si lo hubo)."""
+        if self.demand is not None:
+            servido = matched_tema or tema
+            self.demand.record(TEORIA, normalize_tema(servido), servido)
+    
+    async def peek_theory(self, tema: str) -> Optional[str]:
+        """
+        Teoría del tema que hay en caché para el modelo que lo atendería ahora,
+        sin generarla ni contar acierto o fallo (revalidaciones HTTP).
+        
+        Args:
+            tema: El tema solicitado
+            
+        Returns:
+            La teoría en caché, o None
+        """
+        if self.theory_cache is None:
+            return None
+        return await self.theory_cache.apeek(self.theory_cache_key(tema, self.route(TEORIA, len(tema)).model))
+    
+    async def generate_theory(self, tema: str, refresh: bool = False) -> GenerationResult:
         """
         Genera teoría educativa sobre un tema dado.
+        Consulta primero la caché de teoría si está configurada y, con el índice
+        de temas, reutiliza la teoría de un tema parecido ya respondido.
         
         Args:
             tema: El tema sobre el cual generar teoría
+            refresh: Regenerar y reemplazar la entrada en caché (precalentamiento);
+                no cuenta como demanda
             
         Returns:
-            La teoría generada
+            La teoría generada, si provino de la caché y el tema parecido reutilizado
         """
-        prompt = (
-            f"Genera una explicación teórica completa y educativa sobre el siguiente tema: {tema}. "
-            f"Incluye conceptos clave, ejemplos cuando sea apropiado, y estructura la información "
-            f"de manera clara y didáctica."
+        route = self.route(TEORIA, len(tema))
+        if not refresh:
+            similar = await self._similar_theory(tema, route)
+            if similar is not None:
+                self._record_theory_demand(tema, similar.matched_tema)
+                return similar
+            self._record_theory_demand(tema)
+        resultado = await self._generate_cached(
+            self.build_theory_prompt(tema),
+            route,
+            self.theory_cache,
+            functools.partial(self.theory_cache_key, tema),
+            refresh
         )
-        return self.generate_content(prompt)
+        if self.topic_index is not None:
+            self.topic_index.add(tema)
+        return resultado
+    
+    async def generate_theory_stream(self, tema: str) -> AsyncIterator[str]:
+        """
+        Genera teoría educativa sobre un tema dado, por fragmentos.
+        Si la teoría (o la de un tema parecido) está en caché se entrega en un
+        único fragmento; si no, se guarda en caché al completarse el stream.
+        
+        Args:
+            tema: El tema sobre el cual generar teoría
+            
+        Yields:
+            Fragmentos de la teoría
+        """
+        route = self.route(TEORIA, len(tema))
+        similar = await self._similar_theory(tema, route)
+        if similar is not None:
+            self._record_theory_demand(tema, similar.matched_tema)
+            yield similar.text
+            return
+        self._record_theory_demand(tema)
+        async for chunk in self._stream_cached(
+            self.build_theory_prompt(tema), route, self.theory_cache, functools.partial(self.theory_cache_key, tema)
+        ):
+            yield chunk
+        if self.topic_index is not None:
+            self.topic_index.add(tema)
     
-    def generate_questions_from_text(self, texto: str) -> str:
+    def questions_cache_key(self, digest: Optional[str], model: Optional[str] = None) -> Optional[str]:
+        """
+        Clave de caché de las preguntas: digest del PDF, modelo y versión del prompt.
+        
+        Args:
+            digest: SHA-256 del PDF de origen; None si el texto no proviene de un PDF
+            model: Modelo que genera las preguntas; None para el principal
+            
+        Returns:
+            La clave de caché, o None si no hay digest
+        """
+        if digest is None:
+            return None
+        return make_cache_key("pdf-preguntas", QUESTIONS_PROMPT_VERSION, model or self.model, digest)
+    
+    async def generate_questions_from_text(
+        self,
+        texto: str,
+        digest: Optional[str] = None,
+        refresh: bool = False
+    ) -> GenerationResult:
         """
         Genera preguntas educativas basadas en un texto.
+        Si se indica el digest del PDF de origen, consulta primero la caché de preguntas.
         
         Args:
             texto: El texto del cual generar preguntas
+            digest: SHA-256 del PDF del que se extrajo el texto (opcional)
+            refresh: Regenerar y reemplazar la entrada en caché (precalentamiento)
             
         Returns:
-            Las preguntas generadas
+            Las preguntas generadas y si provinieron de la caché
         """
-        prompt = (
-            f"Basándote en el siguiente contenido, genera preguntas educativas y relevantes sobre el tema. "
-            f"Las preguntas deben ser claras, variadas (de comprensión, análisis, aplicación) y útiles "
-            f"para evaluar el aprendizaje. Genera entre 5 y 10 preguntas.\n\n"
-            f"Contenido:\n{texto}"
+        return await self._generate_cached(
+            self.build_questions_prompt(texto),
+            self.route(PREGUNTAS, len(texto)),
+            self.questions_cache,
+            functools.partial(self.questions_cache_key, digest),
+            refresh
+        )
+    
+    def generate_questions_stream(self, texto: str, digest: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Genera preguntas educativas basadas en un texto, por fragmentos.
+        
+        Args:
+            texto: El texto del cual generar preguntas
+            digest: SHA-256 del PDF del que se extrajo el texto (opcional)
+            
+        Returns:
+            Iterador asíncrono con los fragmentos de las preguntas
+        """
+        return self._stream_cached(
+            self.build_questions_prompt(texto),
+            self.route(PREGUNTAS, len(texto)),
+            self.questions_cache,
+            functools.partial(self.questions_cache_key, digest)
+        )
+    
+    def merged_questions_cache_key(
+        self,
+        digest: Optional[str],
+        max_section_tokens: int,
+        model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Clave de caché de las preguntas fusionadas de un documento completo:
+        digest del PDF, tamaño de sección, modelo y versiones de los prompts.
+        
+        Args:
+            digest: SHA-256 del PDF de origen; None si el texto no proviene de un PDF
+            max_section_tokens: Tokens por sección usados al dividir el texto
+            model: Modelo que fusiona las preguntas; None para el principal
+            
+        Returns:
+            La clave de caché, o None si no hay digest
+        """
+        if digest is None:
+            return None
+        return make_cache_key(
+            "pdf-preguntas-completo", QUESTIONS_PROMPT_VERSION, MERGE_PROMPT_VERSION,
+            model or self.model, digest, str(max_section_tokens)
+        )
+    
+    async def merge_questions(
+        self,
+        preguntas: list[str],
+        route: Route,
+        cache_key: Optional[CacheKey] = None
+    ) -> GenerationResult:
+        """
+        Fusiona y deduplica las preguntas generadas por secciones.
+        
+        Args:
+            preguntas: Preguntas de cada sección del documento
+            route: Modelo elegido para la fusión (route(FUSION, caracteres del documento))
+            cache_key: Clave de caché del resultado según el modelo (ver merged_questions_cache_key)
+            
+        Returns:
+            Las preguntas fusionadas y si provinieron de la caché
+        """
+        return await self._generate_cached(
+            self.build_merge_questions_prompt(preguntas),
+            route,
+            self.questions_cache,
+            cache_key
+        )
+    
+    def merge_questions_stream(
+        self,
+        preguntas: list[str],
+        route: Route,
+        cache_key: Optional[CacheKey] = None
+    ) -> AsyncIterator[str]:
+        """
+        Fusiona y deduplica las preguntas generadas por secciones, por fragmentos.
+        
+        Args:
+            preguntas: Preguntas de cada sección del documento
+            route: Modelo elegido para la fusión (route(FUSION, caracteres del documento))
+            cache_key: Clave de caché del resultado según el modelo (ver merged_questions_cache_key)
+            
+        Returns:
+            Iterador asíncrono con los fragmentos de las preguntas fusionadas
+        """
+        return self._stream_cached(
+            self.build_merge_questions_prompt(preguntas),
+            route,
+            self.questions_cache,
+            cache_key
         )
-        return self.generate_content(prompt)
-
@@ -0,0 +1,460 @@
+"""
+Servicio de trabajos en segundo plano.
+Permite encolar tareas largas (generación de preguntas desde PDF) y consultar
+su estado más tarde, sin mantener abierta la conexión HTTP.
+El almacenamiento de los trabajos es intercambiable (memoria o SQLite)
+detrás de la interfaz JobStore.
+"""
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+from app.core.exceptions import JobQueueFullError
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+_STOPPED_MESSAGE = "El servidor se detuvo antes de terminar el trabajo"
+_RESTARTED_MESSAGE = "El servidor se reinició antes de terminar el trabajo"
+
+# Cada cuánto un proceso con trabajos en SQLite confirma que sigue vivo; tras
+# tres latidos perdidos sus trabajos pendientes o en curso se marcan fallidos
+HEARTBEAT_SECONDS = 10.0
+
+
+class JobStore(ABC):
+    """Interfaz de almacenamiento de los trabajos."""
+
+    # True si las operaciones hacen E/S bloqueante y deben ejecutarse fuera del event loop
+    blocking = False
+
+    @abstractmethod
+    def put(self, job: dict, expires_at: Optional[float] = None) -> None:
+        """Guarda o reemplaza un trabajo; expires_at None para que no expire."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        """Devuelve el trabajo si existe y no ha expirado, None en caso contrario."""
+
+    @abstractmethod
+    def purge(self) -> None:
+        """Elimina los trabajos expirados."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Número de trabajos almacenados."""
+
+    def close(self) -> None:
+        """Libera los recursos del backend."""
+
+
+class MemoryJobStore(JobStore):
+    """
+    Trabajos en memoria.
+    Es local a cada proceso: el estado solo puede consultarse en el proceso que recibió el trabajo.
+    """
+
+    def __init__(self):
+        self._jobs: dict[str, tuple[Optional[float], dict]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: dict, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = (expires_at, job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            expires_at, job = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._jobs[job_id]
+                return None
+            return dict(job)
+
+    def purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, (expires_at, _) in self._jobs.items()
+                if expires_at is not None and expires_at < now
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Trabajos en un archivo SQLite local.
+    El estado y los resultados sobreviven a reinicios y pueden consultarse
+    desde cualquier proceso que comparta el archivo. El estado y la ejecución
+    que creó cada trabajo se guardan también en columnas indexadas, para
+    buscar los huérfanos sin leer el JSON de todos los trabajos.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ruta del archivo SQLite (se crean los directorios necesarios)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "estado" not in columns:
+            # Archivos creados antes de existir las columnas: se rellenan desde el JSON una vez
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN estado TEXT")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN instancia TEXT")
+            self._conn.execute(
+                "UPDATE jobs SET estado = json_extract(data, '$.estado'), "
+                "instancia = json_extract(data, '$.instancia')"
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_estado ON jobs (estado, instancia)")
+        # Último latido de cada ejecución del servidor que tiene trabajos en el archivo
+        self._conn.execute("CREATE TABLE IF NOT EXISTS instances (id TEXT PRIMARY KEY, seen REAL NOT NULL)")
+
+    def put(self, job: dict, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, expires_at, estado, instancia) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], json.dumps(job, ensure_ascii=False), expires_at, job.get("estado"), job.get("instancia"))
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                return None
+            return json.loads(data)
+
+    def purge(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),))
+
+    def heartbeat(self, instance_id: str) -> None:
+        """Registra que la ejecución del servidor instance_id sigue viva."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO instances (id, seen) VALUES (?, ?)", (instance_id, time.time())
+            )
+
+    def abandon_orphans(self, message: str, expires_at: float, stale_before: float) -> int:
+        """
+        Marca como fallidos los trabajos pendientes o en curso cuya ejecución
+        del servidor no da señales de vida desde stale_before (la cola vive en
+        memoria y no sobrevive a un reinicio). Se compara el id de la ejecución
+        y no el pid, que en un contenedor se repite tras reiniciar.
+        Los trabajos de otros procesos vivos que comparten el archivo no se tocan.
+
+        Args:
+            message: Error que se guarda en los trabajos marcados
+            expires_at: Expiración de los trabajos marcados
+            stale_before: Instante antes del cual un latido se considera perdido
+
+        Returns:
+            Número de trabajos marcados
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT jobs.id, jobs.data FROM jobs "
+                "LEFT JOIN instances ON instances.id = jobs.instancia "
+                "WHERE jobs.estado IN (?, ?) "
+                "AND (instances.seen IS NULL OR instances.seen < ?)",
+                (PENDIENTE, PROCESANDO, stale_before)
+            ).fetchall()
+            orphans = []
+            for job_id, data in rows:
+                job = json.loads(data)
+                job.update(estado=ERROR, error=message, actualizado=time.time())
+                orphans.append((json.dumps(job, ensure_ascii=False), expires_at, ERROR, job_id))
+            self._conn.executemany("UPDATE jobs SET data = ?, expires_at = ?, estado = ? WHERE id = ?", orphans)
+            self._conn.execute("DELETE FROM instances WHERE seen < ?", (stale_before,))
+            return len(orphans)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _QueuedJob(NamedTuple):
+    """Trabajo en cola: su id, la corrutina a ejecutar y la limpieza posterior."""
+    job_id: str
+    run: Callable[[], Awaitable[Any]]
+    cleanup: Optional[Callable[[], None]]
+
+
+class JobService:
+    """
+    Cola acotada de trabajos atendida por un número fijo de workers asíncronos
+    dentro del proceso. El trabajo pesado de CPU (parseo de PDFs) ya se delega
+    en el pool de procesos, por lo que los workers solo esperan E/S. Con un
+    almacenamiento bloqueante (SQLite), sus operaciones se ejecutan en un hilo.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        max_queue: int,
+        ttl_seconds: float,
+        heartbeat_seconds: float = HEARTBEAT_SECONDS
+    ):
+        """
+        Args:
+            store: Almacenamiento de los trabajos (memoria o SQLite)
+            workers: Trabajos procesados a la vez
+            max_queue: Trabajos en espera como máximo; al superarlo se rechazan
+            ttl_seconds: Segundos que se conserva un trabajo terminado
+            heartbeat_seconds: Intervalo de los latidos con almacenamiento SQLite
+        """
+        self.store = store
+        # Id de esta ejecución: identifica sus trabajos en un almacenamiento compartido
+        self.instance_id = uuid.uuid4().hex
+        self.heartbeat_seconds = heartbeat_seconds
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._first_beat = asyncio.Event()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl_seconds = ttl_seconds
+        self._queue: Optional[asyncio.Queue[_QueuedJob]] = None
+        self._tasks: list[asyncio.Task] = []
+        self._running: set[str] = set()
+        # Trabajos admitidos que se están guardando y aún no están en la cola
+        self._submitting = 0
+        self._avg_duration: Optional[float] = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.heartbeat_errors = 0
+        self._closing = False
+        # Al arrancar, antes de que exista el event loop de las peticiones
+        self._abandon_orphans()
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta una operación del almacenamiento, en un hilo si hace E/S bloqueante."""
+        if self.store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _abandon_orphans(self) -> None:
+        """Con SQLite, marca como fallidos los trabajos de ejecuciones sin latidos recientes."""
+        if isinstance(self.store, SQLiteJobStore):
+            now = time.time()
+            self.store.abandon_orphans(_RESTARTED_MESSAGE, now + self.ttl_seconds, now - 3 * self.heartbeat_seconds)
+
+    async def _heartbeat(self) -> None:
+        """Latidos de esta ejecución; de paso recoge los trabajos de las que han muerto."""
+        while True:
+            try:
+                await self._run(self._beat)
+            except Exception:
+                # Un fallo pasajero (p. ej. "database is locked") no debe detener los latidos:
+                # sin ellos, los demás procesos darían por huérfanos los trabajos de este
+                self.heartbeat_errors += 1
+            self._first_beat.set()
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    def _beat(self) -> None:
+        self.store.heartbeat(self.instance_id)
+        self._abandon_orphans()
+
+    async def _ensure_started(self) -> asyncio.Queue:
+        """Crea la cola, los workers y los latidos en el event loop en curso (primer uso)."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            if isinstance(self.store, SQLiteJobStore):
+                self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        if self._heartbeat_task is not None:
+            # Antes de guardar el primer trabajo, para que otro proceso no lo tome por huérfano
+            await self._first_beat.wait()
+        return self._queue
+
+    async def submit(
+        self,
+        run: Callable[[], Awaitable[Any]],
+        cleanup: Optional[Callable[[], None]] = None,
+        **metadata: Any
+    ) -> dict:
+        """
+        Encola un trabajo. Debe llamarse desde el event loop.
+
+        Args:
+            run: Función asíncrona que produce el resultado (serializable a JSON)
+            cleanup: Función a ejecutar al terminar o descartar el trabajo (opcional)
+            metadata: Campos adicionales que se guardan con el trabajo
+
+        Returns:
+            El trabajo creado, en estado pendiente
+
+        Raises:
+            JobQueueFullError: Si la cola está llena
+        """
+        if self._closing:
+            self.rejected += 1
+            raise JobQueueFullError("El servidor se está deteniendo. Inténtalo de nuevo más tarde.")
+        queue = await self._ensure_started()
+        if queue.qsize() + self._submitting >= self.max_queue:
+            self.rejected += 1
+            raise JobQueueFullError(
+                "Hay demasiados trabajos en cola. Inténtalo de nuevo más tarde."
+            )
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "estado": PENDIENTE,
+            **metadata,
+            "creado": now,
+            "actualizado": now,
+            "resultado": None,
+            "error": None,
+            "instancia": self.instance_id
+        }
+        self._submitting += 1
+        try:
+            await self._run(self.store.purge)
+            # Los pendientes y en curso no expiran; si el proceso muere, los recoge abandon_orphans
+            await self._run(self.store.put, job)
+        finally:
+            self._submitting -= 1
+        if self._closing:
+            # close() empezó mientras se guardaba: ya no habrá workers que lo atiendan
+            await self._update(job["id"], estado=ERROR, error=_STOPPED_MESSAGE)
+            self.rejected += 1
+            raise JobQueueFullError("El servidor se está deteniendo. Inténtalo de nuevo más tarde.")
+        queue.put_nowait(_QueuedJob(job["id"], run, cleanup))
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """Devuelve el trabajo, o None si no existe o ya expiró. Debe llamarse desde el event loop."""
+        # Tras un reinicio, los clientes que consultan sus trabajos arrancan los latidos y la recogida de huérfanos
+        await self._ensure_started()
+        return await self._run(self.store.get, job_id)
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que la cola tenga hueco, para la cabecera Retry-After."""
+        if self._avg_duration is None:
+            return 1
+        pending = self._queue.qsize() if self._queue is not None else 0
+        return max(1, math.ceil(self._avg_duration * pending / self.workers))
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        await self._run(self._update_sync, job_id, fields)
+
+    def _update_sync(self, job_id: str, fields: dict) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        now = time.time()
+        job.update(fields, actualizado=now)
+        # El plazo de expiración solo empieza a contar al terminar el trabajo
+        terminado = job["estado"] in (COMPLETADO, ERROR)
+        self.store.put(job, now + self.ttl_seconds if terminado else None)
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._process(item)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, item: _QueuedJob) -> None:
+        self._running.add(item.job_id)
+        await self._update(item.job_id, estado=PROCESANDO)
+        start = time.perf_counter()
+        try:
+            resultado = await item.run()
+        except asyncio.CancelledError:
+            await self._update(item.job_id, estado=ERROR, error=_STOPPED_MESSAGE)
+            raise
+        except Exception as e:
+            self.failed += 1
+            await self._update(item.job_id, estado=ERROR, error=str(e))
+        else:
+            self.completed += 1
+            await self._update(item.job_id, estado=COMPLETADO, resultado=resultado)
+        finally:
+            self._running.discard(item.job_id)
+            if item.cleanup is not None:
+                item.cleanup()
+        duration = time.perf_counter() - start
+        # Media móvil exponencial de la duración, para estimar Retry-After
+        self._avg_duration = duration if self._avg_duration is None else 0.8 * self._avg_duration + 0.2 * duration
+
+    def stats(self) -> dict:
+        """Devuelve el estado de la cola."""
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "heartbeat_errors": self.heartbeat_errors,
+            "stored": len(self.store)
+        }
+
+    async def close(self, drain_timeout: float = 0) -> None:
+        """
+        Deja de aceptar trabajos, espera hasta drain_timeout segundos a que se
+        terminen los encolados y en curso, detiene los workers y marca como
+        fallidos los que queden sin terminar.
+
+        Args:
+            drain_timeout: Segundos de espera antes de cancelar (0 para cancelar de inmediato)
+        """
+        self._closing = True
+        if self._queue is not None and drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        tasks = self._tasks + ([self._heartbeat_task] if self._heartbeat_task is not None else [])
+        for task in tasks:
+            task.cancel()
+        # Los trabajos en curso se marcan como fallidos al cancelarse su worker
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            await self._update(item.job_id, estado=ERROR, error=_STOPPED_MESSAGE)
+            if item.cleanup is not None:
+                item.cleanup()
+        await self._run(self.store.close)
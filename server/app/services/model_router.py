@@ -0,0 +1,189 @@
+"""
+Enrutado de las llamadas a Gemini entre modelos (tiers).
+Cada operación se envía al tier que le corresponde por tamaño de la entrada
+(o al fijado para esa operación): los temas cortos a un modelo rápido y
+barato y los textos largos al modelo principal. Si el modelo elegido está
+lento, falla a menudo o tiene el circuito abierto, la llamada baja al tier más
+rápido que esté sano.
+"""
+import time
+from collections import deque
+from typing import Callable, NamedTuple, Optional
+from app.core.metrics import LLM_ROUTES
+
+# Tiers configurables (GEMINI_FAST_MODEL y GEMINI_MODEL)
+RAPIDO = "rapido"
+PRINCIPAL = "principal"
+
+# Motivos de una decisión de enrutado
+POR_TAMANO = "size"
+POR_OPERACION = "operation"
+DEGRADADO = "degraded"
+RESPALDO = "fallback"
+
+
+class ModelTier(NamedTuple):
+    """Un modelo y la entrada más larga (en caracteres) que se le envía; 0 para sin límite."""
+    name: str
+    model: str
+    max_input_chars: int = 0
+
+
+class Route(NamedTuple):
+    """Modelo elegido para una llamada y tier al que bajar si falla."""
+    operation: str
+    model: str
+    tier: str
+    reason: str
+    fallback: Optional[ModelTier] = None
+
+
+class ModelHealth:
+    """Latencia y errores de las llamadas a un modelo en una ventana deslizante."""
+
+    def __init__(self, window_seconds: float):
+        """
+        Args:
+            window_seconds: Segundos de historia que se tienen en cuenta
+        """
+        self.window_seconds = window_seconds
+        # (instante, segundos, correcta)
+        self._samples: deque[tuple[float, float, bool]] = deque()
+
+    def _trim(self, now: float) -> None:
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        now = time.monotonic()
+        self._samples.append((now, seconds, ok))
+        self._trim(now)
+
+    def snapshot(self) -> dict:
+        """Llamadas, tasa de error y latencia media de las correctas dentro de la ventana."""
+        self._trim(time.monotonic())
+        calls = len(self._samples)
+        latencies = [seconds for _, seconds, ok in self._samples if ok]
+        return {
+            "calls": calls,
+            "error_rate": round(1 - len(latencies) / calls, 3) if calls else 0.0,
+            "mean_latency_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None
+        }
+
+
+class ModelRouter:
+    """
+    Elige el modelo de cada llamada.
+    Los tiers van del más rápido al más grande; una operación usa el primero
+    cuyo max_input_chars admite su entrada, salvo que tenga un tier fijado.
+    Un modelo se considera degradado cuando, con al menos min_samples
+    llamadas en la ventana, su latencia media supera slow_seconds o su tasa
+    de error supera max_error_rate. Sin tráfico en la ventana vuelve a
+    considerarse sano, de modo que se recupera solo cuando deja de estar lento.
+    """
+
+    def __init__(
+        self,
+        tiers: list[ModelTier],
+        operation_tiers: dict[str, str],
+        window_seconds: float,
+        min_samples: int,
+        slow_seconds: float,
+        max_error_rate: float
+    ):
+        """
+        Args:
+            tiers: Tiers del más rápido al más grande (el último debe admitir cualquier tamaño)
+            operation_tiers: Tier fijo por operación (teoria, preguntas, fusion)
+            window_seconds: Ventana de la latencia y los errores de cada modelo
+            min_samples: Llamadas en la ventana necesarias para juzgar un modelo
+            slow_seconds: Latencia media a partir de la cual un modelo está degradado
+            max_error_rate: Tasa de error a partir de la cual un modelo está degradado
+        """
+        self.tiers = tiers
+        self.operation_tiers = operation_tiers
+        self.min_samples = min_samples
+        self.slow_seconds = slow_seconds
+        self.max_error_rate = max_error_rate
+        self._health = {tier.model: ModelHealth(window_seconds) for tier in tiers}
+        self._by_name = {tier.name: tier for tier in tiers}
+
+    def plan(self, operation: str, input_chars: int) -> ModelTier:
+        """Tier que corresponde a la operación y al tamaño de la entrada, sin mirar la salud."""
+        fixed = self.operation_tiers.get(operation)
+        if fixed is not None:
+            return self._by_name[fixed]
+        for tier in self.tiers:
+            if not tier.max_input_chars or input_chars <= tier.max_input_chars:
+                return tier
+        return self.tiers[-1]
+
+    def degraded(self, model: str) -> bool:
+        """True si el modelo está lento o fallando en la ventana actual."""
+        health = self._health.get(model)
+        if health is None:
+            return False
+        snapshot = health.snapshot()
+        if snapshot["calls"] < self.min_samples:
+            return False
+        if snapshot["error_rate"] > self.max_error_rate:
+            return True
+        latency = snapshot["mean_latency_seconds"]
+        return latency is not None and latency > self.slow_seconds
+
+    def route(
+        self,
+        operation: str,
+        input_chars: int,
+        available: Callable[[str], bool] = lambda model: True
+    ) -> Route:
+        """
+        Elige el modelo de una llamada. Solo se registra en las métricas
+        (record) si finalmente se llama a Gemini, no si responde la caché.
+
+        Args:
+            operation: Operación (teoria, preguntas, fusion)
+            input_chars: Caracteres de la entrada del usuario (tema o texto)
+            available: Indica si un modelo acepta llamadas (por ejemplo, su circuito no está abierto)
+
+        Returns:
+            El modelo elegido, el motivo y el tier más rápido al que bajar si la llamada falla
+        """
+        tier = self.plan(operation, input_chars)
+        reason = POR_OPERACION if operation in self.operation_tiers else POR_TAMANO
+        index = self.tiers.index(tier)
+        while index > 0 and (self.degraded(tier.model) or not available(tier.model)):
+            index -= 1
+            tier = self.tiers[index]
+            reason = DEGRADADO
+        fallback = self.tiers[index - 1] if index > 0 else None
+        return Route(operation, tier.model, tier.name, reason, fallback)
+
+    def record(self, route: Route) -> None:
+        """Registra en las métricas una llamada hecha con la ruta elegida."""
+        LLM_ROUTES.labels(route.operation, route.tier, route.reason).inc()
+
+    def fallback(self, route: Route) -> Route:
+        """Ruta hacia el tier de respaldo tras fallar la llamada (registrada en las métricas)."""
+        tier = route.fallback
+        LLM_ROUTES.labels(route.operation, tier.name, RESPALDO).inc()
+        index = self.tiers.index(tier)
+        return Route(route.operation, tier.model, tier.name, RESPALDO, self.tiers[index - 1] if index > 0 else None)
+
+    def observe(self, model: str, seconds: float, ok: bool) -> None:
+        """Registra el resultado de una llamada a un modelo."""
+        health = self._health.get(model)
+        if health is not None:
+            health.observe(seconds, ok)
+
+    def stats(self) -> dict:
+        """Tiers con su salud en la ventana actual."""
+        return {
+            tier.name: {
+                "model": tier.model,
+                "max_input_chars": tier.max_input_chars or None,
+                "degraded": self.degraded(tier.model),
+                **self._health[tier.model].snapshot()
+            }
+            for tier in self.tiers
+        }
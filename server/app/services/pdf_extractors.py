@@ -0,0 +1,141 @@
+"""
+Backends de extracción de texto de PDFs.
+Sigue el principio de Open/Closed: cada motor (PyPDF2, pypdf, PyMuPDF,
+pypdfium2) implementa la interfaz PDFExtractor y se elige por nombre desde
+PDF_EXTRACTORS. Los motores se importan al usarse, así que solo hace falta
+tener instalados los que se configuren.
+"""
+import importlib
+import importlib.util
+import mmap
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Generator, Union
+
+PDFStream = Union[BinaryIO, mmap.mmap]
+# Generador perezoso del texto de cada página; al cerrarlo se libera el documento
+Pages = Generator[str, None, None]
+
+
+class PDFExtractor(ABC):
+    """Interfaz de un motor de extracción de texto."""
+
+    # Nombre del backend en PDF_EXTRACTORS
+    name: str
+    # Módulo que debe estar instalado para usarlo
+    module: str
+
+    def available(self) -> bool:
+        """True si el módulo del motor está instalado."""
+        return importlib.util.find_spec(self.module) is not None
+
+    def preload(self) -> None:
+        """Importa el motor por adelantado (initializer del pool de procesos)."""
+        importlib.import_module(self.module)
+
+    @abstractmethod
+    def open(self, stream: PDFStream) -> tuple[int, Pages]:
+        """
+        Abre el documento.
+
+        Args:
+            stream: Contenido del PDF (BytesIO o archivo mapeado en memoria)
+
+        Returns:
+            Tupla (páginas totales, generador del texto de cada página)
+        """
+
+
+class PyPDF2Extractor(PDFExtractor):
+    """PyPDF2 3.x: Python puro, sin mantenimiento desde que pasó a llamarse pypdf."""
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def open(self, stream: PDFStream) -> tuple[int, Pages]:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(stream)
+        return len(reader.pages), (page.extract_text() or "" for page in reader.pages)
+
+
+class PypdfExtractor(PDFExtractor):
+    """pypdf: sucesor de PyPDF2 con la misma API y una extracción más rápida y robusta."""
+    name = "pypdf"
+    module = "pypdf"
+
+    def open(self, stream: PDFStream) -> tuple[int, Pages]:
+        from pypdf import PdfReader
+        reader = PdfReader(stream)
+        return len(reader.pages), (page.extract_text() or "" for page in reader.pages)
+
+
+class PyMuPDFExtractor(PDFExtractor):
+    """PyMuPDF (MuPDF en C): el más rápido, con licencia AGPL."""
+    name = "pymupdf"
+    module = "fitz"
+
+    def open(self, stream: PDFStream) -> tuple[int, Pages]:
+        import fitz
+        # MuPDF necesita el documento en memoria: con mmap se copian los bytes una vez
+        document = fitz.open(stream=stream.read(), filetype="pdf")
+        return document.page_count, self._pages(document)
+
+    @staticmethod
+    def _pages(document) -> Pages:
+        try:
+            for page in document:
+                yield page.get_text()
+        finally:
+            document.close()
+
+
+class PdfiumExtractor(PDFExtractor):
+    """pypdfium2 (PDFium de Chromium en C): rápido y con licencia permisiva."""
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def open(self, stream: PDFStream) -> tuple[int, Pages]:
+        import pypdfium2
+        document = pypdfium2.PdfDocument(stream.read())
+        return len(document), self._pages(document)
+
+    @staticmethod
+    def _pages(document) -> Pages:
+        try:
+            for index in range(len(document)):
+                page = document[index]
+                text_page = page.get_textpage()
+                try:
+                    yield text_page.get_text_range()
+                finally:
+                    text_page.close()
+                    page.close()
+        finally:
+            document.close()
+
+
+EXTRACTORS: dict[str, PDFExtractor] = {
+    extractor.name: extractor
+    for extractor in (PyMuPDFExtractor(), PdfiumExtractor(), PypdfExtractor(), PyPDF2Extractor())
+}
+
+
+def available_extractors(names: list[str]) -> tuple[str, ...]:
+    """
+    Filtra la cadena de extractores configurada dejando los instalados, en el mismo orden.
+
+    Args:
+        names: Nombres de los backends en orden de preferencia
+
+    Returns:
+        Los nombres de los backends instalados
+    """
+    return tuple(name for name in names if EXTRACTORS[name].available())
+
+
+def preload_extractors(names: tuple[str, ...]) -> None:
+    """
+    Importa los motores de la cadena por adelantado. Es el initializer del pool
+    de procesos: así la importación se hace al arrancar cada proceso y no en su
+    primera extracción.
+    """
+    for name in names:
+        EXTRACTORS[name].preload()
@@ -2,10 +2,200 @@
 Servicio para procesar archivos PDF.
 Sigue el principio de Single Responsibility: solo maneja la extracción de texto de PDFs.
 """
+import asyncio
+import contextlib
 import io
-from typing import Optional
-from PyPDF2 import PdfReader
+import json
+import mmap
+from typing import NamedTuple, Optional, Union
 from app.core.exceptions import PDFServiceError
+from app.core.metrics import (
+    PDF_CHARS, PDF_COMPACTION_SAVED, PDF_EXTRACTIONS, PDF_EXTRACTOR_FALLBACKS, PDF_EXTRACTOR_USED, PDF_PAGES,
+    STAGE_LATENCY
+)
+from app.core.process_pool import ProcessPool, WorkerCrashedError, WorkerTimeoutError
+from app.core.tracing import Trace, active, annotate, attach, current_settings, span, traced
+from app.services.cache_service import ResponseCache, make_cache_key
+from app.services.pdf_extractors import EXTRACTORS, PDFExtractor, PDFStream
+from app.services.text_compaction import COMPACTION_VERSION, compact_pages
+
+# Firma de los archivos PDF; la especificación admite que aparezca dentro del primer KiB
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+# Con compactación se leen como mucho este múltiplo de max_text_length de texto sin compactar
+COMPACTION_READ_FACTOR = 4
+# Cadena de extractores de parse_pdf si no se indica otra
+DEFAULT_EXTRACTORS = ("pypdf2",)
+
+
+class PDFExtraction(NamedTuple):
+    """
+    Resultado de la extracción: texto, páginas recorridas, caracteres eliminados
+    al compactar, backend que extrajo el texto y backends que fallaron antes.
+    """
+    texto: str
+    paginas_totales: int
+    paginas_procesadas: int
+    caracteres_ahorrados: int = 0
+    extractor: str = ""
+    extractores_fallidos: tuple[str, ...] = ()
+    
+    @property
+    def paginas_omitidas(self) -> int:
+        """Páginas que no se parsearon porque ya se alcanzó el presupuesto de caracteres."""
+        return self.paginas_totales - self.paginas_procesadas
+
+
+def parse_pdf(
+    source: Union[str, bytes],
+    max_text_length: int,
+    compact: bool = False,
+    extractors: tuple[str, ...] = DEFAULT_EXTRACTORS
+) -> PDFExtraction:
+    """
+    Parsea el PDF página a página y se detiene en cuanto se alcanza
+    max_text_length, sin extraer el resto del documento.
+    Prueba los backends de extractors en orden: si uno lanza una excepción con
+    este documento, se vuelve a empezar con el siguiente.
+    Si source es una ruta, el archivo se mapea en memoria (mmap) en lugar de
+    leerse entero, y solo se cargan las partes que el motor necesita.
+    Es una función de módulo para poder ejecutarse en el pool de procesos.
+    
+    Args:
+        source: Ruta del archivo PDF o su contenido en bytes
+        max_text_length: Longitud máxima del texto extraído
+        compact: Si se compacta el texto (cabeceras, pies, números de página, duplicados)
+        extractors: Nombres de los backends de extracción, en orden de preferencia
+        
+    Returns:
+        El texto extraído (limitado a max_text_length) y las páginas recorridas
+        
+    Raises:
+        PDFServiceError: Si el PDF no tiene texto o fallan todos los backends
+    """
+    if isinstance(source, bytes):
+        return _extract_with_fallback(io.BytesIO(source), max_text_length, compact, extractors)
+    try:
+        with open(source, "rb") as pdf_file:
+            with mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _extract_with_fallback(mapped, max_text_length, compact, extractors)
+    except (OSError, ValueError) as e:
+        # mmap no admite archivos vacíos
+        raise PDFServiceError(f"Error al procesar el PDF: {str(e)}")
+
+
+def parse_pdf_profiled(
+    source: Union[str, bytes],
+    max_text_length: int,
+    compact: bool,
+    extractors: tuple[str, ...],
+    cpu_interval: float,
+    memory: bool
+) -> tuple[PDFExtraction, dict]:
+    """
+    parse_pdf con su propia traza, para perfilar la extracción en el pool de
+    procesos: devuelve también la traza exportada, que el proceso principal
+    cuelga de la traza de la petición (tracing.attach).
+
+    Args:
+        source, max_text_length, compact, extractors: Los de parse_pdf
+        cpu_interval: Segundos entre muestras de pila; 0 para no muestrear
+        memory: Si se mide el pico de memoria con tracemalloc
+
+    Returns:
+        Tupla (resultado de parse_pdf, Trace.export_raw() de la extracción)
+    """
+    with Trace("pdf_worker", cpu_interval=cpu_interval, memory=memory) as trace:
+        extraccion = parse_pdf(source, max_text_length, compact, extractors)
+    return extraccion, trace.export_raw()
+
+
+def _extract_with_fallback(
+    stream: PDFStream,
+    max_text_length: int,
+    compact: bool,
+    extractors: tuple[str, ...]
+) -> PDFExtraction:
+    """Ejecuta _extract con cada backend hasta que uno termine sin excepción."""
+    fallidos = []
+    error = None
+    for name in extractors:
+        stream.seek(0)
+        try:
+            with span("extractor", name=name):
+                extraccion = _extract(EXTRACTORS[name], stream, max_text_length, compact)
+        except PDFServiceError:
+            # El documento se leyó pero no tiene texto: otro backend no lo arreglará
+            raise
+        except Exception as e:
+            fallidos.append(name)
+            error = e
+            continue
+        return extraccion._replace(extractores_fallidos=tuple(fallidos))
+    raise PDFServiceError(f"Error al procesar el PDF: {str(error)}")
+
+
+def _extract(extractor: PDFExtractor, stream: PDFStream, max_text_length: int, compact: bool) -> PDFExtraction:
+    """
+    Extrae el texto página a página hasta completar max_text_length.
+    Con compactación, el texto compactado ocupa menos que el extraído: si tras
+    compactar no llega a max_text_length, se siguen leyendo páginas para cubrir
+    la diferencia, hasta COMPACTION_READ_FACTOR veces max_text_length sin compactar.
+    """
+    with span("open"):
+        paginas_totales, paginas = extractor.open(stream)
+    annotate(paginas_totales=paginas_totales)
+    partes = []
+    longitud = 0
+    paginas_procesadas = 0
+    objetivo = max_text_length
+    limite_lectura = max_text_length * (COMPACTION_READ_FACTOR if compact else 1)
+    texto_pdf = None
+    ahorrados = 0
+    
+    # closing: al cortar por presupuesto, el backend libera el documento en ese momento
+    with contextlib.closing(paginas):
+        for texto_pagina in traced("page", paginas):
+            paginas_procesadas += 1
+            # Las páginas en blanco del inicio no consumen presupuesto
+            if not partes and not texto_pagina.strip():
+                continue
+            partes.append(texto_pagina)
+            longitud += len(texto_pagina) + 1
+            if longitud < objetivo:
+                continue
+            if not compact or longitud >= limite_lectura:
+                break
+            with span("compaction", pages=len(partes)):
+                texto_pdf, stats = compact_pages(partes)
+            if len(texto_pdf) >= max_text_length:
+                break
+            # Se pide al menos una cuarta parte más para no recompactar tras cada página
+            objetivo = min(limite_lectura, longitud + max(max_text_length - len(texto_pdf), max_text_length // 4))
+            texto_pdf = None
+    
+    if compact and partes:
+        if texto_pdf is None:
+            with span("compaction", pages=len(partes)):
+                texto_pdf, stats = compact_pages(partes)
+        ahorrados = stats.caracteres_ahorrados
+    else:
+        with span("join", pages=len(partes)):
+            texto_pdf = "\n".join(partes).strip()
+    
+    if not texto_pdf:
+        raise PDFServiceError(
+            "No se pudo extraer texto del PDF. "
+            "Asegúrate de que el PDF contenga texto."
+        )
+    
+    return PDFExtraction(
+        texto=texto_pdf[:max_text_length],
+        paginas_totales=paginas_totales,
+        paginas_procesadas=paginas_procesadas,
+        caracteres_ahorrados=ahorrados,
+        extractor=extractor.name
+    )
 
 
 class PDFService:
@@ -14,54 +204,187 @@ class PDFService:
     Abstrae la lógica de procesamiento de PDFs.
     """
     
-    def __init__(self, max_text_length: int):
+    def __init__(
+        self,
+        max_text_length: int,
+        cache: Optional[ResponseCache] = None,
+        pool: Optional[ProcessPool] = None,
+        timeout: Optional[float] = None,
+        max_upload_bytes: Optional[int] = None,
+        upload_dir: Optional[str] = None,
+        compact: bool = False,
+        extractors: tuple[str, ...] = DEFAULT_EXTRACTORS
+    ):
         """
         Inicializa el servicio de PDF.
         
         Args:
             max_text_length: Longitud máxima del texto extraído (obtenida de settings)
+            cache: Caché de texto extraído por digest del PDF; None para desactivarla
+            pool: Pool de procesos para el parseo; None para parsear en un hilo
+            timeout: Segundos máximos de parseo por documento (solo con pool)
+            max_upload_bytes: Tamaño máximo de un PDF subido; None para no limitar
+            upload_dir: Directorio de los archivos temporales de las subidas
+            compact: Si se compacta el texto extraído antes de devolverlo
+            extractors: Backends de extracción instalados, en orden de preferencia
         """
         self.max_text_length = max_text_length
+        self.cache = cache
+        self.pool = pool
+        self.timeout = timeout
+        self.max_upload_bytes = max_upload_bytes
+        self.upload_dir = upload_dir
+        self.compact = compact
+        self.extractors = extractors
+    
+    def text_cache_key(self, digest: str, max_text_length: Optional[int] = None) -> str:
+        """
+        Clave de caché del texto extraído: digest del PDF, longitud máxima,
+        versión de la compactación (o su ausencia) y cadena de extractores.
+        
+        Args:
+            digest: SHA-256 del contenido del PDF
+            max_text_length: Longitud máxima; None para usar la del servicio
+            
+        Returns:
+            La clave de caché
+        """
+        compaction = f"compactado-v{COMPACTION_VERSION}" if self.compact else "sin-compactar"
+        return make_cache_key(
+            "pdf-extraccion", digest, str(max_text_length or self.max_text_length), compaction,
+            ",".join(self.extractors)
+        )
     
-    def extract_text(self, pdf_content: bytes) -> str:
+    async def extract_text(
+        self,
+        source: Union[str, bytes],
+        digest: Optional[str] = None,
+        max_text_length: Optional[int] = None
+    ) -> PDFExtraction:
         """
-        Extrae texto de un archivo PDF.
+        Extrae texto de un archivo PDF fuera del event loop.
+        Si se indica el digest y hay caché, reutiliza el texto de una subida anterior
+        del mismo archivo sin volver a parsearlo.
         
         Args:
-            pdf_content: Contenido del PDF en bytes
+            source: Ruta del archivo PDF o su contenido en bytes
+            digest: SHA-256 del contenido del PDF (opcional)
+            max_text_length: Longitud máxima para esta extracción; None para usar la del servicio
             
         Returns:
-            El texto extraído del PDF
+            El texto extraído del PDF y las páginas recorridas
             
         Raises:
             PDFServiceError: Si hay un error al procesar el PDF
         """
-        try:
-            pdf_reader = PdfReader(io.BytesIO(pdf_content))
-            texto_pdf = ""
+        max_text_length = max_text_length or self.max_text_length
+        use_cache = self.cache is not None and digest is not None
+        with STAGE_LATENCY.labels("extraction").time(), span("extraction", max_text_length=max_text_length):
+            if use_cache:
+                cached = await self.cache.aget(self.text_cache_key(digest, max_text_length))
+                if cached is not None:
+                    PDF_EXTRACTIONS.labels("cached").inc()
+                    annotate(cached=True)
+                    return PDFExtraction(*json.loads(cached))
             
-            # Extraer texto de todas las páginas
-            for page in pdf_reader.pages:
-                texto_pdf += page.extract_text() + "\n"
+            try:
+                extraccion = await self._parse(source, max_text_length)
+            except BaseException:
+                PDF_EXTRACTIONS.labels("error").inc()
+                raise
+            annotate(
+                cached=False,
+                extractor=extraccion.extractor,
+                paginas_procesadas=extraccion.paginas_procesadas,
+                caracteres=len(extraccion.texto)
+            )
+        PDF_EXTRACTIONS.labels("parsed").inc()
+        PDF_EXTRACTOR_USED.labels(extraccion.extractor).inc()
+        for fallido in extraccion.extractores_fallidos:
+            PDF_EXTRACTOR_FALLBACKS.labels(fallido).inc()
+        PDF_PAGES.labels("totales").observe(extraccion.paginas_totales)
+        PDF_PAGES.labels("procesadas").observe(extraccion.paginas_procesadas)
+        PDF_CHARS.observe(len(extraccion.texto))
+        if self.compact:
+            PDF_COMPACTION_SAVED.observe(extraccion.caracteres_ahorrados)
+        if use_cache:
+            await self.cache.aset(self.text_cache_key(digest, max_text_length), json.dumps(extraccion, ensure_ascii=False))
+        return extraccion
+    
+    def cached_extraction(self, digest: str) -> Optional[PDFExtraction]:
+        """
+        Devuelve el texto en caché de un PDF ya subido sin renovar su validez.
+        No cuenta como acierto ni fallo de la caché.
+
+        Args:
+            digest: SHA-256 del contenido del PDF
+
+        Returns:
+            El texto extraído, o None si no hay caché o ya expiró
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.peek(self.text_cache_key(digest))
+        return PDFExtraction(*json.loads(cached)) if cached is not None else None
+    
+    def renew_cached_extraction(self, digest: str) -> Optional[PDFExtraction]:
+        """
+        Devuelve el texto en caché de un PDF ya subido y renueva su validez,
+        para regenerar sus preguntas sin el archivo (precalentamiento).
+        No cuenta como acierto ni fallo de la caché.
+
+        Args:
+            digest: SHA-256 del contenido del PDF
+
+        Returns:
+            El texto extraído, o None si no hay caché o ya expiró
+        """
+        if self.cache is None:
+            return None
+        key = self.text_cache_key(digest)
+        cached = self.cache.peek(key)
+        if cached is None:
+            return None
+        self.cache.set(key, cached)
+        return PDFExtraction(*json.loads(cached))
+
+    async def _parse(self, source: Union[str, bytes], max_text_length: int) -> PDFExtraction:
+        """
+        Ejecuta parse_pdf en el pool de procesos, o en un hilo si no hay pool.
+        Con una ruta, al proceso solo viaja la ruta y no el contenido del archivo.
+        Si la petición se está perfilando, en el pool se usa parse_pdf_profiled
+        (el hilo ya hereda la traza del contexto).
+        
+        Args:
+            source: Ruta del archivo PDF o su contenido en bytes
+            max_text_length: Longitud máxima del texto extraído
             
-            texto_pdf = texto_pdf.strip()
+        Returns:
+            El texto extraído del PDF y las páginas recorridas
             
-            if not texto_pdf:
-                raise PDFServiceError(
-                    "No se pudo extraer texto del PDF. "
-                    "Asegúrate de que el PDF contenga texto."
+        Raises:
+            PDFServiceError: Si hay un error al procesar el PDF o se supera el tiempo límite
+        """
+        if self.pool is None:
+            return await asyncio.to_thread(parse_pdf, source, max_text_length, self.compact, self.extractors)
+        try:
+            if active():
+                cpu_interval, memory = current_settings()
+                extraccion, trace = await self.pool.run(
+                    parse_pdf_profiled, source, max_text_length, self.compact, self.extractors,
+                    cpu_interval, memory, timeout=self.timeout
                 )
-            
-            # Limitar la longitud del texto si es necesario
-            if len(texto_pdf) > self.max_text_length:
-                texto_pdf = texto_pdf[:self.max_text_length]
-            
-            return texto_pdf
-        
-        except PDFServiceError:
-            raise
-        except Exception as e:
-            raise PDFServiceError(f"Error al procesar el PDF: {str(e)}")
+                attach(trace, "pdf_worker")
+                return extraccion
+            return await self.pool.run(
+                parse_pdf, source, max_text_length, self.compact, self.extractors, timeout=self.timeout
+            )
+        except WorkerTimeoutError:
+            raise PDFServiceError(
+                f"El PDF tardó más de {self.timeout} segundos en procesarse y fue descartado."
+            )
+        except WorkerCrashedError:
+            raise PDFServiceError("Error al procesar el PDF: el proceso de extracción falló.")
     
     def validate_pdf_content_type(self, content_type: Optional[str]) -> bool:
         """
@@ -74,4 +397,17 @@ class PDFService:
             True si es un PDF, False en caso contrario
         """
         return content_type == "application/pdf"
+    
+    def has_pdf_signature(self, head: bytes) -> bool:
+        """
+        Comprueba la firma %PDF- en los primeros bytes del archivo, sin
+        depender del content-type declarado por el cliente.
+        
+        Args:
+            head: Primeros bytes del archivo (al menos PDF_MAGIC_WINDOW si los hay)
+            
+        Returns:
+            True si la firma aparece en el primer KiB, False en caso contrario
+        """
+        return PDF_MAGIC in head[:PDF_MAGIC_WINDOW]
 
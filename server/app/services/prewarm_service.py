@@ -0,0 +1,225 @@
+"""
+Precalentamiento de las cachés según la demanda.
+Tarea en segundo plano que, al arrancar y después cada cierto intervalo,
+regenera la teoría de los temas y las preguntas de los PDFs más pedidos que no
+están en caché (tras un despliegue, con la caché en memoria) o que van a
+expirar pronto. Solo usa Gemini cuando hay poca carga y dentro de un
+presupuesto de llamadas por hora, para no competir con las peticiones de los
+usuarios ni con su cuota.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+from app.core.exceptions import GeminiUnavailableError
+from app.core.metrics import PREWARM_ENTRIES
+from app.core.resilience import CERRADO
+from app.services.demand_service import PDF, TEORIA, DemandEntry, DemandTracker
+from app.services.gemini_service import PREGUNTAS, GeminiService
+from app.services.pdf_service import PDFService
+
+# Ventana del presupuesto de llamadas a Gemini
+BUDGET_WINDOW_SECONDS = 3600
+
+
+class CachePrewarmer:
+    """
+    Regenera lo más pedido antes de que expire de la caché.
+    Procesa las entradas de una en una, de más a menos pedida, y deja el
+    ciclo para el siguiente intervalo en cuanto sube la carga o se agota el
+    presupuesto. Su progreso se expone en /health (stats) y en métricas.
+    """
+
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        demand: DemandTracker,
+        pdf_service: Optional[PDFService],
+        top_n: int,
+        interval_seconds: float,
+        startup_delay_seconds: float,
+        refresh_before_seconds: float,
+        max_calls_per_hour: int,
+        max_load: float
+    ):
+        """
+        Args:
+            gemini_service: Servicio de Gemini con las cachés a precalentar
+            demand: Registro de la demanda de temas y PDFs
+            pdf_service: Servicio de PDF con la caché del texto extraído; None para no precalentar PDFs
+            top_n: Temas y PDFs más pedidos (de cada tipo) que se mantienen en caché
+            interval_seconds: Segundos entre ciclos
+            startup_delay_seconds: Segundos tras el arranque antes del primer ciclo
+            refresh_before_seconds: Se regenera lo que expira dentro de este margen
+            max_calls_per_hour: Llamadas a Gemini por hora como máximo
+            max_load: Fracción de GEMINI_MAX_IN_FLIGHT ocupada por encima de la cual se pausa
+        """
+        self.gemini_service = gemini_service
+        self.demand = demand
+        self.pdf_service = pdf_service
+        self.top_n = top_n
+        self.interval_seconds = interval_seconds
+        self.startup_delay_seconds = startup_delay_seconds
+        self.refresh_before_seconds = refresh_before_seconds
+        self.max_calls_per_hour = max_calls_per_hour
+        self.max_load = max_load
+        self._calls: deque[float] = deque()
+        self.running = False
+        self.cycles = 0
+        self.refreshed = 0
+        self.errors = 0
+        self.last_cycle: Optional[dict] = None
+        self.current: Optional[dict] = None
+
+    def _budget_left(self) -> int:
+        """Llamadas a Gemini que quedan en la última hora."""
+        now = time.monotonic()
+        while self._calls and now - self._calls[0] >= BUDGET_WINDOW_SECONDS:
+            self._calls.popleft()
+        return self.max_calls_per_hour - len(self._calls)
+
+    def _busy(self) -> bool:
+        """
+        True si hay peticiones esperando a Gemini, mucha carga, el circuito no
+        está cerrado o algún modelo del enrutado está degradado.
+        """
+        breaker = self.gemini_service.breaker
+        if breaker is not None and breaker.state != CERRADO:
+            return True
+        router = self.gemini_service.router
+        if router is not None and any(router.degraded(tier.model) for tier in router.tiers):
+            return True
+        limiter = self.gemini_service.limiter
+        if limiter is None:
+            return False
+        if limiter.waiting:
+            return True
+        return bool(limiter.max_in_flight) and limiter.in_flight > self.max_load * limiter.max_in_flight
+
+    def _cache_for(self, kind: str):
+        if kind == TEORIA:
+            return self.gemini_service.theory_cache
+        if self.pdf_service is None or self.pdf_service.cache is None:
+            return None
+        return self.gemini_service.questions_cache
+
+    def _cache_key(self, entry: DemandEntry) -> str:
+        # La clave incluye el modelo que correspondería por tamaño a la entrada
+        gemini_service = self.gemini_service
+        if entry.kind == TEORIA:
+            return gemini_service.theory_cache_key(
+                entry.label, gemini_service.planned_model(TEORIA, len(entry.label))
+            )
+        extraccion = self.pdf_service.cached_extraction(entry.key)
+        caracteres = len(extraccion.texto) if extraccion is not None else 0
+        return gemini_service.questions_cache_key(entry.key, gemini_service.planned_model(PREGUNTAS, caracteres))
+
+    async def _candidates(self) -> list[DemandEntry]:
+        """Lo más pedido de cada tipo con caché configurada, de más a menos pedido."""
+        await asyncio.to_thread(self.demand.flush)
+        entries = []
+        for kind in (TEORIA, PDF):
+            if self._cache_for(kind) is not None:
+                entries += await asyncio.to_thread(self.demand.top, kind, self.top_n)
+        return sorted(entries, key=lambda entry: entry.count, reverse=True)
+
+    def _needs_refresh(self, entry: DemandEntry) -> bool:
+        expires_at = self._cache_for(entry.kind).expires_at(self._cache_key(entry))
+        return expires_at is None or expires_at - time.time() < self.refresh_before_seconds
+
+    async def _refresh(self, entry: DemandEntry) -> str:
+        """
+        Regenera una entrada.
+
+        Returns:
+            refreshed, o missing_text si es un PDF cuyo texto ya no está en caché
+        """
+        if entry.kind == TEORIA:
+            self._calls.append(time.monotonic())
+            await self.gemini_service.generate_theory(entry.label, refresh=True)
+            return "refreshed"
+        extraccion = await asyncio.to_thread(self.pdf_service.renew_cached_extraction, entry.key)
+        if extraccion is None:
+            return "missing_text"
+        self._calls.append(time.monotonic())
+        await self.gemini_service.generate_questions_from_text(extraccion.texto, digest=entry.key, refresh=True)
+        return "refreshed"
+
+    async def run_once(self) -> dict:
+        """
+        Ejecuta un ciclo de precalentamiento.
+
+        Returns:
+            Resumen del ciclo (también disponible en stats()["last_cycle"])
+        """
+        started = time.time()
+        candidates = await self._candidates()
+        self.current = progress = {
+            "started_at": started,
+            "candidates": len(candidates),
+            "checked": 0,
+            "refreshed": 0,
+            "fresh": 0,
+            "missing_text": 0,
+            "error": 0,
+            "stopped": None
+        }
+        for entry in candidates:
+            if not await asyncio.to_thread(self._needs_refresh, entry):
+                outcome = "fresh"
+            elif self._budget_left() <= 0:
+                progress["stopped"] = "budget"
+                break
+            elif self._busy():
+                progress["stopped"] = "busy"
+                break
+            else:
+                try:
+                    outcome = await self._refresh(entry)
+                except GeminiUnavailableError:
+                    # Cuota agotada o Gemini caído: no insistir hasta el siguiente ciclo
+                    outcome = "error"
+                    progress["stopped"] = "unavailable"
+                except Exception:
+                    outcome = "error"
+            progress[outcome] += 1
+            progress["checked"] += 1
+            PREWARM_ENTRIES.labels(entry.kind, outcome).inc()
+            if progress["stopped"]:
+                break
+
+        progress["seconds"] = round(time.time() - started, 3)
+        self.cycles += 1
+        self.refreshed += progress["refreshed"]
+        self.errors += progress["error"]
+        self.current = None
+        self.last_cycle = progress
+        return progress
+
+    async def run(self) -> None:
+        """Bucle de la tarea en segundo plano: un ciclo al arrancar y luego cada interval_seconds."""
+        self.running = True
+        try:
+            await asyncio.sleep(self.startup_delay_seconds)
+            while True:
+                try:
+                    await self.run_once()
+                except Exception:
+                    # Un fallo inesperado (p. ej. del almacenamiento) no debe detener la tarea
+                    self.errors += 1
+                    self.current = None
+                await asyncio.sleep(self.interval_seconds)
+        finally:
+            self.running = False
+
+    def stats(self) -> dict:
+        """Estado del precalentamiento: ciclo en curso, último ciclo y totales."""
+        return {
+            "running": self.running,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+            "budget_left": self._budget_left(),
+            "current": dict(self.current) if self.current else None,
+            "last_cycle": self.last_cycle
+        }
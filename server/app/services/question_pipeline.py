@@ -0,0 +1,197 @@
+"""
+Generación de preguntas para documentos largos en dos fases (map-reduce).
+Divide el texto en secciones con un presupuesto de tokens, genera preguntas
+por sección de forma concurrente y las fusiona en una lista final sin duplicados.
+"""
+import asyncio
+import functools
+import hashlib
+import re
+from typing import AsyncIterator, NamedTuple, Optional
+from app.core.tracing import span
+from app.services.cache_service import normalize_tema
+from app.services.gemini_service import CHARS_PER_TOKEN, FUSION, CacheKey, GeminiService, GenerationResult
+
+_NUMERACION = re.compile(r"^\s*(?:\d+\s*[.)\-:]|[-*•])\s*")
+
+
+class PipelineResult(NamedTuple):
+    """Preguntas generadas, si provinieron de la caché y número de secciones."""
+    text: str
+    cached: bool
+    secciones: int
+
+
+def split_sections(texto: str, max_tokens: int) -> list[str]:
+    """
+    Divide el texto en secciones de como máximo max_tokens (estimados),
+    cortando por líneas. Las líneas más largas que una sección se parten.
+
+    Args:
+        texto: Texto completo del documento
+        max_tokens: Tokens máximos por sección
+
+    Returns:
+        Lista de secciones no vacías, en orden
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    secciones = []
+    actual = []
+    longitud = 0
+
+    def cerrar() -> None:
+        nonlocal actual, longitud
+        seccion = "\n".join(actual).strip()
+        if seccion:
+            secciones.append(seccion)
+        actual, longitud = [], 0
+
+    for linea in texto.splitlines():
+        while len(linea) > max_chars:
+            cerrar()
+            secciones.append(linea[:max_chars])
+            linea = linea[max_chars:]
+        if actual and longitud + len(linea) + 1 > max_chars:
+            cerrar()
+        actual.append(linea)
+        longitud += len(linea) + 1
+    cerrar()
+    return secciones
+
+
+def dedupe_questions(respuestas: list[str]) -> list[str]:
+    """
+    Extrae las preguntas de las respuestas de cada sección y elimina las
+    repetidas (misma pregunta salvo numeración, mayúsculas, tildes o espacios).
+    Si alguna respuesta no contiene preguntas reconocibles se conserva entera.
+
+    Args:
+        respuestas: Texto generado para cada sección
+
+    Returns:
+        Preguntas únicas en orden de aparición
+    """
+    vistas = set()
+    preguntas = []
+    for respuesta in respuestas:
+        lineas = [_NUMERACION.sub("", linea).strip() for linea in respuesta.splitlines()]
+        encontradas = [linea for linea in lineas if "?" in linea]
+        for pregunta in encontradas or [respuesta.strip()]:
+            clave = normalize_tema(pregunta)
+            if clave and clave not in vistas:
+                vistas.add(clave)
+                preguntas.append(pregunta)
+    return preguntas
+
+
+class QuestionPipeline:
+    """
+    Genera preguntas que cubren un documento completo en lugar de solo su inicio.
+    Cada sección se procesa con GeminiService.generate_questions_from_text, de modo
+    que el tiempo total depende de la sección más lenta y no de la suma de todas.
+    """
+
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        max_text_length: int,
+        max_section_tokens: int,
+        max_concurrency: int
+    ):
+        """
+        Inicializa el pipeline.
+
+        Args:
+            gemini_service: Servicio de Gemini
+            max_text_length: Longitud máxima del texto a extraer del documento
+            max_section_tokens: Tokens máximos (estimados) por sección
+            max_concurrency: Secciones procesadas en paralelo como máximo
+        """
+        self.gemini_service = gemini_service
+        self.max_text_length = max_text_length
+        self.max_section_tokens = max_section_tokens
+        self.max_concurrency = max_concurrency
+
+    async def _map(self, secciones: list[str]) -> list[GenerationResult]:
+        """Genera las preguntas de cada sección con un límite de concurrencia."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def generar(seccion: str) -> GenerationResult:
+            async with semaphore:
+                # Clave por contenido: secciones idénticas se generan una sola vez
+                digest = hashlib.sha256(seccion.encode("utf-8")).hexdigest()
+                with span("section", chars=len(seccion)):
+                    return await self.gemini_service.generate_questions_from_text(seccion, digest=digest)
+
+        return await asyncio.gather(*(generar(seccion) for seccion in secciones))
+
+    def _cache_key(self, digest: Optional[str]) -> Optional[CacheKey]:
+        """Clave de caché del resultado fusionado según el modelo, o None sin digest."""
+        if digest is None:
+            return None
+        return functools.partial(self.gemini_service.merged_questions_cache_key, digest, self.max_section_tokens)
+
+    async def _cached(self, texto: str, cache_key: Optional[CacheKey]) -> Optional[str]:
+        # Se busca con el modelo que haría la fusión según el tamaño del documento
+        cache = self.gemini_service.questions_cache
+        if cache is None or cache_key is None:
+            return None
+        return await cache.aget(cache_key(self.gemini_service.planned_model(FUSION, len(texto))))
+
+    async def generate(self, texto: str, digest: Optional[str] = None) -> PipelineResult:
+        """
+        Genera preguntas sobre todo el texto: una pasada por sección y una final de fusión.
+
+        Args:
+            texto: Texto completo del documento
+            digest: SHA-256 del PDF de origen (opcional, para la caché)
+
+        Returns:
+            Las preguntas fusionadas, si provinieron de la caché y el número de secciones
+        """
+        secciones = split_sections(texto, self.max_section_tokens)
+        cache_key = self._cache_key(digest)
+        cached = await self._cached(texto, cache_key)
+        if cached is not None:
+            return PipelineResult(cached, True, len(secciones))
+
+        parciales = await self._map(secciones)
+        if len(parciales) == 1:
+            return PipelineResult(parciales[0].text, parciales[0].cached, 1)
+
+        with span("reduce", secciones=len(secciones)):
+            fusion = await self.gemini_service.merge_questions(
+                dedupe_questions([parcial.text for parcial in parciales]),
+                self.gemini_service.route(FUSION, len(texto)),
+                cache_key
+            )
+        return PipelineResult(fusion.text, fusion.cached, len(secciones))
+
+    async def generate_stream(self, texto: str, digest: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Variante por fragmentos de generate: las secciones se procesan igual y
+        solo la pasada final de fusión se envía a medida que se genera.
+
+        Args:
+            texto: Texto completo del documento
+            digest: SHA-256 del PDF de origen (opcional, para la caché)
+
+        Yields:
+            Fragmentos de las preguntas fusionadas
+        """
+        secciones = split_sections(texto, self.max_section_tokens)
+        cache_key = self._cache_key(digest)
+        cached = await self._cached(texto, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parciales = await self._map(secciones)
+        if len(parciales) == 1:
+            yield parciales[0].text
+            return
+
+        preguntas = dedupe_questions([parcial.text for parcial in parciales])
+        route = self.gemini_service.route(FUSION, len(texto))
+        async for chunk in self.gemini_service.merge_questions_stream(preguntas, route, cache_key):
+            yield chunk
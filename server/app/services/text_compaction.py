@@ -0,0 +1,167 @@
+"""
+Compactación del texto extraído de PDFs antes de enviarlo a Gemini.
+Elimina lo que cuesta tokens sin aportar contenido: cabeceras y pies de página
+repetidos, números de página, cortes de palabra con guion, espacios repetidos
+y párrafos casi duplicados. Son funciones puras para poder ejecutarse en el
+pool de procesos junto con el parseo.
+"""
+import re
+from collections import Counter
+from typing import NamedTuple
+from app.services.cache_service import normalize_tema
+
+# Versión de las reglas: forma parte de la clave de caché del texto extraído
+COMPACTION_VERSION = "2"
+# Líneas no vacías de cada extremo de la página donde se buscan cabeceras, pies y números de página
+EDGE_LINES = 3
+# Fracción mínima de páginas en que debe repetirse una línea de los extremos para descartarla
+REPEATED_LINE_RATIO = 0.5
+# Similitud (Jaccard de trigramas de palabras) a partir de la cual dos párrafos son duplicados
+DUPLICATE_THRESHOLD = 0.9
+# Los párrafos más cortos (títulos, fórmulas, listas) no se deduplican
+MIN_PARAGRAPH_CHARS = 80
+
+# Números romanos bien formados; sin prefijo solo hasta xxxix (i, v, x), porque
+# con l, c, d y m forman palabras ("mix", "CLI", "DC") que no deben borrarse
+_ROMAN = r"m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})"
+_SHORT_ROMAN = r"x{0,3}(?:ix|iv|v?i{0,3})"
+_PAGE_NUMBER = re.compile(
+    r"^[\s\-–—|·]*(?:"
+    r"(?:p[áa]g(?:ina)?|page|p)(?:\.\s*|\s+|(?=\d))(?:\d{1,4}|(?=[ivxlcdm])" + _ROMAN + r")"
+    r"|\d{1,4}|(?=[ivx])" + _SHORT_ROMAN +
+    r")(?:\s*(?:de|of|/)\s*\d{1,4})?[\s\-–—|·]*$",
+    re.IGNORECASE
+)
+# Palabra cortada al final de línea y continuada en minúscula: "conoci-\nmiento"
+_HYPHEN_BREAK = re.compile(r"([^\W\d_])-\n[ \t]*([a-záéíóúüñ])")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+_BLANK_LINES = re.compile(r"\n\s*\n")
+_DIGITS = re.compile(r"\d+")
+
+
+class CompactionStats(NamedTuple):
+    """Cambios aplicados por compact_pages."""
+    caracteres_originales: int
+    caracteres_compactados: int
+    lineas_repetidas: int
+    numeros_pagina: int
+    guiones_unidos: int
+    parrafos_duplicados: int
+
+    @property
+    def caracteres_ahorrados(self) -> int:
+        return self.caracteres_originales - self.caracteres_compactados
+
+
+def _line_key(linea: str) -> str:
+    """Clave de una línea para detectar repeticiones entre páginas (ignora números)."""
+    return _DIGITS.sub("#", normalize_tema(linea))
+
+
+def _edge_indices(lineas: list[str]) -> set[int]:
+    """
+    Índices de las primeras y últimas líneas no vacías de una página: hasta
+    EDGE_LINES por extremo y nunca más de un cuarto de la página, para que en
+    las páginas cortas el cuerpo no se confunda con la cabecera o el pie.
+    """
+    contenido = [i for i, linea in enumerate(lineas) if linea]
+    bordes = min(EDGE_LINES, len(contenido) // 4)
+    if not bordes:
+        return set()
+    return set(contenido[:bordes] + contenido[-bordes:])
+
+
+def _repeated_edge_lines(paginas: list[list[str]]) -> set[str]:
+    """Claves de las líneas de los extremos que se repiten en suficientes páginas."""
+    if len(paginas) < 2:
+        return set()
+    apariciones = Counter()
+    for lineas in paginas:
+        apariciones.update({_line_key(lineas[i]) for i in _edge_indices(lineas)})
+    minimo = max(2, REPEATED_LINE_RATIO * len(paginas))
+    return {clave for clave, veces in apariciones.items() if veces >= minimo and clave}
+
+
+def _shingles(texto: str) -> set[tuple[str, ...]]:
+    palabras = texto.split()
+    return {tuple(palabras[i:i + 3]) for i in range(max(1, len(palabras) - 2))}
+
+
+def _drop_duplicate_paragraphs(texto: str) -> tuple[str, int]:
+    """Elimina los párrafos iguales o casi iguales a uno anterior."""
+    vistos: set[str] = set()
+    firmas: list[tuple[int, set]] = []
+    parrafos = []
+    duplicados = 0
+    for parrafo in _BLANK_LINES.split(texto):
+        clave = normalize_tema(parrafo)
+        if len(clave) >= MIN_PARAGRAPH_CHARS:
+            if clave in vistos:
+                duplicados += 1
+                continue
+            tejas = _shingles(clave)
+            # Solo se comparan párrafos de longitud parecida (la similitud exige tamaños similares)
+            if any(
+                abs(longitud - len(clave)) <= len(clave) * (1 - DUPLICATE_THRESHOLD)
+                and len(tejas & otras) >= DUPLICATE_THRESHOLD * len(tejas | otras)
+                for longitud, otras in firmas
+            ):
+                duplicados += 1
+                continue
+            vistos.add(clave)
+            firmas.append((len(clave), tejas))
+        parrafos.append(parrafo)
+    return "\n\n".join(parrafos), duplicados
+
+
+def compact_pages(paginas: list[str]) -> tuple[str, CompactionStats]:
+    """
+    Une el texto de las páginas quitando el contenido que no aporta información.
+
+    - Cabeceras y pies: líneas de los extremos de la página que se repiten (salvo
+      números) en al menos la mitad de las páginas.
+    - Números de página: líneas de los extremos como "12", "- 12 -", "Página 3 de 10" o "iv".
+    - Cortes de palabra: "conoci-\\nmiento" pasa a "conocimiento".
+    - Espacios: se colapsan los espacios repetidos y las líneas en blanco consecutivas.
+    - Párrafos casi duplicados (por ejemplo, avisos legales en cada capítulo).
+
+    Args:
+        paginas: Texto de cada página, en orden
+
+    Returns:
+        Tupla (texto compactado, estadísticas de la compactación)
+    """
+    originales = sum(len(pagina) for pagina in paginas) + max(0, len(paginas) - 1)
+    lineas_por_pagina = [
+        [_SPACES.sub(" ", linea).strip() for linea in pagina.splitlines()] for pagina in paginas
+    ]
+    repetidas = _repeated_edge_lines(lineas_por_pagina)
+
+    lineas_repetidas = 0
+    numeros_pagina = 0
+    conservadas = []
+    for lineas in lineas_por_pagina:
+        extremos = _edge_indices(lineas)
+        for i, linea in enumerate(lineas):
+            if i in extremos:
+                if _line_key(linea) in repetidas:
+                    lineas_repetidas += 1
+                    continue
+                if _PAGE_NUMBER.match(linea):
+                    numeros_pagina += 1
+                    continue
+            conservadas.append(linea)
+
+    texto = "\n".join(conservadas)
+    texto, guiones_unidos = _HYPHEN_BREAK.subn(r"\1\2", texto)
+    texto, parrafos_duplicados = _drop_duplicate_paragraphs(texto)
+    texto = _BLANK_LINES.sub("\n\n", texto).strip()
+
+    return texto, CompactionStats(
+        caracteres_originales=originales,
+        caracteres_compactados=len(texto),
+        lineas_repetidas=lineas_repetidas,
+        numeros_pagina=numeros_pagina,
+        guiones_unidos=guiones_unidos,
+        parrafos_duplicados=parrafos_duplicados
+    )
@@ -0,0 +1,185 @@
+"""
+Índice de temas casi duplicados para reutilizar la teoría ya generada.
+"fotosíntesis", "La fotosíntesis" y "qué es la fotosíntesis" tienen claves de
+caché distintas; el índice encuentra el tema ya respondido más parecido para
+servir su teoría desde la caché sin llamar a Gemini.
+
+Dos temas solo pueden ser equivalentes si tienen exactamente el mismo conjunto
+de raíces de palabras significativas (sus primeros STEM_CHARS caracteres, sin
+tildes, mayúsculas ni palabras vacías). Las negaciones ("no") no son palabras
+vacías y los prefijos (in-, ir-, i-, semi-...) forman parte de la raíz, así
+que "química orgánica" e "inorgánica", "funciones lineales" y "no lineales" o
+"triángulos" y "triángulos rectángulos" nunca se confunden. Entre los temas
+con las mismas raíces, la similitud es el coseno entre los trigramas de
+caracteres de sus palabras, que tolera plurales y variantes de las palabras.
+Los trigramas de todos los temas se guardan en arrays contiguos (array de la
+biblioteca estándar) y los candidatos salen de un índice por conjunto de
+raíces, comparando como mucho MAX_CANDIDATES temas (los más recientes) por
+consulta, de modo que la latencia no crece con el tamaño del índice.
+"""
+import math
+import re
+from array import array
+from typing import NamedTuple, Optional
+from app.services.cache_service import normalize_tema
+
+# Palabras que no distinguen un tema de otro: artículos, preposiciones y fórmulas de pregunta.
+# No deben incluir negaciones ("no", "sin"), que cambian el tema por completo
+STOPWORDS = frozenset(
+    "a al como con cual cuales de del define definicion el en es explica explicacion explicado explicame "
+    "hablame introduccion la las lo los o para por que sobre son su sus tema un una uno unos unas y"
+    .split()
+)
+_NON_WORD = re.compile(r"[^\w]+")
+# Caracteres de la raíz de una palabra ("fotosintesis" -> "fotos", "inorganica" -> "inorg")
+STEM_CHARS = 5
+# Temas comparados como mucho en cada consulta
+MAX_CANDIDATES = 128
+
+
+class TopicMatch(NamedTuple):
+    """Tema indexado más parecido a la consulta."""
+    tema: str
+    similitud: float
+
+
+def topic_words(tema: str) -> list[str]:
+    """
+    Palabras significativas del tema: normalizado, sin puntuación ni palabras vacías.
+    Si todas son palabras vacías se conservan, para que el tema no quede vacío.
+
+    Args:
+        tema: El tema tal como lo envió el usuario
+
+    Returns:
+        Las palabras del tema
+    """
+    palabras = _NON_WORD.sub(" ", normalize_tema(tema)).split()
+    return [palabra for palabra in palabras if palabra not in STOPWORDS] or palabras
+
+
+def topic_signature(palabras: list[str]) -> str:
+    """Conjunto de raíces de las palabras, ordenado: los temas equivalentes comparten firma."""
+    return " ".join(sorted({palabra[:STEM_CHARS] for palabra in palabras}))
+
+
+def topic_ngrams(tema: str, n: int = 3) -> set[str]:
+    """Trigramas de caracteres de cada palabra, con un espacio de relleno a cada lado."""
+    ngrams = set()
+    for palabra in topic_words(tema):
+        relleno = f" {palabra} "
+        ngrams.update(relleno[i:i + n] for i in range(max(1, len(relleno) - n + 1)))
+    return ngrams
+
+
+class TopicIndex:
+    """
+    Índice en memoria de temas respondidos, con búsqueda del más parecido.
+    No es seguro entre hilos: se usa desde el event loop.
+    """
+
+    def __init__(self, threshold: float, max_entries: int):
+        """
+        Inicializa el índice.
+
+        Args:
+            threshold: Similitud mínima (coseno de trigramas, 0-1) para considerar dos temas equivalentes
+            max_entries: Temas como máximo; al llenarse se descarta la mitad más antigua
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vocab: dict[str, int] = {}
+        self._postings: dict[str, array] = {}
+        self._by_words: dict[str, int] = {}
+        self._temas: list[str] = []
+        # Trigramas de la entrada i: _grams[_offsets[i]:_offsets[i + 1]]
+        self._grams = array("I")
+        self._offsets = array("I", [0])
+
+    def __len__(self) -> int:
+        return len(self._temas)
+
+    def add(self, tema: str) -> None:
+        """
+        Indexa un tema respondido.
+        Si ya hay un tema con las mismas palabras significativas, no se duplica.
+
+        Args:
+            tema: El tema tal como lo envió el usuario
+        """
+        palabras = topic_words(tema)
+        clave = " ".join(palabras)
+        if not clave or clave in self._by_words:
+            return
+        if len(self._temas) >= self.max_entries:
+            self._drop_oldest(len(self._temas) // 2 or 1)
+
+        entry = len(self._temas)
+        self._postings.setdefault(topic_signature(palabras), array("I")).append(entry)
+        self._grams.extend(self._vocab.setdefault(gram, len(self._vocab)) for gram in topic_ngrams(tema))
+        self._offsets.append(len(self._grams))
+        self._by_words[clave] = entry
+        self._temas.append(tema)
+
+    def lookup(self, tema: str) -> Optional[TopicMatch]:
+        """
+        Busca el tema indexado más parecido con las mismas raíces y similitud >= threshold.
+
+        Args:
+            tema: El tema de la consulta
+
+        Returns:
+            El tema más parecido y la similitud; None si ninguno supera el umbral
+        """
+        palabras = topic_words(tema)
+        exact = self._by_words.get(" ".join(palabras))
+        if exact is not None:
+            return TopicMatch(self._temas[exact], 1.0)
+
+        posting = self._postings.get(topic_signature(palabras))
+        if posting is None:
+            return None
+        ngrams = topic_ngrams(tema)
+        size = len(ngrams)
+        query = {self._vocab[gram] for gram in ngrams if gram in self._vocab}
+        if not query:
+            return None
+
+        offsets, grams = self._offsets, self._grams
+        best = None
+        best_similarity = self.threshold
+        # Los temas más recientes primero
+        for entry in reversed(posting[-MAX_CANDIDATES:]):
+            start, end = offsets[entry], offsets[entry + 1]
+            similarity = len(query.intersection(grams[start:end])) / math.sqrt(size * (end - start))
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        if best is None:
+            return None
+        return TopicMatch(self._temas[best], best_similarity)
+
+    def _drop_oldest(self, count: int) -> None:
+        """Descarta las `count` entradas más antiguas y reconstruye el índice."""
+        temas = self._temas[count:]
+        self._vocab.clear()
+        self._postings.clear()
+        self._by_words.clear()
+        self._temas = []
+        self._grams = array("I")
+        self._offsets = array("I", [0])
+        for tema in temas:
+            self.add(tema)
+
+    def stats(self) -> dict:
+        """Tamaño y configuración del índice."""
+        return {
+            "entries": len(self._temas),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "array_bytes": self.memory_bytes()
+        }
+
+    def memory_bytes(self) -> int:
+        """Bytes aproximados de los arrays del índice (sin contar los textos ni los diccionarios)."""
+        arrays = [self._grams, self._offsets, *self._postings.values()]
+        return sum(len(data) * data.itemsize for data in arrays)
@@ -0,0 +1,84 @@
+"""
+Benchmark del pool de conexiones hacia Gemini.
+Compara la latencia por petición creando un GeminiService nuevo en cada
+llamada (comportamiento anterior) frente a reutilizar el servicio compartido
+que crea el lifespan. Usa el stub local, por lo que no requiere API key real.
+
+Uso:
+    python -m benchmarks.client_pool --requests 50 --connect-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from app.services.gemini_service import GeminiService, create_http_client
+from benchmarks.gemini_stub import StubConfig, start_stub
+
+FAKE_API_KEY = "stub-api-key-0000000000000000"
+
+
+def _summary(latencies: list[float]) -> dict:
+    """Resume una lista de latencias en milisegundos."""
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def _per_request(base_url: str, n: int) -> list[float]:
+    """Un cliente nuevo por petición, como hacía get_gemini_service antes."""
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        service = GeminiService(api_key=FAKE_API_KEY, model="stub", base_url=base_url)
+        await service.generate_content("hola")
+        latencies.append(time.perf_counter() - start)
+        await service.aclose()
+    return latencies
+
+
+async def _shared(base_url: str, n: int) -> list[float]:
+    """Un único servicio con pool de conexiones reutilizado en todas las peticiones."""
+    service = GeminiService(
+        api_key=FAKE_API_KEY,
+        model="stub",
+        http_client=create_http_client(100, 20, 30.0, http2=True),
+        base_url=base_url
+    )
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await service.generate_content("hola")
+        latencies.append(time.perf_counter() - start)
+    await service.aclose()
+    return latencies
+
+
+async def run(n: int, latency: float, connect_latency: float) -> dict:
+    server, base_url = start_stub(config=StubConfig(latency=latency, connect_latency=connect_latency))
+    try:
+        before = await _per_request(base_url, n)
+        after = await _shared(base_url, n)
+    finally:
+        server.shutdown()
+    return {"requests": n, "per_request_client": _summary(before), "shared_client": _summary(after)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del pool de conexiones de Gemini")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por petición (s)")
+    parser.add_argument(
+        "--connect-latency", type=float, default=0.05,
+        help="Latencia simulada al abrir conexión, equivalente a TCP + TLS (s)"
+    )
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.requests, args.latency, args.connect_latency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
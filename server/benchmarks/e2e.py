@@ -0,0 +1,285 @@
+"""
+Benchmark de extremo a extremo del servidor contra el stub local de Gemini.
+Arranca el stub y el servidor en subprocesos, lanza peticiones a
+/api/teoria/generar y /api/pdf/generar-preguntas con concurrencia controlada
+(un corpus de PDFs sintéticos de distintos tamaños) y reporta latencias
+p50/p95/p99, throughput, códigos de estado, RSS del servidor y la duración
+media de cada etapa según /metrics.
+
+Los resultados se guardan en JSON para compararlos con una ejecución anterior:
+
+Uso:
+    python -m benchmarks.e2e --concurrency 1 8 32 --requests 200
+    python -m benchmarks.e2e --scenarios pdf --pdf-pages 5 50 200 --compare benchmarks/results/base.json
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+import httpx
+from benchmarks.pdf_corpus import make_pdf
+from benchmarks.pdf_event_loop import FAKE_API_KEY, _percentile, _wait_ready
+from benchmarks.upload_memory import _rss_mib
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _wait_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("El stub no arrancó a tiempo")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stage_totals(url: str) -> dict[str, tuple[float, float]]:
+    """Lee de /metrics la suma y el número de observaciones de cada etapa."""
+    totals: dict[str, list[float]] = {}
+    try:
+        text = httpx.get(f"{url}/metrics").text
+    except httpx.HTTPError:
+        return {}
+    for line in text.splitlines():
+        if not line.startswith("eduapp_stage_duration_seconds_") or "_bucket" in line:
+            continue
+        name, value = line.rsplit(" ", 1)
+        stage = name.split('stage="', 1)[1].split('"', 1)[0]
+        index = 0 if name.startswith("eduapp_stage_duration_seconds_sum") else 1
+        totals.setdefault(stage, [0.0, 0.0])[index] = float(value)
+    return {stage: (total, count) for stage, (total, count) in totals.items()}
+
+
+class RSSSampler:
+    """Muestrea el RSS de un proceso en un hilo para obtener el pico de cada escenario."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.peak = max(self.peak, _rss_mib(self.pid, "VmRSS"))
+            except (OSError, RuntimeError):
+                return
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+async def _drive(
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    concurrency: int,
+    requests: int
+) -> tuple[list[float], list[int], float]:
+    """
+    Ejecuta `requests` peticiones con `concurrency` clientes en bucle cerrado.
+
+    Returns:
+        Tupla (latencias de las respuestas 2xx, códigos de estado, tiempo total)
+    """
+    counter = itertools.count()
+    latencies: list[float] = []
+    statuses: list[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        async def worker() -> None:
+            while (i := next(counter)) < requests:
+                start = time.perf_counter()
+                try:
+                    status = (await send(client, i)).status_code
+                except httpx.HTTPError:
+                    status = 0
+                statuses.append(status)
+                if 200 <= status < 300:
+                    latencies.append(time.perf_counter() - start)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, statuses, time.perf_counter() - wall_start
+
+
+def _scenario_senders(url: str, pdfs: list[bytes]) -> dict[str, Callable]:
+    def teoria(client: httpx.AsyncClient, i: int):
+        # Temas distintos: sin caché ni coalescencia, cada petición llega a Gemini
+        return client.post(f"{url}/api/teoria/generar", json={"tema": f"La fotosíntesis, variante {i}"})
+
+    def pdf(client: httpx.AsyncClient, i: int):
+        return client.post(
+            f"{url}/api/pdf/generar-preguntas",
+            files={"file": (f"doc-{i}.pdf", pdfs[i % len(pdfs)], "application/pdf")}
+        )
+
+    return {"teoria": teoria, "pdf": pdf}
+
+
+def run_scenario(url: str, pid: int, name: str, send: Callable, concurrency: int, requests: int) -> dict:
+    """Ejecuta un escenario y resume latencias, throughput, RSS y etapas."""
+    stages_before = _stage_totals(url)
+    with RSSSampler(pid) as sampler:
+        latencies, statuses, wall = asyncio.run(_drive(send, concurrency, requests))
+    stages_after = _stage_totals(url)
+
+    stages = {}
+    for stage, (total, count) in stages_after.items():
+        prev_total, prev_count = stages_before.get(stage, (0.0, 0.0))
+        if count > prev_count:
+            stages[stage] = round((total - prev_total) / (count - prev_count) * 1000, 1)
+
+    status_counts = {str(code): statuses.count(code) for code in sorted(set(statuses))}
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "status_codes": status_counts,
+        "wall_time_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "rss_peak_mib": sampler.peak or None,
+        "stage_mean_ms": stages
+    }
+    if latencies:
+        result.update({
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1)
+        })
+    return result
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    """Imprime la variación de p95 y throughput respecto a una ejecución anterior."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {
+            (row["scenario"], row["concurrency"]): row for row in json.load(file)["results"]
+        }
+    print(f"\nComparación con {baseline_path}:")
+    print(f"{'escenario':<10} {'conc':>5} {'p95 ms':>26} {'rps':>26}")
+    for row in results:
+        base = baseline.get((row["scenario"], row["concurrency"]))
+        if base is None or "p95_ms" not in row or "p95_ms" not in base:
+            continue
+
+        def delta(key: str) -> str:
+            change = (row[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            return f"{base[key]:.1f} -> {row[key]:.1f} ({change:+.0f}%)"
+
+        print(f"{row['scenario']:<10} {row['concurrency']:>5} {delta('p95_ms'):>26} {delta('throughput_rps'):>26}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo contra el stub de Gemini")
+    parser.add_argument("--scenarios", nargs="+", choices=["teoria", "pdf"], default=["teoria", "pdf"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario y nivel de concurrencia")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[5, 50, 200], help="Tamaños del corpus de PDFs")
+    parser.add_argument("--latency", type=float, default=0.3, help="Latencia base del stub")
+    parser.add_argument("--latency-jitter", type=float, default=0.1, help="Media de la latencia extra exponencial del stub")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--pdf-workers", type=int, default=2)
+    parser.add_argument("--cache", action="store_true", help="Mantener las cachés activas (por defecto se desactivan)")
+    parser.add_argument("--port", type=int, default=8903)
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto en benchmarks/results/)")
+    parser.add_argument("--compare", help="Resultados anteriores con los que comparar")
+    args = parser.parse_args()
+
+    pdfs = [make_pdf(pages, seed=seed) for seed, pages in enumerate(args.pdf_pages)]
+    stub_port = _free_port()
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.gemini_stub", "--port", str(stub_port),
+        "--latency", str(args.latency), "--latency-jitter", str(args.latency_jitter),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status)
+    ], stdout=subprocess.DEVNULL)
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY=FAKE_API_KEY,
+        GEMINI_BASE_URL=f"http://127.0.0.1:{stub_port}/",
+        PDF_WORKERS=str(args.pdf_workers),
+        # Sin límites de cuota locales: se mide el servicio, no la configuración
+        GEMINI_REQUESTS_PER_MINUTE="0",
+        GEMINI_TOKENS_PER_MINUTE="0",
+        GEMINI_MAX_IN_FLIGHT=str(max(32, max(args.concurrency) * 2)),
+        GEMINI_MAX_CONNECTIONS=str(max(100, max(args.concurrency) * 2))
+    )
+    if not args.cache:
+        env.update(THEORY_CACHE_BACKEND="none", PDF_CACHE_BACKEND="none")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    results = []
+    try:
+        _wait_port(stub_port)
+        _wait_ready(url)
+        senders = _scenario_senders(url, pdfs)
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = run_scenario(url, server.pid, name, senders[name], concurrency, args.requests)
+                print(json.dumps(result, ensure_ascii=False))
+                results.append(result)
+    finally:
+        server.terminate()
+        server.wait()
+        stub.terminate()
+        stub.wait()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"e2e-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "results": results
+        }, file, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
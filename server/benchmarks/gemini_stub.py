@@ -0,0 +1,224 @@
+"""
+Servidor local que imita los endpoints generateContent y
+streamGenerateContent de Gemini.
+Permite medir el servicio sin pagar llamadas reales: GeminiService puede
+apuntar a él mediante GEMINI_BASE_URL. La latencia (también por modelo), su
+variabilidad, los errores y el troceado del streaming son configurables.
+
+Uso:
+    python -m benchmarks.gemini_stub --port 8765 --latency 0.5 --latency-jitter 0.2 --error-rate 0.05
+    python -m benchmarks.gemini_stub --latency 0.2 --model-latency gemini-2.0-flash-exp=3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubConfig:
+    """Parámetros de comportamiento del stub."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+        text: str = "Respuesta simulada.",
+        chunks: int = 1,
+        chunk_interval: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        retry_delay: float = 1.0,
+        model_latency: Optional[dict[str, float]] = None
+    ):
+        """
+        Args:
+            latency: Segundos de espera antes del primer byte de cada respuesta
+            connect_latency: Segundos de espera al abrir cada conexión (simula TCP + TLS)
+            text: Texto devuelto como respuesta del modelo
+            chunks: Número de fragmentos en que se divide el texto en streaming
+            chunk_interval: Segundos entre fragmentos en streaming
+            latency_jitter: Media de una espera adicional exponencial (cola de latencias)
+            error_rate: Fracción de peticiones que responden con error_status
+            error_status: Código de error devuelto (429, 500, 503...)
+            retry_delay: Segundos de retryDelay en los errores 429
+            model_latency: Latencia de ciertos modelos en lugar de latency (modelo -> segundos)
+        """
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.text = text
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_delay = retry_delay
+        self.model_latency = model_latency or {}
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    """Handler HTTP/1.1 con keep-alive que responde como Gemini."""
+
+    protocol_version = "HTTP/1.1"
+    # Evita la espera de ~40 ms de Nagle + ACK retrasado entre cabeceras y cuerpo
+    disable_nagle_algorithm = True
+    config = StubConfig()
+
+    def setup(self):
+        # Se ejecuta una vez por conexión, no por petición
+        time.sleep(self.config.connect_latency)
+        super().setup()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        config = self.config
+        jitter = random.expovariate(1 / config.latency_jitter) if config.latency_jitter else 0.0
+        time.sleep(config.model_latency.get(self._model(), config.latency) + jitter)
+        if config.error_rate and random.random() < config.error_rate:
+            self._send_json(config.error_status, _error_payload(config.error_status, config.retry_delay))
+        elif ":streamGenerateContent" in self.path:
+            self._send_stream()
+        else:
+            self._send_json(200, _response_payload(self.config.text, self._model()))
+
+    def do_GET(self):
+        # Metadatos del modelo (models.get), que usa el calentamiento del servidor
+        name = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        self._send_json(200, {"name": f"models/{name}", "displayName": name})
+
+    def _model(self) -> str:
+        """Modelo de la ruta (/v1beta/models/<modelo>:generateContent)."""
+        return self.path.split("?", 1)[0].rsplit("/", 1)[-1].split(":", 1)[0]
+
+    def _send_stream(self) -> None:
+        """Envía el texto por fragmentos con el formato SSE de streamGenerateContent."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for i, part in enumerate(_split_text(self.config.text, self.config.chunks)):
+            if i:
+                time.sleep(self.config.chunk_interval)
+            event = f"data: {json.dumps(_response_payload(part, self._model()))}\r\n\r\n"
+            self.wfile.write(event.encode("utf-8"))
+            self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _split_text(text: str, parts: int) -> list[str]:
+    """Divide el texto en como máximo `parts` fragmentos consecutivos."""
+    parts = max(1, min(parts, len(text)))
+    size = -(-len(text) // parts)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _response_payload(text: str, model: Optional[str] = None) -> dict:
+    """Construye un cuerpo de respuesta con el formato de generateContent."""
+    payload = {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0
+            }
+        ]
+    }
+    if model:
+        payload["modelVersion"] = model
+    return payload
+
+
+_ERROR_STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+
+
+def _error_payload(status: int, retry_delay: float) -> dict:
+    """Construye un cuerpo de error con el formato de la API de Gemini."""
+    error = {
+        "code": status,
+        "message": "Error simulado por el stub.",
+        "status": _ERROR_STATUS.get(status, "UNKNOWN")
+    }
+    if status == 429:
+        error["details"] = [{
+            "@type": "type.googleapis.com/google.rpc.RetryInfo",
+            "retryDelay": f"{retry_delay:g}s"
+        }]
+    return {"error": error}
+
+
+class StubServer(ThreadingHTTPServer):
+    """Servidor del stub con una cola de conexiones amplia para ráfagas concurrentes."""
+    daemon_threads = True
+    # Con la cola por defecto (5), las conexiones en exceso esperan el reintento de SYN (~1 s)
+    request_queue_size = 1024
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, config: StubConfig = None) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Arranca el stub en un hilo en segundo plano.
+
+    Returns:
+        Tupla (servidor, URL base para GEMINI_BASE_URL)
+    """
+    handler = type("ConfiguredStubHandler", (GeminiStubHandler,), {"config": config or StubConfig()})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub local de la API de Gemini")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    parser.add_argument("--chunks", type=int, default=1)
+    parser.add_argument("--chunk-interval", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-delay", type=float, default=1.0)
+    parser.add_argument(
+        "--model-latency", action="append", default=[], metavar="MODELO=SEGUNDOS",
+        help="Latencia de un modelo concreto (repetible)"
+    )
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        connect_latency=args.connect_latency,
+        chunks=args.chunks,
+        chunk_interval=args.chunk_interval,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_delay=args.retry_delay,
+        model_latency={
+            model: float(seconds) for model, seconds in (item.split("=", 1) for item in args.model_latency)
+        }
+    )
+    server, base_url = start_stub(args.host, args.port, config)
+    print(f"Stub de Gemini escuchando en {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
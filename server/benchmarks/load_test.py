@@ -0,0 +1,78 @@
+"""
+Prueba de carga para los endpoints de generación.
+Lanza N peticiones concurrentes contra un servidor en ejecución y mide si se
+solapan (event loop libre) o si se atienden una detrás de otra.
+
+Uso:
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 10
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _post_theory(url: str, tema: str) -> tuple[float, float, int]:
+    """
+    Envía una petición a /api/teoria/generar.
+
+    Returns:
+        Tupla (inicio, fin, código de estado)
+    """
+    data = json.dumps({"tema": tema}).encode("utf-8")
+    request = urllib.request.Request(
+        f"{url}/api/teoria/generar",
+        data=data,
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return start, time.perf_counter(), status
+
+
+def run(url: str, concurrency: int, tema: str) -> dict:
+    """
+    Ejecuta la prueba de carga y calcula el solapamiento entre peticiones.
+
+    El factor de solapamiento es la suma de latencias dividida entre el tiempo
+    total: ~1 significa peticiones en serie, ~concurrency significa que todas
+    se atendieron a la vez.
+    """
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda i: _post_theory(url, f"{tema} ({i})"),
+            range(concurrency)
+        ))
+    wall_time = time.perf_counter() - wall_start
+
+    latencies = [end - start for start, end, _ in results]
+    return {
+        "concurrency": concurrency,
+        "wall_time_s": round(wall_time, 3),
+        "max_latency_s": round(max(latencies), 3),
+        "sum_latency_s": round(sum(latencies), 3),
+        "overlap_factor": round(sum(latencies) / wall_time, 2) if wall_time else 0.0,
+        "status_codes": sorted({status for _, _, status in results}),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga de EduApp API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tema", default="La fotosíntesis en las plantas")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.url, args.concurrency, args.tema), indent=2))
+
+
+if __name__ == "__main__":
+    main()
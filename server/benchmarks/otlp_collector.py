@@ -0,0 +1,120 @@
+"""
+Colector local que imita el endpoint OTLP/HTTP (JSON) de un colector de
+OpenTelemetry. Recibe las trazas de PROFILING_EXPORT=otlp, las guarda en un
+archivo JSON Lines y muestra por consola el árbol de spans de cada una, sin
+instalar un colector real.
+
+Uso:
+    python -m benchmarks.otlp_collector --port 4318 --output traces/otlp.jsonl
+    PROFILING_ENABLED=true PROFILING_EXPORT=otlp python main.py
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def _attributes(span: dict) -> dict:
+    """Atributos OTLP ({"key", "value": {"stringValue": ...}}) como diccionario plano."""
+    return {
+        attribute["key"]: next(iter(attribute["value"].values()))
+        for attribute in span.get("attributes", [])
+    }
+
+
+def format_tree(request: dict) -> str:
+    """Árbol de spans de una petición ExportTraceServiceRequest, con duraciones en ms."""
+    lines = []
+    for resource_spans in request.get("resourceSpans", []):
+        spans = [span for scope in resource_spans.get("scopeSpans", []) for span in scope.get("spans", [])]
+        children: dict[Optional[str], list[dict]] = {}
+        for span in spans:
+            children.setdefault(span.get("parentSpanId"), []).append(span)
+
+        def visit(span: dict, depth: int) -> None:
+            duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+            attributes = {
+                key: value for key, value in _attributes(span).items() if not key.startswith("profile.cpu_stacks")
+            }
+            lines.append(f"{'  ' * depth}{span['name']} {duration:.1f} ms {attributes if attributes else ''}".rstrip())
+            for child in sorted(children.get(span["spanId"], []), key=lambda s: int(s["startTimeUnixNano"])):
+                visit(child, depth + 1)
+
+        for root in children.get(None, []):
+            lines.append(f"traza {root['traceId']}")
+            visit(root, 1)
+    return "\n".join(lines)
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    """Acepta POST /v1/traces con cuerpo JSON y responde como un colector OTLP."""
+
+    output: Optional[str] = None
+    quiet = False
+    lock = threading.Lock()
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/v1/traces":
+            self.send_error(404)
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.send_error(400)
+            return
+        with self.lock:
+            if self.output:
+                with open(self.output, "a", encoding="utf-8") as output:
+                    output.write(json.dumps(request, ensure_ascii=False) + "\n")
+            if not self.quiet:
+                print(format_tree(request), flush=True)
+        response = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_collector(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    output: Optional[str] = None,
+    quiet: bool = False
+) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Arranca el colector en un hilo en segundo plano.
+
+    Returns:
+        Tupla (servidor, URL para PROFILING_OTLP_ENDPOINT)
+    """
+    handler = type("ConfiguredCollectorHandler", (CollectorHandler,), {"output": output, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/traces"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Colector OTLP/HTTP local para las trazas de EduApp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default=None, help="Archivo JSON Lines donde guardar las trazas recibidas")
+    parser.add_argument("--quiet", action="store_true", help="No mostrar el árbol de cada traza")
+    args = parser.parse_args()
+
+    server, endpoint = start_collector(args.host, args.port, args.output, args.quiet)
+    print(f"Colector OTLP escuchando en {endpoint}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
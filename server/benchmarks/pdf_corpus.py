@@ -0,0 +1,75 @@
+"""
+Generador de PDFs sintéticos para benchmarks.
+Escribe PDFs válidos con texto (fuente Helvetica) sin dependencias externas,
+para poder medir la extracción con documentos de cualquier tamaño.
+"""
+import random
+
+_PALABRAS = (
+    "la fotosíntesis es el proceso mediante el cual las plantas algas y algunas bacterias "
+    "transforman energía luminosa en energía química clorofila cloroplasto glucosa oxígeno "
+    "dióxido de carbono agua estoma fase luminosa ciclo de calvin membrana tilacoide"
+).split()
+
+
+def _escape(texto: str) -> str:
+    """Escapa los caracteres especiales de las cadenas literales de PDF."""
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, lines_per_page: int = 45, seed: int = 0, header: str = None, padding: int = 0) -> bytes:
+    """
+    Genera un PDF con texto pseudoaleatorio.
+
+    Args:
+        pages: Número de páginas
+        lines_per_page: Líneas de texto por página
+        seed: Semilla para que el contenido sea reproducible
+        header: Texto repetido al inicio de cada página (opcional)
+        padding: Bytes de un objeto binario no referenciado para inflar el tamaño del archivo
+
+    Returns:
+        El PDF en bytes
+    """
+    rng = random.Random(seed)
+    objects: list[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = add(b"")
+    page_ids = []
+    for page in range(pages):
+        lines = [header] if header else []
+        lines += [
+            " ".join(rng.choice(_PALABRAS) for _ in range(12)).capitalize() + "."
+            for _ in range(lines_per_page)
+        ]
+        lines.append(str(page + 1))
+        operations = " ".join(f"({_escape(line)}) '" for line in lines)
+        content = f"BT /F1 10 Tf 40 790 Td 14 TL {operations} ET".encode("cp1252", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    if padding:
+        add(b"<< /Length %d >>\nstream\n%s\nendstream" % (padding, rng.randbytes(padding)))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+    return bytes(output)
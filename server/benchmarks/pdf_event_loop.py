@@ -0,0 +1,122 @@
+"""
+Benchmark de la latencia de /health mientras se procesan PDFs grandes.
+Arranca el servidor en un subproceso (apuntando al stub local de Gemini),
+sube varios PDFs grandes en paralelo y sondea /health continuamente.
+Se ejecuta una vez por cada valor de PDF_WORKERS indicado para comparar.
+
+Uso:
+    python -m benchmarks.pdf_event_loop --pages 600 --uploads 4 --workers 0 2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import httpx
+from benchmarks.gemini_stub import start_stub
+from benchmarks.pdf_corpus import make_pdf
+
+FAKE_API_KEY = "stub-api-key-0000000000000000"
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("El servidor no arrancó a tiempo")
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run(workers: int, pdfs: list[bytes], port: int, stub_url: str) -> dict:
+    """Arranca el servidor con PDF_WORKERS=workers y mide /health durante la carga."""
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY=FAKE_API_KEY,
+        GEMINI_BASE_URL=stub_url,
+        PDF_WORKERS=str(workers),
+        PDF_CACHE_BACKEND="none",
+        PDF_EXTRACTION_TIMEOUT_SECONDS="300"
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url)
+        done = threading.Event()
+        upload_times = []
+
+        def upload(pdf: bytes) -> None:
+            start = time.perf_counter()
+            httpx.post(
+                f"{url}/api/pdf/generar-preguntas",
+                files={"file": ("libro.pdf", pdf, "application/pdf")},
+                timeout=None
+            )
+            upload_times.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=upload, args=(pdf,)) for pdf in pdfs]
+        for thread in threads:
+            thread.start()
+
+        def wait_uploads() -> None:
+            for thread in threads:
+                thread.join()
+            done.set()
+
+        threading.Thread(target=wait_uploads).start()
+
+        health_latencies = []
+        with httpx.Client() as client:
+            while not done.is_set():
+                start = time.perf_counter()
+                client.get(f"{url}/health")
+                health_latencies.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+        return {
+            "pdf_workers": workers,
+            "uploads": len(pdfs),
+            "upload_max_s": round(max(upload_times), 2),
+            "health_samples": len(health_latencies),
+            "health_p50_ms": round(statistics.median(health_latencies) * 1000, 1),
+            "health_p99_ms": round(_percentile(health_latencies, 0.99) * 1000, 1),
+            "health_max_ms": round(max(health_latencies) * 1000, 1),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latencia de /health durante la extracción de PDFs")
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    pdfs = [make_pdf(args.pages, seed=i) for i in range(args.uploads)]
+    stub, stub_url = start_stub()
+    try:
+        results = [run(workers, pdfs, args.port, stub_url) for workers in args.workers]
+    finally:
+        stub.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark del tiempo y la memoria pico de parse_pdf según el tamaño del PDF.
+Compara la extracción con presupuesto (MAX_PDF_TEXT_LENGTH) frente a parsear
+el documento completo, que era el comportamiento anterior.
+
+Uso:
+    python -m benchmarks.pdf_extraction --pages 10 100 1000 --budget 8000
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from benchmarks.pdf_corpus import make_pdf
+from app.services.pdf_service import parse_pdf
+
+
+def measure(pdf: bytes, budget: int) -> dict:
+    """Mide una extracción: segundos, memoria pico y páginas recorridas."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    extraccion = parse_pdf(pdf, budget)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_mib": round(peak / 2**20, 2),
+        "pages_parsed": extraccion.paginas_procesadas,
+        "pages_skipped": extraccion.paginas_omitidas,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extracción de PDF con presupuesto frente a completa")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--budget", type=int, default=8000)
+    args = parser.parse_args()
+
+    results = []
+    for pages in args.pages:
+        pdf = make_pdf(pages)
+        results.append({
+            "pages": pages,
+            "pdf_mib": round(len(pdf) / 2**20, 2),
+            "budget": measure(pdf, args.budget),
+            "full": measure(pdf, sys.maxsize),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
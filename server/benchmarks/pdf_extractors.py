@@ -0,0 +1,125 @@
+"""
+Benchmark comparativo de los backends de extracción de PDF (PDF_EXTRACTORS).
+
+Para cada documento del corpus y cada backend instalado mide, en un proceso
+nuevo, la extracción completa con parse_pdf (sin presupuesto ni compactación):
+- Páginas por segundo (mejor de --runs ejecuciones).
+- Memoria pico: crecimiento del RSS máximo del proceso durante la extracción
+  (incluye la memoria de los motores en C, que tracemalloc no ve).
+- Paridad del texto con el backend de referencia: proporción de palabras
+  comunes (multiconjunto), 1.0 si extraen exactamente las mismas palabras.
+
+El corpus son PDFs sintéticos de benchmarks.pdf_corpus (--pages) y,
+opcionalmente, los PDFs de un directorio (--corpus-dir) con documentos reales.
+
+Uso:
+    python -m benchmarks.pdf_extractors --pages 10 100 500
+    python -m benchmarks.pdf_extractors --corpus-dir ~/pdfs --reference pypdf
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from benchmarks.pdf_corpus import make_pdf
+from app.services.pdf_extractors import EXTRACTORS, available_extractors
+from app.services.pdf_service import parse_pdf
+
+
+def _max_rss_mib() -> float:
+    # En Linux ru_maxrss está en KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(path: str, extractor: str, runs: int) -> dict:
+    """Se ejecuta en un proceso nuevo: extrae el documento entero `runs` veces."""
+    EXTRACTORS[extractor].preload()
+    baseline = _max_rss_mib()
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        extraccion = parse_pdf(path, sys.maxsize, False, (extractor,))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "seconds": best,
+        "pages": extraccion.paginas_totales,
+        "peak_rss_mib": _max_rss_mib() - baseline,
+        "texto": extraccion.texto
+    }
+
+
+def _parity(texto: str, referencia: str) -> float:
+    """Palabras comunes (con repeticiones) entre la mayor de las dos extracciones."""
+    palabras, palabras_ref = Counter(texto.split()), Counter(referencia.split())
+    total = max(sum(palabras.values()), sum(palabras_ref.values()))
+    return sum((palabras & palabras_ref).values()) / total if total else 1.0
+
+
+def _corpus(pages: list[int], corpus_dir: str, workdir: str) -> list[tuple[str, str]]:
+    """Escribe los PDFs sintéticos en workdir y añade los del directorio indicado."""
+    documents = []
+    for count in pages:
+        path = os.path.join(workdir, f"sintetico-{count}.pdf")
+        with open(path, "wb") as pdf_file:
+            pdf_file.write(make_pdf(count, header="Apuntes de Biología - Tema 3"))
+        documents.append((f"sintetico-{count}p", path))
+    if corpus_dir:
+        documents += [(path.name, str(path)) for path in sorted(Path(corpus_dir).expanduser().glob("*.pdf"))]
+    return documents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Comparativa de backends de extracción de PDF")
+    parser.add_argument("--pages", type=int, nargs="*", default=[10, 100, 500], help="Páginas de los PDFs sintéticos")
+    parser.add_argument("--corpus-dir", help="Directorio con PDFs reales que añadir al corpus")
+    parser.add_argument("--extractors", nargs="+", default=list(EXTRACTORS), choices=list(EXTRACTORS))
+    parser.add_argument("--reference", default="pypdf2", choices=list(EXTRACTORS), help="Backend de referencia para la paridad")
+    parser.add_argument("--runs", type=int, default=3, help="Ejecuciones por documento y backend (se toma la mejor)")
+    args = parser.parse_args()
+
+    extractors = available_extractors(args.extractors)
+    missing = sorted(set(args.extractors) - set(extractors))
+    if missing:
+        print(f"No instalados (se omiten): {', '.join(missing)}")
+    if args.reference not in extractors:
+        extractors = available_extractors([args.reference]) + extractors
+    if not extractors:
+        sys.exit("Ningún backend instalado")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, path in _corpus(args.pages, args.corpus_dir, workdir):
+            rows = {}
+            for extractor in extractors:
+                # Un proceso por medición para que el RSS máximo no arrastre las anteriores
+                with ctx.Pool(1) as pool:
+                    try:
+                        rows[extractor] = pool.apply(_measure, (path, extractor, args.runs))
+                    except Exception as e:
+                        rows[extractor] = {"error": f"{type(e).__name__}: {e}"}
+            referencia = rows.get(args.reference, {}).get("texto")
+            for extractor, row in rows.items():
+                if "error" in row:
+                    results.append({"document": name, "extractor": extractor, "error": row["error"]})
+                    continue
+                results.append({
+                    "document": name,
+                    "extractor": extractor,
+                    "pages": row["pages"],
+                    "pages_per_second": round(row["pages"] / row["seconds"], 1),
+                    "peak_rss_mib": round(row["peak_rss_mib"], 1),
+                    "chars": len(row["texto"]),
+                    "parity": round(_parity(row["texto"], referencia), 4) if referencia is not None else None
+                })
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark del modo completo de preguntas (map-reduce por secciones).
+Extrae el texto de un PDF sintético, lo divide en secciones y mide el tiempo
+total de QuestionPipeline contra el stub local de Gemini con distintos límites
+de concurrencia. Con concurrencia suficiente, el tiempo debe acercarse a una
+sección más la fusión, y no a la suma de todas las secciones.
+
+Uso:
+    python -m benchmarks.pdf_map_reduce --pages 200 --latency 0.5 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.gemini_stub import StubConfig, start_stub
+from benchmarks.pdf_corpus import make_pdf
+from benchmarks.pdf_event_loop import FAKE_API_KEY
+from app.services.gemini_service import GeminiService, create_http_client
+from app.services.pdf_service import parse_pdf
+from app.services.question_pipeline import QuestionPipeline, split_sections
+
+
+async def run(texto: str, base_url: str, section_tokens: int, concurrency: int) -> dict:
+    """Genera las preguntas del texto completo y mide el tiempo total."""
+    service = GeminiService(
+        api_key=FAKE_API_KEY,
+        model="gemini-stub",
+        http_client=create_http_client(100, 100, 30.0, http2=False),
+        base_url=base_url
+    )
+    pipeline = QuestionPipeline(service, len(texto), section_tokens, concurrency)
+    try:
+        start = time.perf_counter()
+        resultado = await pipeline.generate(texto)
+        return {
+            "concurrency": concurrency,
+            "sections": resultado.secciones,
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+    finally:
+        await service.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tiempo del modo completo según la concurrencia")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--section-tokens", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    texto = parse_pdf(make_pdf(args.pages), 10**9).texto
+    print(f"{len(texto)} caracteres, {len(split_sections(texto, args.section_tokens))} secciones")
+    stub, base_url = start_stub(config=StubConfig(latency=args.latency))
+    try:
+        results = [
+            asyncio.run(run(texto, base_url, args.section_tokens, concurrency))
+            for concurrency in args.concurrency
+        ]
+    finally:
+        stub.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark del arranque en frío del servidor.
+
+Mide, en procesos nuevos:
+- El tiempo de `import app.main` con `python -X importtime` y los módulos que más
+  aportan, comprobando que los módulos de importación diferida (SDK de Gemini,
+  motores de PDF) no se cargan al importar la aplicación.
+- El tiempo hasta que /health responde al arrancar uvicorn y la latencia de la
+  primera petición a Gemini (contra el stub, con latencia de conexión), con y
+  sin GEMINI_WARMUP.
+
+Con --max-import-ms termina con código 1 si la importación supera el presupuesto
+o si se carga algún módulo diferido, para usarlo como comprobación en CI.
+
+Uso:
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --max-import-ms 800 --skip-server
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.e2e import _free_port, _wait_port
+from benchmarks.pdf_event_loop import FAKE_API_KEY
+
+# Módulos que no deben cargarse al importar la aplicación
+DEFERRED_MODULES = ("google.genai", "PyPDF2", "pypdf", "fitz", "pypdfium2")
+
+
+def _env(**extra: str) -> dict:
+    return dict(os.environ, GEMINI_API_KEY=FAKE_API_KEY, **extra)
+
+
+def _parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Convierte la salida de -X importtime en {módulo: (propio µs, acumulado µs)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_profile(runs: int) -> dict:
+    """Importa app.main en `runs` procesos nuevos y resume los tiempos."""
+    totals = []
+    profiles = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            env=_env(), capture_output=True, text=True, check=True
+        )
+        modules = _parse_importtime(proc.stderr)
+        totals.append(modules["app.main"][1] / 1000)
+        profiles.append(modules)
+
+    probe = subprocess.run(
+        [sys.executable, "-c",
+         "import json, sys, app.main; "
+         f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))"],
+        env=_env(), capture_output=True, text=True, check=True
+    )
+    return {
+        "import_ms_median": round(statistics.median(totals), 1),
+        "import_ms_min": round(min(totals), 1),
+        "deferred_modules_loaded": json.loads(probe.stdout),
+        "profile": profiles[totals.index(min(totals))]
+    }
+
+
+def _top_modules(profile: dict[str, tuple[int, int]], top: int) -> list[tuple[str, float, float]]:
+    """Paquetes de primer nivel que más tiempo acumulado aportan."""
+    roots = {name: times for name, times in profile.items() if "." not in name}
+    ranked = sorted(roots.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return [(name, self_us / 1000, cumulative_us / 1000) for name, (self_us, cumulative_us) in ranked]
+
+
+def server_start(stub_port: int, warmup: bool) -> dict:
+    """Arranca uvicorn y mide el tiempo hasta /health y la primera petición a Gemini."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(
+            GEMINI_BASE_URL=f"http://127.0.0.1:{stub_port}/",
+            GEMINI_WARMUP=str(warmup).lower(),
+            THEORY_CACHE_BACKEND="none"
+        )
+    )
+    try:
+        ready = None
+        while ready is None and time.perf_counter() - start < 60:
+            try:
+                if httpx.get(f"{url}/health").status_code == 200:
+                    ready = time.perf_counter() - start
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        if ready is None:
+            raise RuntimeError("El servidor no arrancó a tiempo")
+
+        first = time.perf_counter()
+        status = httpx.post(
+            f"{url}/api/teoria/generar", json={"tema": "La fotosíntesis"}, timeout=30
+        ).status_code
+        first_request = time.perf_counter() - first
+        warmup_result = httpx.get(f"{url}/health").json().get("warmup")
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "warmup": warmup,
+        "ready_ms": round(ready * 1000, 1),
+        "first_request_ms": round(first_request * 1000, 1),
+        "first_request_status": status,
+        "warmup_result": warmup_result
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frío del servidor")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos nuevos por medición")
+    parser.add_argument("--top", type=int, default=12, help="Paquetes a mostrar en el perfil de importación")
+    parser.add_argument("--connect-latency", type=float, default=0.2, help="Latencia de conexión simulada del stub")
+    parser.add_argument("--latency", type=float, default=0.1, help="Latencia de respuesta del stub")
+    parser.add_argument("--skip-server", action="store_true", help="Medir solo la importación")
+    parser.add_argument("--max-import-ms", type=float, help="Presupuesto de importación; si se supera, código de salida 1")
+    args = parser.parse_args()
+
+    result = import_profile(args.runs)
+    print(f"import app.main: mediana {result['import_ms_median']} ms, mínimo {result['import_ms_min']} ms")
+    print(f"{'paquete':<24} {'propio ms':>10} {'acumulado ms':>13}")
+    for name, self_ms, cumulative_ms in _top_modules(result["profile"], args.top):
+        print(f"{name:<24} {self_ms:>10.1f} {cumulative_ms:>13.1f}")
+    loaded = result["deferred_modules_loaded"]
+    print(f"Módulos diferidos cargados al importar: {', '.join(loaded) if loaded else 'ninguno'}")
+
+    if not args.skip_server:
+        stub_port = _free_port()
+        stub = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.gemini_stub", "--port", str(stub_port),
+            "--latency", str(args.latency), "--connect-latency", str(args.connect_latency)
+        ], stdout=subprocess.DEVNULL)
+        try:
+            _wait_port(stub_port)
+            for warmup in (False, True):
+                rows = [server_start(stub_port, warmup) for _ in range(args.runs)]
+                print(json.dumps({
+                    "warmup": warmup,
+                    "ready_ms_median": statistics.median(row["ready_ms"] for row in rows),
+                    "first_request_ms_median": statistics.median(row["first_request_ms"] for row in rows),
+                    "first_request_status": sorted({row["first_request_status"] for row in rows}),
+                    "warmup_result": rows[-1]["warmup_result"]
+                }, ensure_ascii=False))
+        finally:
+            stub.terminate()
+            stub.wait()
+
+    if args.max_import_ms is not None:
+        failures = []
+        if result["import_ms_median"] > args.max_import_ms:
+            failures.append(f"la importación tarda {result['import_ms_median']} ms (presupuesto {args.max_import_ms} ms)")
+        if loaded:
+            failures.append(f"se cargan módulos diferidos al importar: {', '.join(loaded)}")
+        if failures:
+            print("FALLO: " + "; ".join(failures))
+            sys.exit(1)
+        print("OK: dentro del presupuesto de arranque")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark del índice de temas casi duplicados (TopicIndex) según su tamaño.
+
+Llena el índice con temas sintéticos (palabras pseudoaleatorias de un
+vocabulario con frecuencias de Zipf, como en los temas reales, donde unas
+pocas palabras aparecen en muchos temas) y, en cada tamaño, mide:
+- Latencia de lookup (p50/p99) con temas nuevos y con paráfrasis de temas
+  indexados (palabras vacías añadidas, una palabra de más o cambio de tildes).
+- Proporción de paráfrasis encontradas.
+- Memoria: bytes de los arrays del índice y crecimiento total del heap de
+  Python (tracemalloc, en una pasada de llenado aparte para no distorsionar
+  las latencias), que incluye textos y vocabulario.
+
+Uso:
+    python -m benchmarks.topic_index --sizes 1000 10000 100000
+"""
+import argparse
+import itertools
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from app.services.topic_index import TopicIndex
+
+_SILABAS = "ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo fu ga ge gi go gu la le li lo lu ma me mi mo mu na ne ni no nu pa pe pi po pu ra re ri ro ru sa se si so su ta te ti to tu ción sis dad mo tra gra".split()
+_PREFIJOS = ("la", "el", "qué es la", "explica el", "introducción a la", "los", "")
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list[str]:
+    """Palabras pseudoaleatorias de 2 a 5 sílabas."""
+    return ["".join(rng.choice(_SILABAS) for _ in range(rng.randint(2, 5))) for _ in range(size)]
+
+
+def make_topic(vocabulary: list[str], weights: list[float], rng: random.Random) -> str:
+    palabras = rng.choices(vocabulary, cum_weights=weights, k=rng.randint(2, 4))
+    return " ".join(palabras)
+
+
+def paraphrase(tema: str, vocabulary: list[str], rng: random.Random) -> str:
+    """Variante de un tema como las que envían los usuarios."""
+    variante = rng.randrange(3)
+    if variante == 0:
+        return f"{rng.choice(_PREFIJOS)} {tema}".strip().capitalize()
+    if variante == 1:
+        # Plural: conserva las raíces de las palabras
+        return f"{tema}es"
+    return tema.upper().replace("A", "Á", 1)
+
+
+def fill(index: TopicIndex, size: int, temas: list[str], vocabulary: list[str], weights: list[float], rng: random.Random) -> None:
+    """Añade temas sintéticos hasta que el índice tenga `size` entradas."""
+    while len(index) < size:
+        tema = make_topic(vocabulary, weights, rng)
+        temas.append(tema)
+        index.add(tema)
+
+
+def measure_memory(sizes: list[int], threshold: float, vocabulary: list[str], weights: list[float], seed: int) -> dict[int, float]:
+    """Crecimiento del heap de Python (MiB) al llenar un índice nuevo hasta cada tamaño."""
+    index = TopicIndex(threshold=threshold, max_entries=max(sizes))
+    rng = random.Random(seed)
+    memory = {}
+    tracemalloc.start()
+    for size in sizes:
+        fill(index, size, [], vocabulary, weights, rng)
+        memory[size] = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    return memory
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latencia y memoria del índice de temas según su tamaño")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=2000, help="Consultas por tamaño (mitad nuevas, mitad paráfrasis)")
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Palabras distintas del vocabulario sintético")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    # Pesos acumulados de Zipf (choices no los recalcula en cada llamada)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    memory = measure_memory(sizes, args.threshold, vocabulary, weights, args.seed)
+    index = TopicIndex(threshold=args.threshold, max_entries=max(sizes))
+    temas: list[str] = []
+
+    results = []
+    for size in sizes:
+        added = size - len(index)
+        start = time.perf_counter()
+        fill(index, size, temas, vocabulary, weights, rng)
+        build_seconds = time.perf_counter() - start
+
+        latencies = {"nuevos": [], "parafrasis": []}
+        found = 0
+        for i in range(args.queries):
+            if i % 2:
+                kind, query = "parafrasis", paraphrase(rng.choice(temas), vocabulary, rng)
+            else:
+                kind, query = "nuevos", make_topic(vocabulary, weights, rng)
+            start = time.perf_counter()
+            match = index.lookup(query)
+            latencies[kind].append((time.perf_counter() - start) * 1e6)
+            if kind == "parafrasis" and match is not None:
+                found += 1
+
+        results.append({
+            "entries": len(index),
+            "build_us_per_add": round(build_seconds * 1e6 / max(1, added), 1),
+            "lookup_us": {
+                kind: {
+                    "p50": round(statistics.median(values), 1),
+                    "p99": round(_percentile(values, 0.99), 1),
+                    "max": round(max(values), 1)
+                }
+                for kind, values in latencies.items()
+            },
+            "paraphrases_found": round(found / len(latencies["parafrasis"]), 3),
+            "index_arrays_mib": round(index.memory_bytes() / 2**20, 2),
+            "python_heap_mib": round(memory[size], 2)
+        })
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark del coste de la instrumentación de app.core.tracing.
+Mide span() sin traza activa (el caso de todas las peticiones no perfiladas)
+y con traza, y parse_pdf sin perfilar frente a perfilado con muestreo de pila
+y tracemalloc.
+
+Uso:
+    python -m benchmarks.tracing_overhead --pages 200 --budget 100000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+import timeit
+from app.core.tracing import Trace, span
+from app.services.pdf_service import parse_pdf
+from benchmarks.pdf_corpus import make_pdf
+
+
+def span_cost(number: int) -> dict:
+    """Nanosegundos por span() sin traza activa y dentro de una traza."""
+    def enter() -> None:
+        with span("bench"):
+            pass
+
+    off = timeit.timeit(enter, number=number) / number
+    with Trace("bench"):
+        on = timeit.timeit(enter, number=number) / number
+    return {"off_ns": round(off * 1e9, 1), "on_ns": round(on * 1e9, 1)}
+
+
+def parse_cost(pdf: bytes, budget: int, repeat: int, cpu_interval: float, memory: bool) -> dict:
+    """Mediana de segundos de parse_pdf sin traza y con traza."""
+    def run(profiled: bool) -> float:
+        start = time.perf_counter()
+        if profiled:
+            with Trace("bench", cpu_interval=cpu_interval, memory=memory):
+                parse_pdf(pdf, budget)
+        else:
+            parse_pdf(pdf, budget)
+        return time.perf_counter() - start
+
+    run(False)
+    off = statistics.median(run(False) for _ in range(repeat))
+    on = statistics.median(run(True) for _ in range(repeat))
+    return {
+        "off_s": round(off, 4),
+        "on_s": round(on, 4),
+        "overhead_pct": round((on / off - 1) * 100, 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Coste de la instrumentación de trazas")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--spans", type=int, default=200_000)
+    parser.add_argument("--cpu-interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    pdf = make_pdf(args.pages)
+    cpu_interval = args.cpu_interval_ms / 1000
+    print(json.dumps({
+        "span": span_cost(args.spans),
+        "parse_pdf_spans_only": parse_cost(pdf, args.budget, args.repeat, 0.0, False),
+        "parse_pdf_cpu_sampling": parse_cost(pdf, args.budget, args.repeat, cpu_interval, False),
+        "parse_pdf_cpu_and_tracemalloc": parse_cost(pdf, args.budget, args.repeat, cpu_interval, True)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
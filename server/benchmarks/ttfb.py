@@ -0,0 +1,55 @@
+"""
+Mide el tiempo hasta el primer byte (TTFB) y hasta el primer fragmento de
+texto de /api/teoria/generar frente a su variante SSE /api/teoria/generar/stream.
+
+Uso (con el servidor apuntando al stub, por ejemplo):
+    python -m benchmarks.gemini_stub --latency 0.3 --chunks 20 --chunk-interval 0.2
+    GEMINI_BASE_URL=http://127.0.0.1:8765/ python main.py
+    python -m benchmarks.ttfb --url http://localhost:8000
+"""
+import argparse
+import json
+import time
+import httpx
+
+
+def measure(url: str, path: str, tema: str) -> dict:
+    """
+    Envía una petición y mide el primer byte, el primer evento de texto y el total.
+
+    Returns:
+        Diccionario con los tiempos en milisegundos
+    """
+    start = time.perf_counter()
+    first_byte = first_text = None
+    with httpx.stream("POST", f"{url}{path}", json={"tema": tema}, timeout=None) as response:
+        for line in response.iter_lines():
+            now = time.perf_counter()
+            if first_byte is None:
+                first_byte = now
+            if first_text is None and ('"texto"' in line or '"teoria"' in line):
+                first_text = now
+    total = time.perf_counter() - start
+    return {
+        "path": path,
+        "ttfb_ms": round((first_byte - start) * 1000, 1),
+        "first_text_ms": round(((first_text or first_byte) - start) * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TTFB de los endpoints de teoría")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--tema", default="La fotosíntesis en las plantas")
+    args = parser.parse_args()
+
+    results = [
+        measure(args.url, "/api/teoria/generar", args.tema),
+        measure(args.url, "/api/teoria/generar/stream", args.tema),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
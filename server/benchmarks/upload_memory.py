@@ -0,0 +1,91 @@
+"""
+Benchmark de la memoria del servidor con subidas grandes concurrentes.
+Arranca el servidor en un subproceso (apuntando al stub local de Gemini),
+sube varios PDFs grandes a la vez y lee el pico de RSS del proceso (VmHWM,
+solo Linux). Con la subida volcada por bloques a un archivo temporal, el pico
+debe mantenerse estable aunque crezcan el tamaño o el número de subidas.
+
+Uso:
+    python -m benchmarks.upload_memory --size-mb 50 --uploads 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import httpx
+from benchmarks.gemini_stub import start_stub
+from benchmarks.pdf_corpus import make_pdf
+from benchmarks.pdf_event_loop import FAKE_API_KEY, _wait_ready
+
+
+def _rss_mib(pid: int, field: str) -> float:
+    """Lee VmRSS o VmHWM (pico) de /proc/<pid>/status en MiB."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return round(int(line.split()[1]) / 1024, 1)
+    raise RuntimeError(f"{field} no disponible")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pico de RSS del servidor con subidas grandes concurrentes")
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8902)
+    args = parser.parse_args()
+
+    pdf = make_pdf(50, padding=args.size_mb * 2**20)
+    stub, stub_url = start_stub()
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY=FAKE_API_KEY,
+        GEMINI_BASE_URL=stub_url,
+        PDF_WORKERS=str(args.workers),
+        PDF_CACHE_BACKEND="none",
+        MAX_PDF_UPLOAD_BYTES=str(len(pdf) + 1)
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        _wait_ready(url)
+        idle_rss = _rss_mib(server.pid, "VmRSS")
+        statuses = []
+
+        def upload() -> None:
+            response = httpx.post(
+                f"{url}/api/pdf/generar-preguntas",
+                files={"file": ("grande.pdf", pdf, "application/pdf")},
+                timeout=None
+            )
+            statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=upload) for _ in range(args.uploads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(json.dumps({
+            "upload_mib": round(len(pdf) / 2**20, 1),
+            "uploads": args.uploads,
+            "statuses": sorted(set(statuses)),
+            "seconds": round(time.perf_counter() - start, 2),
+            "idle_rss_mib": idle_rss,
+            "peak_rss_mib": _rss_mib(server.pid, "VmHWM"),
+        }, indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,78 @@
 """
 Punto de entrada del servidor.
-Ejecuta la aplicación FastAPI usando uvicorn.
+
+Uso:
+    python main.py          # Desarrollo: un proceso con recarga automática
+    python main.py --prod   # Producción: WORKERS procesos con la configuración de Settings
 """
-from app.main import app
-from app.core.config import settings
+import argparse
+import random
 import uvicorn
+from uvicorn.supervisors import Multiprocess
+from app.core.config import settings
 
-if __name__ == "__main__":
-    uvicorn.run(
-        app,
+# Con reload o varios workers uvicorn necesita importar la aplicación por su ruta
+APP = "app.main:app"
+
+
+class RecyclingServer(uvicorn.Server):
+    """
+    Servidor de uvicorn que, al arrancar en cada worker, suma un margen
+    aleatorio al límite de peticiones. Así los workers no se reciclan todos a
+    la vez, lo que dejaría el puerto sin nadie que acepte conexiones.
+    """
+
+    def __init__(self, config: uvicorn.Config, jitter: int = 0):
+        super().__init__(config)
+        self.jitter = jitter
+
+    def run(self, sockets=None) -> None:
+        if self.config.limit_max_requests and self.jitter:
+            self.config.limit_max_requests += random.randint(0, self.jitter)
+        super().run(sockets=sockets)
+
+
+def run_dev() -> None:
+    """Arranca un único proceso con recarga automática al cambiar el código."""
+    uvicorn.run(APP, host=settings.HOST, port=settings.PORT, reload=True)
+
+
+def run_prod() -> None:
+    """
+    Arranca WORKERS procesos supervisados por uvicorn. Los workers se reciclan
+    tras WORKER_MAX_REQUESTS peticiones (el supervisor los vuelve a lanzar) y,
+    al recibir SIGTERM, dejan de aceptar conexiones y esperan hasta
+    GRACEFUL_SHUTDOWN_SECONDS a que terminen las peticiones en curso.
+    """
+    config = uvicorn.Config(
+        APP,
         host=settings.HOST,
         port=settings.PORT,
-        reload=True  # Activa el modo desarrollo con recarga automática
+        workers=settings.WORKERS,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        limit_max_requests=settings.WORKER_MAX_REQUESTS or None,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_SECONDS,
+        timeout_keep_alive=settings.KEEPALIVE_TIMEOUT_SECONDS,
+        backlog=settings.BACKLOG,
+        access_log=settings.ACCESS_LOG,
+        proxy_headers=True
     )
+    server = RecyclingServer(config, jitter=settings.WORKER_MAX_REQUESTS_JITTER)
+    try:
+        if config.workers > 1:
+            Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+        else:
+            server.run()
+    except KeyboardInterrupt:
+        pass
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de EduApp")
+    parser.add_argument("--prod", action="store_true", help="Modo producción con varios workers")
+    args = parser.parse_args()
+    if args.prod:
+        run_prod()
+    else:
+        run_dev()
@@ -0,0 +1,10 @@
+"""
+Configuración común de las pruebas.
+Define un entorno mínimo para que app.core.config pueda cargarse sin un .env
+real: clave de Gemini ficticia y cachés en memoria.
+"""
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "AIzaFAKEKEY_abcdefghijklmnopqrstuv")
+os.environ.setdefault("THEORY_CACHE_BACKEND", "memory")
+os.environ.setdefault("PDF_CACHE_BACKEND", "memory")
@@ -0,0 +1,116 @@
+"""Pruebas de los backends de caché y de ResponseCache."""
+import asyncio
+import sqlite3
+import time
+import pytest
+from app.services import cache_service
+from app.services.cache_service import MemoryLRUCache, ResponseCache, SQLiteCache, make_cache_key, normalize_tema
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=3, ttl_seconds=60)
+    yield cache
+    cache.close()
+
+
+def test_normalize_tema_and_keys():
+    assert normalize_tema("  ¿La  Fotosíntesis? ") == "la fotosintesis"
+    assert make_cache_key("a", "b") != make_cache_key("ab")
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryLRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+
+
+def test_sqlite_counters_follow_inserts_updates_and_deletes(sqlite_cache):
+    sqlite_cache.set("a", "uno")
+    sqlite_cache.set("b", "dos")
+    sqlite_cache.set("a", "ñandú")
+    assert len(sqlite_cache) == 2
+    assert sqlite_cache.total_bytes == len("ñandú".encode()) + 3
+    sqlite_cache.clear()
+    assert (len(sqlite_cache), sqlite_cache.total_bytes) == (0, 0)
+
+
+def test_sqlite_evicts_least_recently_used_over_max_entries(sqlite_cache, monkeypatch):
+    monkeypatch.setattr(cache_service, "ACCESS_RESOLUTION_SECONDS", 0.0)
+    for key in "abc":
+        sqlite_cache.set(key, key)
+        time.sleep(0.001)
+    sqlite_cache.get("a")
+    sqlite_cache.set("d", "d")
+    assert len(sqlite_cache) == 3
+    assert sqlite_cache.get("b") is None
+    assert sqlite_cache.get("a") == "a"
+
+
+def test_sqlite_evicts_by_size(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=100, ttl_seconds=60, max_bytes=25)
+    for key in "abc":
+        cache.set(key, key * 10)
+        time.sleep(0.001)
+    assert cache.total_bytes <= 25
+    assert cache.get("a") is None
+    assert cache.get("c") == "c" * 10
+    cache.close()
+
+
+def test_sqlite_hits_only_rewrite_recent_access_times_after_the_resolution(sqlite_cache):
+    sqlite_cache.set("a", "1")
+    accessed = sqlite_cache._conn.execute("SELECT accessed_at FROM cache").fetchone()[0]
+    sqlite_cache.get("a")
+    assert sqlite_cache._conn.execute("SELECT accessed_at FROM cache").fetchone()[0] == accessed
+
+
+def test_sqlite_expired_entries_are_not_returned_and_are_purged(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=10, ttl_seconds=0.01)
+    cache.set("a", "1")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    cache.set("b", "2")
+    cache._next_purge = 0.0
+    time.sleep(0.02)
+    cache.set("c", "3")
+    assert len(cache) == 1
+    cache.close()
+
+
+def test_sqlite_counters_survive_reopening_and_count_preexisting_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+        "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO cache VALUES ('viejo', 'x', ?, ?)", (time.time() + 60, time.time()))
+    conn.commit()
+    conn.close()
+
+    cache = SQLiteCache(path, max_entries=10, ttl_seconds=60)
+    cache.set("nuevo", "abc")
+    cache.close()
+    cache = SQLiteCache(path, max_entries=10, ttl_seconds=60)
+    assert len(cache) == 2
+    assert cache.total_bytes == 3
+    cache.close()
+
+
+def test_response_cache_async_methods_count_hits_and_misses(sqlite_cache):
+    cache = ResponseCache(sqlite_cache)
+
+    async def scenario():
+        assert await cache.aget("a") is None
+        await cache.aset("a", "1")
+        assert await cache.aget("a") == "1"
+        assert await cache.apeek("a") == "1"
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 1)
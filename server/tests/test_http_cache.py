@@ -0,0 +1,109 @@
+"""Pruebas de los validadores de caché HTTP y de GET /api/teoria/generar."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from app.api.http_cache import cacheable_response, etag_matches, make_etag, not_modified
+from app.api.routes import teoria
+from app.core.dependencies import get_gemini_service
+from app.models.schemas import TheoryResponse
+from app.services.cache_service import MemoryLRUCache, ResponseCache
+from app.services.gemini_service import GeminiService
+
+
+def make_request(if_none_match=None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+def test_make_etag_is_weak_and_depends_on_every_part():
+    etag = make_etag("fotosíntesis", "teoría")
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == make_etag("fotosíntesis", "teoría")
+    assert etag != make_etag("fotosíntesis", "otra teoría")
+    # Las partes se separan: ("ab", "c") y ("a", "bc") no colisionan
+    assert make_etag("ab", "c") != make_etag("a", "bc")
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+])
+def test_etag_matches_uses_weak_comparison(header, expected):
+    assert etag_matches(header, 'W/"abc"') is expected
+
+
+def test_not_modified_returns_304_with_validators():
+    response = not_modified(make_request('W/"abc"'), 'W/"abc"', max_age=60)
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"abc"'
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert not_modified(make_request('W/"xyz"'), 'W/"abc"', max_age=60) is None
+    assert not_modified(make_request(), 'W/"abc"', max_age=60) is None
+
+
+def test_cacheable_response_sends_the_body_with_validators():
+    content = TheoryResponse(tema="t", teoria="teoría")
+    response = cacheable_response(make_request(), content, 'W/"abc"', max_age=60)
+    assert response.status_code == 200
+    assert response.headers["etag"] == 'W/"abc"'
+    assert b"teor" in response.body
+    assert cacheable_response(make_request('W/"abc"'), content, 'W/"abc"', 60).status_code == 304
+
+
+@pytest.fixture
+def service():
+    service = GeminiService(
+        api_key="AIzaFAKEKEY_abcdefghijklmnopqrstuv",
+        model="gemini-test",
+        theory_cache=ResponseCache(MemoryLRUCache(max_entries=10, ttl_seconds=60))
+    )
+    service.calls = 0
+
+    async def generate_content(prompt, model):
+        service.calls += 1
+        return f"teoría {service.calls}"
+
+    service.generate_content = generate_content
+    return service
+
+
+@pytest.fixture
+def client(service):
+    app = FastAPI()
+    app.include_router(teoria.router, prefix="/api")
+    app.dependency_overrides[get_gemini_service] = lambda: service
+    return TestClient(app)
+
+
+def test_conditional_get_is_answered_from_the_cache_before_generating(client, service):
+    first = client.get("/api/teoria/generar", params={"tema": "fotosíntesis"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/api/teoria/generar", params={"tema": "fotosíntesis"}, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+    assert service.calls == 1
+
+
+def test_stale_etag_gets_the_current_representation(client, service):
+    client.get("/api/teoria/generar", params={"tema": "fotosíntesis"})
+    response = client.get("/api/teoria/generar", params={"tema": "fotosíntesis"}, headers={"If-None-Match": 'W/"viejo"'})
+    assert response.status_code == 200
+    assert response.json()["cached"] is True
+    assert service.calls == 1
+
+
+def test_conditional_get_without_cache_entry_generates(client, service):
+    etag = make_etag("mitosis", "teoría 1")
+    response = client.get("/api/teoria/generar", params={"tema": "mitosis"}, headers={"If-None-Match": etag})
+    # La teoría generada coincide con el ETag: se ahorra la transferencia, no la llamada
+    assert response.status_code == 304
+    assert service.calls == 1
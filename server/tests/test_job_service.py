@@ -0,0 +1,236 @@
+"""Pruebas de JobService y de la recogida de trabajos huérfanos con SQLite."""
+import asyncio
+import sqlite3
+import time
+import pytest
+from app.core.exceptions import JobQueueFullError
+from app.services.job_service import (
+    _RESTARTED_MESSAGE, COMPLETADO, ERROR, PENDIENTE, PROCESANDO,
+    JobService, MemoryJobStore, SQLiteJobStore
+)
+
+
+def make_job(job_id: str, estado: str, instancia: str) -> dict:
+    return {"id": job_id, "estado": estado, "instancia": instancia, "resultado": None, "error": None}
+
+
+async def wait_for_state(service: JobService, job_id: str, estado: str) -> dict:
+    for _ in range(200):
+        job = await service.get(job_id)
+        if job["estado"] == estado:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"El trabajo no llegó a {estado}: {job}")
+
+
+def test_jobs_run_to_completion_or_error():
+    async def scenario():
+        service = JobService(MemoryJobStore(), workers=2, max_queue=10, ttl_seconds=60)
+        cleaned = []
+
+        async def ok():
+            return {"preguntas": 3}
+
+        async def fail():
+            raise ValueError("PDF ilegible")
+
+        done = await service.submit(ok, cleanup=lambda: cleaned.append("ok"), archivo="a.pdf")
+        failed = await service.submit(fail, cleanup=lambda: cleaned.append("fail"))
+        assert done["estado"] == PENDIENTE
+        assert done["archivo"] == "a.pdf"
+        results = (
+            await wait_for_state(service, done["id"], COMPLETADO),
+            await wait_for_state(service, failed["id"], ERROR)
+        )
+        stats = service.stats()
+        await service.close()
+        return results, stats, cleaned
+
+    (done, failed), stats, cleaned = asyncio.run(scenario())
+    assert done["resultado"] == {"preguntas": 3}
+    assert failed["error"] == "PDF ilegible"
+    assert stats["completed"] == 1 and stats["failed"] == 1
+    assert sorted(cleaned) == ["fail", "ok"]
+
+
+def test_full_queue_rejects_new_jobs():
+    async def scenario():
+        service = JobService(MemoryJobStore(), workers=1, max_queue=1, ttl_seconds=60)
+        release = asyncio.Event()
+        await service.submit(release.wait)
+        await asyncio.sleep(0.01)
+        await service.submit(release.wait)
+        with pytest.raises(JobQueueFullError):
+            await service.submit(release.wait)
+        release.set()
+        rejected = service.rejected
+        await service.close(drain_timeout=1)
+        return rejected
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_close_marks_unfinished_jobs_as_failed(tmp_path):
+    async def scenario():
+        service = JobService(SQLiteJobStore(str(tmp_path / "jobs.db")), workers=1, max_queue=10, ttl_seconds=60)
+        running = await service.submit(asyncio.Event().wait)
+        queued = await service.submit(asyncio.Event().wait)
+        await wait_for_state(service, running["id"], PROCESANDO)
+        await service.close()
+        store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+        try:
+            return store.get(running["id"]), store.get(queued["id"])
+        finally:
+            store.close()
+
+    running, queued = asyncio.run(scenario())
+    assert running["estado"] == ERROR
+    assert queued["estado"] == ERROR
+
+
+def test_abandon_orphans_only_touches_unfinished_jobs_of_dead_instances(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    now = time.time()
+    store.heartbeat("viva")
+    store.put(make_job("sin-latido", PENDIENTE, "muerta"), now + 60)
+    store.put(make_job("en-curso", PROCESANDO, "muerta"), now + 60)
+    store.put(make_job("terminado", COMPLETADO, "muerta"), now + 60)
+    store.put(make_job("de-otra", PROCESANDO, "viva"), now + 60)
+
+    assert store.abandon_orphans("reinicio", now + 60, stale_before=now - 30) == 2
+    assert store.get("sin-latido")["estado"] == ERROR
+    assert store.get("en-curso")["error"] == "reinicio"
+    assert store.get("terminado")["estado"] == COMPLETADO
+    assert store.get("de-otra")["estado"] == PROCESANDO
+
+    # Cuando la otra ejecución deja de latir, sus trabajos también se recogen
+    assert store.abandon_orphans("reinicio", now + 60, stale_before=time.time() + 1) == 1
+    assert store.get("de-otra")["estado"] == ERROR
+    assert store._conn.execute("SELECT COUNT(*) FROM instances").fetchone()[0] == 0
+    store.close()
+
+
+def test_orphan_lookup_uses_the_indexed_columns(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    store.put(make_job("a", PROCESANDO, "muerta"), None)
+    assert store._conn.execute("SELECT estado, instancia FROM jobs").fetchone() == (PROCESANDO, "muerta")
+    plan = " ".join(row[-1] for row in store._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM jobs WHERE estado IN (?, ?)", (PENDIENTE, PROCESANDO)
+    ))
+    assert "jobs_estado" in plan
+    store.close()
+
+
+def test_legacy_job_files_get_the_new_columns(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL)")
+    conn.execute(
+        "INSERT INTO jobs VALUES (?, ?, NULL)",
+        ("viejo", '{"id": "viejo", "estado": "procesando", "instancia": "muerta"}')
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteJobStore(path)
+    assert store.abandon_orphans("reinicio", None, stale_before=time.time()) == 1
+    assert store.get("viejo")["estado"] == ERROR
+    store.close()
+
+
+def test_restart_fails_the_jobs_of_the_previous_run(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def scenario():
+        crashed = JobService(SQLiteJobStore(path), workers=1, max_queue=10, ttl_seconds=60, heartbeat_seconds=0.05)
+        running = await crashed.submit(asyncio.Event().wait)
+        queued = await crashed.submit(asyncio.Event().wait)
+        await wait_for_state(crashed, running["id"], PROCESANDO)
+        # Caída sin cierre ordenado: se detienen los latidos y nadie actualiza los trabajos
+        crashed._heartbeat_task.cancel()
+        await asyncio.sleep(0.2)
+
+        restarted = JobService(SQLiteJobStore(path), workers=1, max_queue=10, ttl_seconds=60, heartbeat_seconds=0.05)
+        jobs = await restarted.get(running["id"]), await restarted.get(queued["id"])
+        await restarted.close()
+        for task in crashed._tasks:
+            task.cancel()
+        return jobs
+
+    running, queued = asyncio.run(scenario())
+    assert running["estado"] == ERROR and running["error"] == _RESTARTED_MESSAGE
+    assert queued["estado"] == ERROR and queued["error"] == _RESTARTED_MESSAGE
+
+
+def test_live_sibling_jobs_are_not_taken_as_orphans(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def scenario():
+        first = JobService(SQLiteJobStore(path), workers=1, max_queue=10, ttl_seconds=60, heartbeat_seconds=0.05)
+        job = await first.submit(asyncio.Event().wait)
+        await wait_for_state(first, job["id"], PROCESANDO)
+        await asyncio.sleep(0.2)
+
+        second = JobService(SQLiteJobStore(path), workers=1, max_queue=10, ttl_seconds=60, heartbeat_seconds=0.05)
+        await second.get(job["id"])
+        await asyncio.sleep(0.2)
+        seen = await second.get(job["id"])
+        await second.close()
+        await first.close()
+        return seen
+
+    assert asyncio.run(scenario())["estado"] == PROCESANDO
+
+
+def test_queued_jobs_do_not_expire_and_finished_ones_do(tmp_path):
+    async def scenario():
+        service = JobService(SQLiteJobStore(str(tmp_path / "jobs.db")), workers=1, max_queue=10, ttl_seconds=0.1)
+        release = asyncio.Event()
+        await service.submit(release.wait)
+        queued = await service.submit(lambda: asyncio.sleep(0))
+        await asyncio.sleep(0.2)
+        # Ha esperado en la cola más que el TTL y sigue consultable
+        assert (await service.get(queued["id"]))["estado"] == PENDIENTE
+        release.set()
+        done = await wait_for_state(service, queued["id"], COMPLETADO)
+        await asyncio.sleep(0.2)
+        expired = await service.get(queued["id"])
+        await service.close()
+        return done, expired
+
+    done, expired = asyncio.run(scenario())
+    assert done["estado"] == COMPLETADO
+    assert expired is None
+
+
+def test_heartbeat_survives_transient_storage_errors(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def scenario():
+        service = JobService(SQLiteJobStore(path), workers=1, max_queue=10, ttl_seconds=60, heartbeat_seconds=0.02)
+        job = await service.submit(asyncio.Event().wait)
+        await wait_for_state(service, job["id"], PROCESANDO)
+        heartbeat = service.store.heartbeat
+        failures = 3
+
+        def flaky(instance_id):
+            nonlocal failures
+            if failures:
+                failures -= 1
+                raise sqlite3.OperationalError("database is locked")
+            heartbeat(instance_id)
+
+        service.store.heartbeat = flaky
+        await asyncio.sleep(0.2)
+        alive = not service._heartbeat_task.done()
+        seen = service.store._conn.execute(
+            "SELECT seen FROM instances WHERE id = ?", (service.instance_id,)
+        ).fetchone()[0]
+        errors = service.heartbeat_errors
+        await service.close()
+        return alive, seen, errors
+
+    alive, seen, errors = asyncio.run(scenario())
+    assert alive
+    assert errors == 3
+    assert time.time() - seen < 0.2
@@ -0,0 +1,84 @@
+"""Pruebas del enrutado de llamadas entre modelos."""
+import time
+from app.services.model_router import (
+    DEGRADADO, POR_OPERACION, POR_TAMANO, PRINCIPAL, RAPIDO, RESPALDO,
+    ModelHealth, ModelRouter, ModelTier
+)
+
+
+def make_router(operation_tiers=None, window_seconds=60.0) -> ModelRouter:
+    return ModelRouter(
+        tiers=[ModelTier(RAPIDO, "flash", 1000), ModelTier(PRINCIPAL, "pro")],
+        operation_tiers=operation_tiers or {},
+        window_seconds=window_seconds,
+        min_samples=3,
+        slow_seconds=5.0,
+        max_error_rate=0.5
+    )
+
+
+def test_short_inputs_go_to_the_fast_model_and_long_ones_to_the_primary():
+    router = make_router()
+    short = router.route("teoria", 200)
+    assert (short.model, short.reason, short.fallback) == ("flash", POR_TAMANO, None)
+    long = router.route("preguntas", 50000)
+    assert (long.model, long.reason) == ("pro", POR_TAMANO)
+    assert long.fallback.model == "flash"
+
+
+def test_operation_can_be_pinned_to_a_tier():
+    route = make_router({"fusion": PRINCIPAL}).route("fusion", 10)
+    assert (route.model, route.reason) == ("pro", POR_OPERACION)
+
+
+def test_slow_or_failing_primary_degrades_to_the_fast_model():
+    router = make_router()
+    for _ in range(3):
+        router.observe("pro", 9.0, ok=True)
+    assert router.degraded("pro")
+    route = router.route("preguntas", 50000)
+    assert (route.model, route.reason, route.fallback) == ("flash", DEGRADADO, None)
+
+    router = make_router()
+    for ok in (False, False, True):
+        router.observe("pro", 1.0, ok=ok)
+    assert router.degraded("pro")
+
+
+def test_few_samples_do_not_degrade_a_model():
+    router = make_router()
+    router.observe("pro", 30.0, ok=False)
+    router.observe("pro", 30.0, ok=False)
+    assert not router.degraded("pro")
+    assert router.route("preguntas", 50000).model == "pro"
+
+
+def test_unavailable_model_is_skipped():
+    route = make_router().route("preguntas", 50000, available=lambda model: model != "pro")
+    assert (route.model, route.reason) == ("flash", DEGRADADO)
+
+
+def test_fallback_moves_to_the_faster_tier():
+    router = make_router()
+    route = router.fallback(router.route("preguntas", 50000))
+    assert (route.model, route.tier, route.reason, route.fallback) == ("flash", RAPIDO, RESPALDO, None)
+
+
+def test_health_window_forgets_old_samples():
+    health = ModelHealth(window_seconds=0.01)
+    health.observe(9.0, ok=False)
+    time.sleep(0.02)
+    assert health.snapshot() == {"calls": 0, "error_rate": 0.0, "mean_latency_seconds": None}
+
+    health = ModelHealth(window_seconds=60)
+    health.observe(1.0, ok=True)
+    health.observe(3.0, ok=True)
+    health.observe(9.0, ok=False)
+    assert health.snapshot() == {"calls": 3, "error_rate": 0.333, "mean_latency_seconds": 2.0}
+
+
+def test_stats_report_each_tier():
+    stats = make_router().stats()
+    assert stats[RAPIDO]["model"] == "flash"
+    assert stats[PRINCIPAL]["max_input_chars"] is None
+    assert stats[PRINCIPAL]["degraded"] is False
@@ -0,0 +1,106 @@
+"""Pruebas de ProcessPool: tiempo límite, reciclado y reemplazo de procesos."""
+import asyncio
+import os
+import threading
+import time
+import pytest
+from app.core.process_pool import ProcessPool, WorkerCrashedError, WorkerTimeoutError
+
+
+def square(x):
+    return x * x
+
+
+def pid():
+    return os.getpid()
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def fail():
+    raise ValueError("fallo en el trabajador")
+
+
+def crash():
+    os._exit(1)
+
+
+def unpicklable_result():
+    return threading.Lock()
+
+
+@pytest.fixture
+def pool():
+    pool = ProcessPool(size=1)
+    yield pool
+    pool.close()
+
+
+def test_runs_functions_in_another_process(pool):
+    assert asyncio.run(pool.run(square, 7)) == 49
+    assert asyncio.run(pool.run(pid)) != os.getpid()
+
+
+def test_exceptions_are_propagated_and_keep_the_worker(pool):
+    first = asyncio.run(pool.run(pid))
+    with pytest.raises(ValueError, match="fallo en el trabajador"):
+        asyncio.run(pool.run(fail))
+    assert asyncio.run(pool.run(pid)) == first
+
+
+def test_timeout_kills_and_replaces_the_worker(pool):
+    first = asyncio.run(pool.run(pid))
+    with pytest.raises(WorkerTimeoutError):
+        asyncio.run(pool.run(sleep, 5, timeout=0.2))
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["idle"] == 1
+    assert len(pool._workers) == 1
+    assert asyncio.run(pool.run(pid)) != first
+
+
+def test_timeout_does_not_affect_other_tasks():
+    pool = ProcessPool(size=2)
+    try:
+        async def scenario():
+            return await asyncio.gather(
+                pool.run(sleep, 5, timeout=0.2),
+                pool.run(sleep, 0.3, timeout=5),
+                return_exceptions=True
+            )
+
+        slow, ok = asyncio.run(scenario())
+        assert isinstance(slow, WorkerTimeoutError)
+        assert ok == 0.3
+    finally:
+        pool.close()
+
+
+def test_crashed_worker_is_replaced(pool):
+    with pytest.raises(WorkerCrashedError):
+        asyncio.run(pool.run(crash))
+    assert asyncio.run(pool.run(square, 3)) == 9
+
+
+def test_workers_are_recycled_after_max_tasks():
+    pool = ProcessPool(size=1, max_tasks_per_child=2)
+    try:
+        pids = [asyncio.run(pool.run(pid)) for _ in range(4)]
+        assert pids[0] == pids[1]
+        assert pids[2] == pids[3]
+        assert pids[1] != pids[2]
+        assert pool.stats()["recycled"] == 2
+    finally:
+        pool.close()
+
+
+def test_unpicklable_arguments_or_results_do_not_shrink_the_pool(pool):
+    with pytest.raises(Exception):
+        asyncio.run(pool.run(square, threading.Lock()))
+    with pytest.raises(Exception):
+        asyncio.run(pool.run(unpicklable_result))
+    assert pool.stats()["idle"] == 1
+    assert len(pool._workers) == 1
+    assert asyncio.run(pool.run(square, 4, timeout=5)) == 16
@@ -0,0 +1,118 @@
+"""Pruebas de TokenBucket y OutboundLimiter (admisión hacia Gemini)."""
+import asyncio
+import pytest
+from app.core.exceptions import GeminiRateLimitError, GeminiUnavailableError
+from app.core.rate_limiter import OutboundLimiter, TokenBucket
+
+
+def test_bucket_starts_full_and_refills_at_constant_rate():
+    bucket = TokenBucket(60)
+    now = bucket._updated
+    assert bucket.wait_time(60, now) == 0
+    bucket.consume(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0)
+
+
+def test_bucket_reservations_queue_in_order():
+    bucket = TokenBucket(60)
+    now = bucket._updated
+    bucket.consume(60)
+    bucket.consume(1)
+    # La segunda reserva espera a que se reponga también la primera
+    assert bucket.wait_time(1, now) == pytest.approx(2.0)
+
+
+def test_bucket_caps_amount_and_refund_at_capacity():
+    bucket = TokenBucket(10)
+    now = bucket._updated
+    assert bucket.wait_time(1000, now) == 0
+    bucket.consume(1000)
+    assert bucket._tokens == pytest.approx(0)
+    bucket.refund(1000)
+    assert bucket._tokens == pytest.approx(10)
+
+
+def test_limiter_admits_immediately_and_tracks_in_flight():
+    async def scenario():
+        limiter = OutboundLimiter(max_in_flight=2, requests_per_minute=60, tokens_per_minute=1000)
+        async with limiter.acquire(100):
+            inside = limiter.stats()
+        return inside, limiter.stats()
+
+    inside, after = asyncio.run(scenario())
+    assert inside["in_flight"] == 1
+    assert inside["waiting"] == 0
+    assert after["in_flight"] == 0
+    assert after["requests_available"] == 59
+    assert after["tokens_available"] == 900
+
+
+def test_limiter_rejects_with_retry_after_when_rate_exceeded():
+    async def scenario():
+        limiter = OutboundLimiter(max_in_flight=5, requests_per_minute=1, max_wait_seconds=0.1)
+        async with limiter.acquire(10):
+            pass
+        with pytest.raises(GeminiRateLimitError) as exc_info:
+            async with limiter.acquire(10):
+                pass
+        return limiter, exc_info.value
+
+    limiter, error = asyncio.run(scenario())
+    assert error.retry_after > 50
+    assert limiter.rate_limited == 1
+
+
+def test_limiter_waits_for_tokens_within_max_wait():
+    async def scenario():
+        limiter = OutboundLimiter(max_in_flight=5, tokens_per_minute=600, max_wait_seconds=1.0)
+        async with limiter.acquire(600):
+            pass
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with limiter.acquire(6):
+            pass
+        return loop.time() - start
+
+    # 6 tokens a 10 tokens/s
+    assert asyncio.run(scenario()) == pytest.approx(0.6, abs=0.15)
+
+
+def test_limiter_times_out_waiting_for_a_slot_and_refunds():
+    async def scenario():
+        limiter = OutboundLimiter(max_in_flight=1, tokens_per_minute=1000, max_wait_seconds=0.1)
+        async with limiter.acquire(100):
+            with pytest.raises(GeminiUnavailableError):
+                async with limiter.acquire(100):
+                    pass
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.overloaded == 1
+    assert limiter.waiting == 0
+    # La reserva de la petición rechazada se devolvió (más lo repuesto durante la espera)
+    assert 900 <= limiter.stats()["tokens_available"] < 910
+
+
+def test_limiter_rejects_when_too_many_waiters():
+    async def scenario():
+        limiter = OutboundLimiter(max_in_flight=1, max_waiters=1, max_wait_seconds=1.0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.acquire(1):
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(GeminiUnavailableError):
+            async with limiter.acquire(1):
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.overloaded == 1
+    assert limiter.in_flight == 0
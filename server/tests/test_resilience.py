@@ -0,0 +1,207 @@
+"""Pruebas del circuit breaker, la política de reintentos y el hedging."""
+import asyncio
+import pytest
+from google.genai import errors
+from app.core.exceptions import GeminiCircuitOpenError, GeminiServiceError, GeminiUnavailableError
+from app.core.rate_limiter import OutboundLimiter
+from app.core.resilience import ABIERTO, CERRADO, SEMIABIERTO, CallPolicy, CircuitBreaker, hedged
+from app.services.gemini_service import GeminiService
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.check()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CERRADO
+    breaker.record_failure()
+    assert breaker.state == ABIERTO
+    with pytest.raises(GeminiCircuitOpenError) as exc_info:
+        breaker.check()
+    assert exc_info.value.retry_after > 50
+    assert breaker.stats()["opened"] == 1
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CERRADO
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+    assert breaker.state == SEMIABIERTO
+    breaker.check()
+    with pytest.raises(GeminiCircuitOpenError):
+        breaker.check()
+
+
+def test_successful_probe_closes_and_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == CERRADO
+
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0.05)
+    open_breaker(breaker)
+    asyncio.run(asyncio.sleep(0.06))
+    breaker.check()
+    breaker.record_failure()
+    assert breaker._state == ABIERTO
+    assert breaker.opened == 2
+
+
+def test_released_probe_lets_the_next_call_probe_without_closing():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+    breaker.check()
+    # Un error del cliente (4xx) no dice nada de la salud del servicio
+    breaker.release_probe()
+    assert breaker.state == SEMIABIERTO
+    breaker.check()
+    with pytest.raises(GeminiCircuitOpenError):
+        breaker.check()
+
+
+def test_backoff_is_bounded_and_honours_the_server_hint():
+    policy = CallPolicy(deadline=10, max_retries=3, base_delay=0.5, max_delay=2.0)
+    for attempt in range(6):
+        assert 0 <= policy.backoff(attempt) <= min(2.0, 0.5 * 2 ** attempt)
+    assert policy.backoff(0, hint=5.0) == 5.0
+
+
+def test_hedged_returns_the_first_success_and_cancels_the_other():
+    async def scenario():
+        calls = []
+
+        async def call():
+            index = len(calls)
+            calls.append(index)
+            await asyncio.sleep(0.5 if index == 0 else 0.01)
+            return index
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await hedged(call, delay=0.05)
+        return result, loop.time() - start, calls
+
+    result, elapsed, calls = asyncio.run(scenario())
+    assert result == 1
+    assert calls == [0, 1]
+    assert elapsed < 0.3
+
+
+def test_hedged_does_not_duplicate_fast_calls_and_fails_only_if_both_fail():
+    async def fast():
+        return "ok"
+
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        raise ValueError(calls)
+
+    assert asyncio.run(hedged(fast, delay=0.05)) == "ok"
+    with pytest.raises(ValueError):
+        asyncio.run(hedged(failing, delay=0.01))
+    assert calls == 2
+
+
+def test_limiter_wait_is_capped_by_the_remaining_deadline():
+    async def scenario():
+        limiter = OutboundLimiter(max_in_flight=1, max_wait_seconds=10.0)
+        loop = asyncio.get_running_loop()
+        async with limiter.acquire(1):
+            start = loop.time()
+            with pytest.raises(GeminiUnavailableError):
+                async with limiter.acquire(1, max_wait=0.1):
+                    pass
+            return loop.time() - start
+
+    assert asyncio.run(scenario()) < 0.5
+
+
+def make_service(breaker: CircuitBreaker):
+    return GeminiService(
+        api_key="AIzaFAKEKEY_abcdefghijklmnopqrstuv",
+        model="gemini-test",
+        policy=CallPolicy(deadline=5, max_retries=0),
+        breaker=breaker
+    )
+
+
+def api_error(code: int):
+    return errors.APIError(code, {"error": {"code": code, "message": "error", "status": "ERROR"}})
+
+
+def test_service_outages_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    service = make_service(breaker)
+
+    async def attempt(timeout):
+        raise api_error(503)
+
+    for _ in range(2):
+        with pytest.raises(GeminiServiceError):
+            asyncio.run(service._call(attempt, "gemini-test"))
+    assert breaker.state == ABIERTO
+
+
+def test_client_errors_do_not_close_a_half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+    service = make_service(breaker)
+
+    async def attempt(timeout):
+        raise api_error(400)
+
+    with pytest.raises(GeminiServiceError):
+        asyncio.run(service._call(attempt, "gemini-test"))
+    assert breaker.state == SEMIABIERTO
+    assert breaker.failures == 1
+
+
+def test_cancelled_probe_does_not_leave_the_breaker_half_open_forever():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    open_breaker(breaker)
+    service = make_service(breaker)
+
+    async def scenario():
+        async def hang(timeout):
+            await asyncio.sleep(10)
+
+        probe = asyncio.ensure_future(service._call(hang, "gemini-test"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok(timeout):
+            return "teoría"
+
+        return await service._call(ok, "gemini-test")
+
+    assert asyncio.run(scenario()) == "teoría"
+    assert breaker.state == CERRADO
+
+
+def test_breaker_stats_report_every_model():
+    service = make_service(CircuitBreaker(failure_threshold=1, reset_seconds=60))
+    open_breaker(service._breaker("gemini-fast"))
+    stats = service.breaker_stats()
+    assert set(stats) == {"gemini-test", "gemini-fast"}
+    assert stats["gemini-test"]["state"] == CERRADO
+    assert stats["gemini-fast"]["state"] == ABIERTO
+    assert make_service(None).breaker_stats() is None
@@ -0,0 +1,92 @@
+"""Pruebas de SingleFlight (coalescencia de llamadas concurrentes)."""
+import asyncio
+import pytest
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_with_same_key_run_once():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "teoría"
+
+        results = await asyncio.gather(*(flight.do("tema", fn) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["teoría"] * 5
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 4}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        return flight, await asyncio.gather(flight.do("a", lambda: fn(1)), flight.do("b", lambda: fn(2)))
+
+    flight, results = asyncio.run(scenario())
+    assert results == [1, 2]
+    assert flight.executed == 2
+    assert flight.coalesced == 0
+
+
+def test_exception_is_propagated_to_every_caller():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError("fallo")
+
+        return await asyncio.gather(*(flight.do("tema", fn) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_key_is_released_after_completion():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        first = await flight.do("tema", fn)
+        second = await flight.do("tema", fn)
+        return flight, first, second
+
+    flight, first, second = asyncio.run(scenario())
+    assert (first, second) == (1, 2)
+    assert flight.in_flight == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.ensure_future(flight.do("tema", fn))
+        second = asyncio.ensure_future(flight.do("tema", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
@@ -0,0 +1,33 @@
+"""Pruebas del arranque en frío: importaciones diferidas y presupuesto de importación."""
+import os
+import subprocess
+import sys
+from benchmarks.startup import DEFERRED_MODULES, _parse_importtime
+
+# Mismo presupuesto que la comprobación de CI (benchmarks.startup --max-import-ms 800)
+IMPORT_BUDGET_MS = 800
+RUNS = 3
+
+
+def import_app() -> dict[str, tuple[int, int]]:
+    """Importa app.main en un proceso nuevo y devuelve el perfil de -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=dict(os.environ), capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    return _parse_importtime(proc.stderr)
+
+
+def test_import_does_not_load_deferred_modules():
+    loaded = [
+        name for name in import_app()
+        if any(name == module or name.startswith(module + ".") for module in DEFERRED_MODULES)
+    ]
+    assert loaded == []
+
+
+def test_import_stays_within_budget():
+    # El mejor de varios procesos, para no fallar por el ruido de la máquina
+    best_ms = min(import_app()["app.main"][1] for _ in range(RUNS)) / 1000
+    assert best_ms < IMPORT_BUDGET_MS, f"import app.main tarda {best_ms:.0f} ms"
@@ -0,0 +1,85 @@
+"""Pruebas de la compactación del texto extraído de los PDFs."""
+import pytest
+from app.services.text_compaction import _PAGE_NUMBER, compact_pages
+
+BODY = [
+    "La fotosíntesis transforma la energía luminosa en energía química.",
+    "Ocurre en los cloroplastos de las células vegetales.",
+    "Produce glucosa y libera oxígeno a la atmósfera.",
+    "Depende de la luz, el agua y el dióxido de carbono.",
+]
+
+
+@pytest.mark.parametrize("line", [
+    "12", "- 3 -", "| 5 |", "iv", "xii", "XXXIX", "Página 4", "pág. 7 de 20",
+    "Page xlii", "p. 12", "p12", "12 / 40", "pág. cd",
+])
+def test_page_number_lines_match(line):
+    assert _PAGE_NUMBER.match(line)
+
+
+@pytest.mark.parametrize("line", [
+    "civil", "mil", "mix", "dim", "Vivid", "CLI", "DC", "cd", "pix", "pi", "", "Capítulo 3",
+])
+def test_ordinary_words_are_not_page_numbers(line):
+    assert not _PAGE_NUMBER.match(line)
+
+
+def test_repeated_headers_footers_and_page_numbers_are_removed():
+    pages = [
+        "\n".join(["Biología 2º ESO", *BODY, f"Tema {n}: texto propio de la página {n}.", f"- {n} -"])
+        for n in range(1, 5)
+    ]
+    text, stats = compact_pages(pages)
+    assert "Biología 2º ESO" not in text
+    assert "- 2 -" not in text
+    assert "Tema 3: texto propio de la página 3." in text
+    # El pie numerado se repite salvo el número, así que cuenta como línea repetida
+    assert stats.lineas_repetidas == 8
+    assert stats.caracteres_ahorrados > 0
+
+
+def test_page_numbers_at_the_edges_are_removed():
+    text, stats = compact_pages(["\n".join(["iv", *BODY, "Página 4 de 20"])])
+    assert text == "\n".join(BODY)
+    assert stats.numeros_pagina == 2
+
+
+def test_page_numbers_inside_the_body_are_kept():
+    page = "\n".join([*BODY[:2], "12", *BODY[2:]])
+    text, stats = compact_pages([page])
+    assert "\n12\n" in text
+    assert stats.numeros_pagina == 0
+
+
+def test_edge_words_that_look_roman_are_kept():
+    page = "\n".join(["Mix", *BODY, "civil"])
+    text, stats = compact_pages([page])
+    assert text.splitlines()[0] == "Mix"
+    assert text.splitlines()[-1] == "civil"
+    assert stats.numeros_pagina == 0
+
+
+def test_short_pages_keep_their_body():
+    text, _ = compact_pages(["12\nTítulo corto"])
+    assert text == "12\nTítulo corto"
+
+
+def test_hyphenated_line_breaks_are_joined():
+    text, stats = compact_pages(["El conoci-\nmiento científico avanza."])
+    assert text == "El conocimiento científico avanza."
+    assert stats.guiones_unidos == 1
+
+
+def test_duplicate_paragraphs_are_dropped():
+    notice = "Este material se distribuye con fines exclusivamente educativos y no puede venderse ni copiarse."
+    near_duplicate = notice.replace("Este material", "Todo este material")
+    pages = [f"Capítulo {n}.\n\n{text}\n\n" for n, text in enumerate([notice, notice, near_duplicate])]
+    text, stats = compact_pages(pages)
+    assert text.count("fines exclusivamente educativos") == 1
+    assert stats.parrafos_duplicados == 2
+
+
+def test_whitespace_is_collapsed():
+    text, _ = compact_pages(["Uno   dos tres\n\n\n\nCuatro"])
+    assert text == "Uno dos tres\n\nCuatro"
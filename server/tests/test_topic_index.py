@@ -0,0 +1,96 @@
+"""Pruebas del índice de temas parecidos."""
+import pytest
+from app.services.topic_index import MAX_CANDIDATES, TopicIndex, topic_ngrams, topic_signature, topic_words
+
+
+def test_topic_words_drop_stopwords_and_accents():
+    assert topic_words("¿Qué es la Fotosíntesis?") == ["fotosintesis"]
+    # Un tema formado solo por palabras vacías no queda vacío
+    assert topic_words("Qué es") == ["que", "es"]
+
+
+def test_topic_signature_keeps_prefixes_and_negations():
+    assert topic_signature(topic_words("Química inorgánica")) == "inorg quimi"
+    assert topic_signature(topic_words("funciones no lineales")) == "funci linea no"
+
+
+def test_topic_ngrams_are_padded_per_word():
+    assert topic_ngrams("sol") == {" so", "sol", "ol "}
+
+
+def test_equivalent_phrasings_match_exactly():
+    index = TopicIndex(threshold=0.75, max_entries=100)
+    index.add("La fotosíntesis")
+    match = index.lookup("qué es la fotosíntesis")
+    assert match.tema == "La fotosíntesis"
+    assert match.similitud == 1.0
+
+
+def test_near_duplicates_match_above_the_threshold():
+    index = TopicIndex(threshold=0.75, max_entries=100)
+    index.add("Revolución francesa")
+    index.add("Fotosíntesis en las plantas")
+    match = index.lookup("fotosintesis de la planta")
+    assert match.tema == "Fotosíntesis en las plantas"
+    assert 0.75 <= match.similitud < 1.0
+    assert index.lookup("la célula eucariota") is None
+    index.add("Células eucariotas")
+    assert index.lookup("la célula eucariota").tema == "Células eucariotas"
+
+
+@pytest.mark.parametrize("answered, asked", [
+    ("química orgánica", "química inorgánica"),
+    ("funciones lineales", "funciones no lineales"),
+    ("polígonos regulares", "polígonos irregulares"),
+    ("ecuaciones", "inecuaciones"),
+    ("conductores", "semiconductores"),
+    ("integrales propias", "integrales impropias"),
+    ("números reales", "números irreales"),
+    ("triángulos", "triángulos rectángulos"),
+    ("fotosíntesis", "fotosíntesis en plantas"),
+    ("relatividad especial", "relatividad general"),
+])
+def test_opposite_or_narrower_topics_never_match(answered, asked):
+    index = TopicIndex(threshold=0.5, max_entries=100)
+    index.add(answered)
+    assert index.lookup(asked) is None
+    index = TopicIndex(threshold=0.5, max_entries=100)
+    index.add(asked)
+    assert index.lookup(answered) is None
+
+
+def test_different_topics_do_not_match():
+    index = TopicIndex(threshold=0.75, max_entries=100)
+    index.add("Revolución francesa")
+    index.add("Fotosíntesis")
+    assert index.lookup("Revolución industrial") is None
+    assert index.lookup("Teorema de Pitágoras") is None
+    assert TopicIndex(threshold=0.75, max_entries=100).lookup("Fotosíntesis") is None
+
+
+def test_duplicates_are_not_indexed_twice():
+    index = TopicIndex(threshold=0.75, max_entries=100)
+    index.add("Fotosíntesis")
+    index.add("La fotosíntesis")
+    assert len(index) == 1
+
+
+def test_oldest_half_is_dropped_when_full():
+    index = TopicIndex(threshold=0.75, max_entries=4)
+    for tema in ["Fotosíntesis", "Mitosis", "Meiosis", "Ecosistemas", "Glaciares"]:
+        index.add(tema)
+    assert len(index) == 3
+    assert index.lookup("Fotosíntesis") is None
+    assert index.lookup("Mitosis") is None
+    assert index.lookup("Meiosis").tema == "Meiosis"
+    assert index.lookup("Glaciares").tema == "Glaciares"
+    assert index.stats()["entries"] == 3
+
+
+def test_lookup_prefers_recent_entries_when_candidates_exceed_the_budget():
+    index = TopicIndex(threshold=0.75, max_entries=10 * MAX_CANDIDATES)
+    for n in range(2 * MAX_CANDIDATES):
+        index.add(f"Historiografía{n:04d} de Roma")
+    index.add("Historia de Roma")
+    assert index.lookup("historias de Roma").tema == "Historia de Roma"
+    assert index.memory_bytes() > 0